@@ -0,0 +1,310 @@
+"""
+Benchmark da camada de dados (`loader.py`, `tools.py`, `functions.py`) com
+dados sintéticos de `synthetic_sus.py`.
+
+Para cada tamanho (padrão: 100k e 1M linhas; 10M com `--rows 10000000`):
+
+- `cold`: carga sem cache (CSV → colunas codificadas, gravando o cache);
+- `warm`: carga com o cache já gravado;
+- `tools`: latência p50/p95 de cada ferramenta, com os dados já carregados.
+
+Cada fase roda num processo novo, para que o pico de RSS seja o da fase. Os
+resultados vão para um JSON; `--compare` compara com um JSON anterior e sai
+com código 1 se alguma métrica piorar além da tolerância.
+
+Uso:
+    python benchmarks/bench_data.py --rows 100000 1000000
+    python benchmarks/bench_data.py --rows 1000000 --ingest chunked
+    python benchmarks/bench_data.py --compare benchmarks/results/base.json
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+BENCH_DIR = Path(__file__).resolve().parent
+ROOT = BENCH_DIR.parent
+sys.path.insert(0, str(ROOT / "src"))
+
+from aggregates import INGEST_MODE_ENV, INGEST_MODES  # noqa: E402
+from loader import DATA_DIR_ENV  # noqa: E402
+
+# Demais CSVs necessários (índice de municípios), ligados do `data/raw` real
+AUX_SOURCES = ["IDH_municipios_RS.csv", "dados_IBGE_modificados.csv"]
+
+# Chamadas das ferramentas medidas na fase `tools`: (ferramenta, argumentos)
+TOOL_CALLS = [
+    ("get_top_cities", {"n": 5}),
+    ("get_top_ages", {"n": 5, "range": "ambos"}),
+    ("get_admission_age_groups", {}),
+    ("get_top_admission_age_group", {}),
+    ("total_hospitalizations", {"city": "Porto Alegre", "year": 2020}),
+    ("avg_cost", {"city": "Porto Alegre", "year": 2020}),
+    ("mortality_rate", {"city": "Porto Alegre", "year": 2020}),
+    ("top_diagnoses", {"city": "Porto Alegre", "year": 2020, "n": 5}),
+    ("aggregate_hospitalizations", {"metric": "custo_medio", "group_by": "faixa_etaria", "year_from": 2019}),
+]
+
+# Métricas que não representam custo (não entram na comparação)
+NON_COST_KEYS = {"rows"}
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def _peak_rss_mb() -> float:
+    # No Linux, `ru_maxrss` é herdado do processo pai no fork; `VmHWM` não
+    try:
+        with open("/proc/self/status") as fh:
+            for line in fh:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 2**10
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa em KiB; macOS em bytes
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def _timed(fn: Callable[[], Any]) -> float:
+    started = time.perf_counter()
+    fn()
+    return time.perf_counter() - started
+
+
+# ---------------------------------------------------------------------------
+# Fases (executadas no processo filho)
+# ---------------------------------------------------------------------------
+
+def _phase_load() -> Dict[str, Any]:
+    """Carga completa: colunas codificadas do SUS (via `tools.DATASET`)."""
+    from tools import DATASET
+
+    result = {"dataset_s": _timed(DATASET.get)}
+    result["load_s"] = result["dataset_s"]
+    result["rows"] = DATASET.get().rows
+    return result
+
+
+def _phase_tools(repeat: int) -> Dict[str, Any]:
+    """Latência por ferramenta, com os dados já carregados."""
+    import functions
+    import tools
+
+    tools.DATASET.get()
+    result: Dict[str, Any] = {}
+    for name, args in TOOL_CALLS:
+        fn = getattr(tools, name, None) or getattr(functions, name)
+        fn.invoke(args)  # aquecimento
+        samples = [_timed(lambda: fn.invoke(args)) for _ in range(repeat)]
+        result[f"{name}_p50_ms"] = percentile(samples, 0.5) * 1000
+        result[f"{name}_p95_ms"] = percentile(samples, 0.95) * 1000
+    return result
+
+
+def worker(phase: str, repeat: int) -> None:
+    """Executa uma fase e imprime o resultado em JSON na última linha."""
+    import logging
+    logging.disable(logging.INFO)
+    result = _phase_tools(repeat) if phase == "tools" else _phase_load()
+    result["peak_rss_mb"] = _peak_rss_mb()
+    print(json.dumps(result))
+
+
+# ---------------------------------------------------------------------------
+# Orquestração
+# ---------------------------------------------------------------------------
+
+def prepare_data_dir(work_dir: Path, rows: int, seed: int) -> Path:
+    """
+    Cria `<work_dir>/sus-<rows>-<seed>/raw` com o CSV sintético (reaproveitado
+    se já existir) e links para os CSVs auxiliares.
+    """
+    from synthetic_sus import write_sus_csv
+
+    data_dir = work_dir / f"sus-{rows}-{seed}"
+    raw_dir = data_dir / "raw"
+    csv_path = raw_dir / "dados_sus3.csv"
+    if not csv_path.exists():
+        print(f"  gerando {rows} linhas em {csv_path} ...", flush=True)
+        write_sus_csv(csv_path, rows, seed=seed)
+    for name in AUX_SOURCES:
+        source, target = ROOT / "data" / "raw" / name, raw_dir / name
+        if source.exists() and not target.exists():
+            target.symlink_to(source)
+    return data_dir
+
+
+def run_phase(data_dir: Path, phase: str, repeat: int, ingest: str = "memory") -> Dict[str, Any]:
+    env = {**os.environ, DATA_DIR_ENV: str(data_dir), INGEST_MODE_ENV: ingest}
+    proc = subprocess.run(
+        [sys.executable, __file__, "--worker", phase, "--repeat", str(repeat)],
+        env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"fase '{phase}' falhou:\n{proc.stderr}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def run_suite(
+    sizes: List[int], work_dir: Path, seed: int, repeat: int, ingest: str = "memory"
+) -> Dict[str, Any]:
+    results: Dict[str, Any] = {}
+    for rows in sizes:
+        print(f"[{rows} linhas]", flush=True)
+        data_dir = prepare_data_dir(work_dir, rows, seed)
+        shutil.rmtree(data_dir / "cache", ignore_errors=True)
+        results[str(rows)] = {
+            phase: run_phase(data_dir, phase, repeat, ingest)
+            for phase in ("cold", "warm", "tools")
+        }
+        for phase, metrics in results[str(rows)].items():
+            print(f"  {phase}: " + "  ".join(
+                f"{k}={v:.3f}" for k, v in metrics.items() if k not in NON_COST_KEYS
+            ), flush=True)
+    return results
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def metadata(seed: int, repeat: int, ingest: str) -> Dict[str, Any]:
+    import numpy
+    import pandas
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "pandas": pandas.__version__,
+        "numpy": numpy.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "seed": seed,
+        "repeat": repeat,
+        "ingest": ingest,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Comparação de regressões
+# ---------------------------------------------------------------------------
+
+def flatten(results: Dict[str, Any]) -> Dict[str, float]:
+    """`{"1000000": {"warm": {"load_s": 1.2}}}` → `{"1000000/warm/load_s": 1.2}`."""
+    flat = {}
+    for rows, phases in results.items():
+        for phase, metrics in phases.items():
+            for key, value in metrics.items():
+                if key not in NON_COST_KEYS:
+                    flat[f"{rows}/{phase}/{key}"] = float(value)
+    return flat
+
+
+def compare(
+    baseline: Dict[str, Any],
+    current: Dict[str, Any],
+    tolerance: float = 0.15,
+    min_delta: float = 0.5,
+) -> List[Dict[str, Any]]:
+    """
+    Compara duas execuções (o JSON completo gravado por este script).
+
+    Uma métrica regride quando fica mais de `tolerance` (fração) acima da
+    base e a diferença absoluta passa de `min_delta` na unidade da métrica
+    (ms, MB; para segundos, `min_delta / 1000`) — evita alarmes por ruído em
+    valores minúsculos.
+
+    Returns:
+        Lista de linhas {metric, baseline, current, change, regression}
+    """
+    base, cur = flatten(baseline["results"]), flatten(current["results"])
+    rows = []
+    for key in sorted(base.keys() & cur.keys()):
+        old, new = base[key], cur[key]
+        change = (new - old) / old if old else 0.0
+        floor = min_delta / 1000 if key.endswith("_s") else min_delta
+        rows.append({
+            "metric": key,
+            "baseline": old,
+            "current": new,
+            "change": change,
+            "regression": change > tolerance and new - old > floor,
+        })
+    return rows
+
+
+def format_comparison(rows: List[Dict[str, Any]]) -> str:
+    lines = [f"{'métrica':<52} {'base':>10} {'atual':>10} {'var.':>8}"]
+    for row in rows:
+        mark = "  REGRESSÃO" if row["regression"] else ""
+        lines.append(
+            f"{row['metric']:<52} {row['baseline']:>10.3f} {row['current']:>10.3f} "
+            f"{row['change']:>+7.0%}{mark}"
+        )
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark da camada de dados com SUS sintético")
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000],
+                        help="Tamanhos a medir (ex.: 100000 1000000 10000000)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=50, help="Chamadas por ferramenta")
+    parser.add_argument("--work-dir", type=Path, default=BENCH_DIR / ".data",
+                        help="Onde gerar os CSVs sintéticos (reaproveitados entre execuções)")
+    parser.add_argument("--output", type=Path,
+                        help="JSON de resultados (padrão: benchmarks/results/data-<data>.json)")
+    parser.add_argument("--compare", type=Path, metavar="BASE.json",
+                        help="Compara com um resultado anterior e sai com 1 se houver regressão")
+    parser.add_argument("--current", type=Path, metavar="ATUAL.json",
+                        help="Com --compare, usa este resultado em vez de rodar o benchmark")
+    parser.add_argument("--tolerance", type=float, default=0.15,
+                        help="Piora relativa tolerada no --compare (padrão: 0.15)")
+    parser.add_argument("--ingest", choices=INGEST_MODES, default="memory",
+                        help="Modo de ingestão dos agregados (padrão: memory)")
+    parser.add_argument("--worker", choices=["cold", "warm", "tools"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.worker, args.repeat)
+        return
+
+    if args.current:
+        current = json.loads(args.current.read_text(encoding="utf-8"))
+    else:
+        current = {
+            "meta": metadata(args.seed, args.repeat, args.ingest),
+            "results": run_suite(args.rows, args.work_dir, args.seed, args.repeat, args.ingest),
+        }
+        output = args.output or BENCH_DIR / "results" / f"data-{datetime.now():%Y%m%d-%H%M%S}.json"
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(current, indent=2), encoding="utf-8")
+        print(f"Resultados em {output}")
+
+    if args.compare:
+        baseline = json.loads(args.compare.read_text(encoding="utf-8"))
+        rows = compare(baseline, current, tolerance=args.tolerance)
+        print(format_comparison(rows))
+        if any(row["regression"] for row in rows):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Consultas filtradas no banco SQL indexado (`sql_engine.py`) contra uma
+varredura equivalente em pandas sobre o SUS preparado (`load_sus()`).
+
+Para cada consulta mede a latência p50/p95 (cache de resultados desligado,
+`max_rows` suficiente para o resultado inteiro) e confere que os dois lados
+devolvem os mesmos números. Também mede o tempo de geração do banco.
+
+Uso:
+    python benchmarks/bench_sql.py --rows 1000000 --repeat 20
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+import pandas as pd
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR))
+
+from bench_data import percentile, prepare_data_dir  # noqa: E402
+from loader import DATA_DIR_ENV  # noqa: E402
+
+
+def _queries(df: pd.DataFrame) -> Dict[str, Any]:
+    """Consulta -> (spec, equivalente pandas em linhas), para a cidade e o ano mais frequentes."""
+    from municipios import fold_name
+
+    city = str(df["CIDADE_RESIDENCIA_PACIENTE"].value_counts().index[0])
+    year = int(df["ano"].mode().iloc[0])
+    # Nome normalizado calculado uma vez, como na geração do banco
+    keys = df["CIDADE_RESIDENCIA_PACIENTE"].astype("category").map(fold_name)
+    key = fold_name(city)
+    city_mask = lambda: keys == key  # noqa: E731
+
+    def city_year() -> List[Any]:
+        sub = df[city_mask() & (df["ano"] == year)]
+        return [[len(sub), int(sub["MORTE"].sum())]]
+
+    def month_window() -> List[Any]:
+        dates = pd.to_datetime(df["DT_INTER"])
+        return [[int(((dates >= f"{year}-03-01") & (dates <= f"{year}-03-31")).sum())]]
+
+    def city_by_year() -> List[Any]:
+        return [[int(y), int(n)] for y, n in df[city_mask()].groupby("ano").size().items()]
+
+    return {
+        "cidade+ano": (
+            {"select": ["count", "sum:morte"], "where": {"cidade": city, "ano": year}},
+            city_year,
+        ),
+        "intervalo de datas": (
+            {"select": ["count"], "where": {"dt_inter": {"between": [f"{year}-03-01", f"{year}-03-31"]}}},
+            month_window,
+        ),
+        "cidade por ano": (
+            {"select": ["ano", "count"], "where": {"cidade": city}, "group_by": ["ano"], "order_by": ["ano"]},
+            city_by_year,
+        ),
+    }
+
+
+def _latency(fn: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {"p50": percentile(samples, 0.5), "p95": percentile(samples, 0.95)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="SQL indexado vs. varredura pandas")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--work-dir", type=Path, default=BENCH_DIR / ".data")
+    args = parser.parse_args()
+
+    os.environ[DATA_DIR_ENV] = str(prepare_data_dir(args.work_dir, args.rows, args.seed))
+    import logging
+    logging.disable(logging.INFO)
+    from loader import load_sus
+    from sql_engine import compile_spec, load_engine
+
+    df = load_sus()
+    start = time.perf_counter()
+    engine = load_engine(use_cache=False)
+    print(f"Banco gerado em {time.perf_counter() - start:.1f}s ({args.rows} linhas)")
+
+    print(f"{'consulta':<20} {'SQL p50':>9} {'SQL p95':>9} {'pandas p50':>11} {'pandas p95':>11} {'iguais':>7}")
+    for name, (spec, scan) in _queries(df).items():
+        sql, params = compile_spec(spec)
+        # Direto em `_execute`: sem o cache de resultados
+        run = lambda: engine._execute(sql, params, 10_000, 60.0)  # noqa: E731
+        same = [list(row) for row in run().rows] == scan()
+        sql_ms = _latency(run, args.repeat)
+        pandas_ms = _latency(scan, args.repeat)
+        print(
+            f"{name:<20} {sql_ms['p50']:>9.2f} {sql_ms['p95']:>9.2f} "
+            f"{pandas_ms['p50']:>11.2f} {pandas_ms['p95']:>11.2f} {str(same):>7}"
+        )
+
+
+if __name__ == "__main__":
+    main()
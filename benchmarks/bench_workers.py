@@ -0,0 +1,131 @@
+"""
+Memória por processo worker com e sem o SUS compartilhado via memory-map.
+
+Sobe `--workers` processos, um de cada vez; cada um importa `tools.py`,
+carrega as colunas codificadas (`DATASET.get()`) e o SUS preparado (`load_sus()`),
+lê todas as colunas e fica parado. Depois de cada novo worker, mede em
+`/proc/<pid>/smaps_rollup` de todos os workers vivos:
+
+- `RSS`: soma dos RSS (conta páginas compartilhadas em todos os processos);
+- `PSS`: soma dos PSS (páginas compartilhadas divididas entre os processos),
+  isto é, a memória realmente usada pelo conjunto;
+- `Δ PSS`: quanto o último worker acrescentou ao total;
+- `USS`: memória privada do último worker.
+
+Modos: `copy` (`CHATBOT_PYSUS_SHARED=0`, cada worker com sua cópia do cache
+Feather), `shared` (colunas `.npy` mapeadas, padrão) e `imports` (referência:
+só as colunas codificadas, sem `load_sus()`; o custo fixo do interpretador,
+das bibliotecas e do dataset das ferramentas).
+
+Uso:
+    python benchmarks/bench_workers.py --rows 1000000 --workers 4
+"""
+import argparse
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR))
+
+from bench_data import prepare_data_dir  # noqa: E402
+from loader import DATA_DIR_ENV, SHARED_ENV  # noqa: E402
+
+# Modo -> valor de `SHARED_ENV` (None: o worker não carrega o SUS)
+MODES = {"copy": "0", "shared": "1", "imports": None}
+
+
+def worker(load_sus_frame: bool) -> None:
+    """Carrega os dados, toca todas as páginas e espera o stdin fechar."""
+    import logging
+    logging.disable(logging.INFO)
+    import pandas as pd
+    from loader import load_sus
+    from tools import DATASET
+
+    DATASET.get()
+    if load_sus_frame:
+        df = load_sus()
+        pd.util.hash_pandas_object(df, index=False).sum()
+    print("ready", flush=True)
+    sys.stdin.read()
+
+
+def memory_mb(pid: int) -> Dict[str, float]:
+    """RSS, PSS e USS (MiB) de `pid`, de `/proc/<pid>/smaps_rollup`."""
+    values: Dict[str, int] = {}
+    with open(f"/proc/{pid}/smaps_rollup") as fh:
+        for line in fh:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                values[parts[0].rstrip(":")] = int(parts[1])
+    return {
+        "rss": values["Rss"] / 1024,
+        "pss": values["Pss"] / 1024,
+        "uss": (values["Private_Clean"] + values["Private_Dirty"]) / 1024,
+    }
+
+
+def run_mode(data_dir: Path, mode: str, workers: int) -> List[Dict[str, float]]:
+    env = {**os.environ, DATA_DIR_ENV: str(data_dir), SHARED_ENV: MODES[mode] or "1"}
+    command = [sys.executable, __file__, "--worker", "--no-load" if MODES[mode] is None else "--load"]
+    # Aquecimento: grava os caches antes de medir
+    subprocess.run(command, env=env, input="", capture_output=True, text=True, check=True)
+
+    procs: List[subprocess.Popen] = []
+    rows = []
+    try:
+        for _ in range(workers):
+            proc = subprocess.Popen(command, env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+            procs.append(proc)
+            if proc.stdout.readline().strip() != "ready":
+                raise RuntimeError(f"worker {proc.pid} falhou (modo {mode})")
+            usage = [memory_mb(p.pid) for p in procs]
+            rows.append({
+                "workers": len(procs),
+                "rss": sum(u["rss"] for u in usage),
+                "pss": sum(u["pss"] for u in usage),
+                "uss": usage[-1]["uss"],
+            })
+    finally:
+        for proc in procs:
+            proc.stdin.close()
+            proc.wait()
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Memória por worker com e sem o SUS compartilhado")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES))
+    parser.add_argument("--work-dir", type=Path, default=BENCH_DIR / ".data")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--load", dest="load", action="store_true", default=True, help=argparse.SUPPRESS)
+    parser.add_argument("--no-load", dest="load", action="store_false", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.load)
+        return
+    if not Path("/proc/self/smaps_rollup").exists():
+        parser.error("requer Linux com /proc/<pid>/smaps_rollup")
+
+    data_dir = prepare_data_dir(args.work_dir, args.rows, args.seed)
+    for mode in args.modes:
+        print(f"[{mode}] {args.rows} linhas")
+        print(f"{'workers':>8} {'RSS MiB':>10} {'PSS MiB':>10} {'Δ PSS':>8} {'USS último':>11}")
+        previous = 0.0
+        for row in run_mode(data_dir, mode, args.workers):
+            print(
+                f"{row['workers']:>8} {row['rss']:>10.1f} {row['pss']:>10.1f} "
+                f"{row['pss'] - previous:>8.1f} {row['uss']:>11.1f}"
+            )
+            previous = row["pss"]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Latência das respostas com o servidor de modelo degradado, com e sem os
+limites de `resilience.py` (timeouts, prazo e circuit breaker).
+
+Usa o `FakeChatModel` com uma fração `--stall-rate` de chamadas travadas por
+`--stall-latency` segundos e uma fração `--failure-rate` de erros. Roteador,
+cache de respostas e templates ficam desligados, para que toda pergunta
+dependa do LLM. Para cada modo mostra p50/p95/máximo, a fração de respostas
+em modo degradado, de respostas com erro e quantas vezes o circuito abriu.
+
+Uso:
+    python benchmarks/llm_outage.py --requests 60 --stall-rate 0.5
+"""
+import argparse
+import asyncio
+import itertools
+import logging
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR))
+
+from bench_data import percentile  # noqa: E402
+
+PROMPTS = [
+    "Quais as 5 cidades com o maior número de internações?",
+    "Qual faixa etaria tem o maior numero de internacoes?",
+    "Qual é o numero de internacoes por faixa etaria?",
+    "Quais as 3 menores idades registradas?",
+]
+
+
+async def run(agent: Any, total: int, concurrency: int, guard: Optional[Any]) -> Dict[str, Any]:
+    from agent import aget_response
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    degraded = errors = 0
+
+    async def one(prompt: str) -> None:
+        nonlocal degraded, errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                answer, _ = await aget_response(
+                    agent, prompt, answer_cache=None, router=None, templates=None, guard=guard,
+                )
+                degraded += "indisponível" in answer
+            except Exception:
+                # Sem limites, uma falha do modelo derruba a resposta
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one(p) for p in itertools.islice(itertools.cycle(PROMPTS), total)))
+    return {
+        "p50": percentile(latencies, 0.5),
+        "p95": percentile(latencies, 0.95),
+        "max": max(latencies),
+        "degraded": degraded / total,
+        "errors": errors / total,
+        "trips": guard.breaker.trips if guard is not None else 0,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Respostas com o LLM lento ou falhando")
+    parser.add_argument("--requests", type=int, default=60)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.2, help="Latência normal por chamada (s)")
+    parser.add_argument("--stall-rate", type=float, default=0.5)
+    parser.add_argument("--stall-latency", type=float, default=5.0)
+    parser.add_argument("--failure-rate", type=float, default=0.1)
+    parser.add_argument("--llm-timeout", type=float, default=1.0)
+    parser.add_argument("--request-timeout", type=float, default=2.0)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    from agent import TOOL_REGISTRY
+    from fake_llm import FakeChatModel
+    from resilience import CircuitBreaker, LLMGuard
+    from tools import DATASET
+
+    DATASET.get()
+    model = FakeChatModel(
+        latency=args.latency,
+        stall_rate=args.stall_rate,
+        stall_latency=args.stall_latency,
+        failure_rate=args.failure_rate,
+        seed=0,
+    )
+    agent = model.bind_tools(list(TOOL_REGISTRY.values()))
+    modes = {
+        "sem limites": None,
+        "com limites": LLMGuard(
+            call_timeout=args.llm_timeout,
+            request_timeout=args.request_timeout,
+            breaker=CircuitBreaker(slow_call_seconds=args.llm_timeout, cooldown=5.0),
+        ),
+    }
+    print(
+        f"{'modo':<12} {'p50 (s)':>8} {'p95 (s)':>8} {'máx (s)':>8} "
+        f"{'degradadas':>11} {'erros':>6} {'aberturas':>10}"
+    )
+    for name, guard in modes.items():
+        stats = asyncio.run(run(agent, args.requests, args.concurrency, guard))
+        print(
+            f"{name:<12} {stats['p50']:>8.2f} {stats['p95']:>8.2f} {stats['max']:>8.2f} "
+            f"{stats['degraded']:>11.0%} {stats['errors']:>6.0%} {stats['trips']:>10}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Teste de carga do serviço HTTP (`src/server.py`).
+
+Dispara `--requests` perguntas com `--concurrency` clientes simultâneos e
+mostra vazão, latências (p50/p95) e quantas requisições receberam 503.
+
+Uso:
+    python src/server.py --fake-llm --fake-latency 0.5 &
+    python benchmarks/load_server.py --requests 200 --concurrency 32
+"""
+import argparse
+import asyncio
+import itertools
+import statistics
+import time
+from collections import Counter
+from typing import List
+
+import aiohttp
+
+PROMPTS = [
+    "Quais as 5 cidades com o maior número de internações?",
+    "Qual faixa etaria tem o maior numero de internacoes?",
+    "Qual é o numero de internacoes por faixa etaria?",
+    "Quais as 3 menores idades registradas?",
+]
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+async def run(url: str, total: int, concurrency: int) -> None:
+    prompts = itertools.cycle(PROMPTS)
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with aiohttp.ClientSession() as session:
+        async def one(prompt: str) -> None:
+            async with semaphore:
+                began = time.perf_counter()
+                async with session.post(f"{url}/chat", json={"prompt": prompt}) as resp:
+                    await resp.read()
+                    statuses[resp.status] += 1
+                if resp.status == 200:
+                    latencies.append(time.perf_counter() - began)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(next(prompts)) for _ in range(total)))
+        elapsed = time.perf_counter() - started
+
+    print(f"requisições: {total}  concorrência: {concurrency}  tempo: {elapsed:.2f}s")
+    print(f"vazão: {statuses[200] / elapsed:.1f} resp/s  status: {dict(statuses)}")
+    if latencies:
+        print(
+            f"latência p50: {percentile(latencies, 0.5) * 1000:.0f} ms  "
+            f"p95: {percentile(latencies, 0.95) * 1000:.0f} ms  "
+            f"média: {statistics.mean(latencies) * 1000:.0f} ms"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Teste de carga do serviço HTTP")
+    parser.add_argument("--url", default="http://127.0.0.1:8080")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+    asyncio.run(run(args.url, args.requests, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Tamanho do prompt por turno numa sessão interativa longa.
+
+Simula `--turns` turnos (perguntas e seguimentos alternados) com o
+`FakeChatModel` e compara os tokens de prompt estimados da resposta final:
+
+- `memória`: `ConversationMemory` com orçamento `--memory-tokens`;
+- `sem limite`: histórico completo (orçamento infinito);
+- `sem memória`: cada turno isolado (comportamento antigo).
+
+Uso:
+    python benchmarks/memory_session.py --turns 40 --memory-tokens 1200
+"""
+import argparse
+import itertools
+import logging
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+PROMPTS = [
+    "Quais as 10 cidades com o maior número de internações?",
+    "E quais as 3 maiores idades registradas?",
+    "Qual é o numero de internacoes por faixa etaria?",
+    "E qual faixa etaria tem o maior numero de internacoes?",
+    "Quais as 5 menores idades registradas?",
+    "E as 20 cidades com mais internações?",
+]
+
+
+def run_session(turns: int, memory_tokens: Optional[int]) -> List[int]:
+    """Tokens de prompt (estimados) por turno; `memory_tokens=None` = sem memória."""
+    from agent import TOOL_REGISTRY, get_response
+    from fake_llm import FakeChatModel
+    from memory import ConversationMemory, count_tokens
+
+    agent = FakeChatModel(latency=0.0).bind_tools(list(TOOL_REGISTRY.values()))
+    memory = None if memory_tokens is None else ConversationMemory(max_tokens=memory_tokens)
+    sizes = []
+    for prompt in itertools.islice(itertools.cycle(PROMPTS), turns):
+        _, messages = get_response(
+            agent, prompt, answer_cache=None, router=None, memory=memory,
+        )
+        sizes.append(count_tokens(messages[:-1]))
+    return sizes
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Tokens de prompt por turno numa sessão longa")
+    parser.add_argument("--turns", type=int, default=40)
+    parser.add_argument("--memory-tokens", type=int, default=1200)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    sessions: Dict[str, List[int]] = {
+        "memória": run_session(args.turns, args.memory_tokens),
+        "sem limite": run_session(args.turns, 10**9),
+        "sem memória": run_session(args.turns, None),
+    }
+    print(f"{'turno':>5} " + " ".join(f"{name:>12}" for name in sessions))
+    for i in range(args.turns):
+        print(f"{i + 1:>5} " + " ".join(f"{sizes[i]:>12}" for sizes in sessions.values()))
+    print("máx.  " + " ".join(f"{max(sizes):>12}" for sizes in sessions.values()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Precisão da seleção de ferramentas e latência por fase com um modelo só e
+com dois modelos (`model_tiers.py`).
+
+Responde as perguntas do conjunto de avaliação do roteador com dois
+`FakeChatModel`: um "grande" (lento, sempre acerta a ferramenta) e um
+"pequeno" (rápido, responde sem chamar a ferramenta em `--misroute-rate` das
+perguntas). Roteador, cache de respostas e templates ficam desligados, para
+que as duas fases chamem o LLM. Compara:
+
+- `grande`: o modelo grande nas duas fases (o agente atual);
+- `pequeno`: o modelo pequeno nas duas fases, sem escalonamento;
+- `dois níveis`: `TieredAgent`, pequeno na seleção, grande na síntese e na
+  seleção escalada.
+
+Para cada modo mostra a precisão da seleção (ferramenta esperada no
+conjunto de avaliação), a fração de seleções escaladas e a latência média
+da seleção, da síntese e da resposta.
+
+Uso:
+    python benchmarks/model_tiers.py --large-latency 0.8 --small-latency 0.15
+"""
+import argparse
+import asyncio
+import logging
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+
+def run(agent: Any, cases: List[Dict[str, Any]]) -> Dict[str, float]:
+    from agent import aget_response, collect_tool_calls
+    from model_tiers import PHASE_STATS
+
+    escalations_before = sum(n for (_, o), n in PHASE_STATS.outcomes.items() if o != "accepted")
+    correct = 0
+    totals = {"tool_selection": 0.0, "synthesis": 0.0, "total": 0.0}
+    for case in cases:
+        stages: Dict[str, float] = {}
+        start = time.perf_counter()
+        _, messages = asyncio.run(aget_response(
+            agent, case["prompt"], warm_dataset=False, answer_cache=None, router=None,
+            templates=None, stages=stages,
+        ))
+        totals["total"] += time.perf_counter() - start
+        for stage in ("tool_selection", "synthesis"):
+            totals[stage] += stages.get(stage, 0.0)
+        tools = [c["name"] for c in collect_tool_calls(messages)]
+        correct += tools == ([case["tool"]] if case["tool"] else [])
+    escalations = sum(n for (_, o), n in PHASE_STATS.outcomes.items() if o != "accepted") - escalations_before
+    n = len(cases)
+    return {
+        "accuracy": correct / n,
+        "escalated": escalations / n,
+        **{stage: seconds / n * 1000 for stage, seconds in totals.items()},
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Seleção com modelo pequeno e síntese com modelo grande")
+    parser.add_argument("--large-latency", type=float, default=0.8, help="Segundos por chamada do modelo grande")
+    parser.add_argument("--small-latency", type=float, default=0.15, help="Segundos por chamada do modelo pequeno")
+    parser.add_argument("--misroute-rate", type=float, default=0.2,
+                        help="Fração de perguntas em que o modelo pequeno não chama a ferramenta")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    from agent import TOOL_REGISTRY
+    from fake_llm import FakeChatModel
+    from model_tiers import TieredAgent
+    from router import load_eval_set
+    from tool_selection import PrunedToolAgent
+    from tools import DATASET
+
+    DATASET.get()
+    cases = load_eval_set()
+    tools = list(TOOL_REGISTRY.values())
+    large = PrunedToolAgent(FakeChatModel(latency=args.large_latency, model="grande"), tools)
+
+    def small() -> PrunedToolAgent:
+        model = FakeChatModel(
+            latency=args.small_latency, misroute_rate=args.misroute_rate, seed=1, model="pequeno",
+        )
+        return PrunedToolAgent(model, tools, selector=large.selector)
+
+    modes = {
+        "grande": large,
+        "pequeno": small(),
+        "dois níveis": TieredAgent(small(), large, tools),
+    }
+    print(
+        f"{'modo':<12} {'precisão':>9} {'escaladas':>10} "
+        f"{'seleção (ms)':>13} {'síntese (ms)':>13} {'total (ms)':>11}"
+    )
+    for name, agent in modes.items():
+        stats = run(agent, cases)
+        print(
+            f"{name:<12} {stats['accuracy']:>9.0%} {stats['escalated']:>10.0%} "
+            f"{stats['tool_selection']:>13.0f} {stats['synthesis']:>13.0f} {stats['total']:>11.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
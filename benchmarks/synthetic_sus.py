@@ -0,0 +1,214 @@
+"""
+Gerador de dados sintéticos no formato de `dados_sus3.csv`.
+
+As distribuições imitam as internações do SUS no RS:
+
+- `CIDADE_RESIDENCIA_PACIENTE`: municípios do IDH (se disponível), com peso
+  concentrado nas cidades grandes (Porto Alegre, Caxias do Sul, ...) e cauda
+  longa nos demais;
+- `DIAG_PRINC`: CID-10 sem ponto (ex.: "J189"), ~25% respiratórios (capítulo
+  J), com os códigos mais comuns pesados e uma cauda de códigos raros;
+- `IDADE`: mistura de bebês (0–4), crianças, adultos e idosos;
+- `DT_INTER` entre 2014 e 2023, com respiratórios concentrados no inverno;
+  `DT_SAIDA` após uma permanência de média ~5 dias;
+- `VAL_TOT` log-normal, crescendo com a permanência;
+- `MORTE` com probabilidade maior em idosos e em diagnósticos respiratórios.
+
+Uso:
+    python benchmarks/synthetic_sus.py --rows 1000000 --output /tmp/dados_sus3.csv
+"""
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from loader import get_raw_dir  # noqa: E402
+
+# Cidades grandes do RS e população aproximada (milhares de habitantes)
+MAJOR_CITIES = {
+    "Porto Alegre": 1330, "Caxias do Sul": 460, "Canoas": 350, "Pelotas": 325,
+    "Santa Maria": 270, "Gravataí": 265, "Viamão": 225, "Novo Hamburgo": 230,
+    "São Leopoldo": 215, "Rio Grande": 190, "Alvorada": 185, "Passo Fundo": 205,
+    "Sapucaia do Sul": 130, "Uruguaiana": 125, "Santa Cruz do Sul": 130,
+    "Cachoeirinha": 120, "Bagé": 120, "Bento Gonçalves": 120,
+}
+
+# População "típica" dos demais municípios (milhares), para a cauda longa
+SMALL_CITY_WEIGHT = 8
+
+# CIDs respiratórios mais frequentes e pesos relativos
+RESPIRATORY_CIDS = {
+    "J189": 30, "J159": 8, "J440": 7, "J441": 6, "J960": 6, "J069": 5,
+    "J209": 5, "J219": 6, "J459": 5, "J128": 3, "J180": 3, "J181": 2,
+    "J869": 1, "J90": 1, "J13": 2, "J101": 2, "J111": 3, "J448": 4,
+}
+
+# CIDs não respiratórios frequentes
+OTHER_CIDS = {
+    "O800": 30, "O821": 12, "I500": 10, "I10": 4, "K359": 6, "N390": 7,
+    "A09": 5, "E149": 4, "S720": 4, "I219": 5, "I64": 5, "K802": 6,
+    "C509": 3, "F102": 3, "N189": 3, "A419": 5, "K409": 5, "P073": 2,
+}
+
+# Fração de internações respiratórias e de CIDs da cauda rara
+RESPIRATORY_SHARE = 0.25
+RARE_CID_SHARE = 0.10
+
+# (idade mínima, máxima, peso) das faixas da mistura de idades
+AGE_MIXTURE = [(0, 4, 0.12), (5, 17, 0.08), (18, 59, 0.45), (60, 100, 0.35)]
+
+START_DATE = np.datetime64("2014-01-01")
+END_DATE = np.datetime64("2024-01-01")
+
+SUS_COLUMNS = [
+    "DIAG_PRINC", "IDADE", "CIDADE_RESIDENCIA_PACIENTE", "DT_INTER", "DT_SAIDA",
+    "VAL_TOT", "MORTE", "SEXO", "ano",
+]
+
+
+def city_weights(raw_dir: Optional[Path] = None) -> Tuple[List[str], np.ndarray]:
+    """
+    Municípios e probabilidades de residência.
+
+    Usa os nomes de `IDH_municipios_RS.csv` quando o arquivo existe; caso
+    contrário, apenas `MAJOR_CITIES`.
+    """
+    names = list(MAJOR_CITIES)
+    path = (raw_dir or get_raw_dir()) / "IDH_municipios_RS.csv"
+    if path.exists():
+        idh = pd.read_csv(path, usecols=["Territorialidade"])
+        for name in idh["Territorialidade"].dropna():
+            name = re.sub(r"\s*\(RS\)\s*$", "", name).strip()
+            if name not in MAJOR_CITIES:
+                names.append(name)
+    weights = np.array([MAJOR_CITIES.get(n, SMALL_CITY_WEIGHT) for n in names], dtype=float)
+    return names, weights / weights.sum()
+
+
+def _weighted(table: dict) -> Tuple[np.ndarray, np.ndarray]:
+    codes = np.array(list(table))
+    weights = np.array(list(table.values()), dtype=float)
+    return codes, weights / weights.sum()
+
+
+def _rare_cids(rng: np.random.Generator, n: int) -> np.ndarray:
+    letters = rng.choice(list("ABCDEGHIKLMNQRST"), size=n)
+    digits = rng.integers(0, 1000, size=n)
+    return np.char.add(letters.astype("U1"), np.char.zfill(digits.astype("U3"), 3))
+
+
+def generate_sus(
+    rows: int,
+    seed: int = 0,
+    cities: Optional[Tuple[List[str], np.ndarray]] = None,
+) -> pd.DataFrame:
+    """
+    Gera `rows` internações sintéticas com as colunas de `SUS_COLUMNS`.
+
+    Args:
+        rows: Número de linhas
+        seed: Semente do gerador (mesma semente → mesmos dados)
+        cities: (nomes, probabilidades) de `city_weights`; calculado se None
+
+    Returns:
+        pd.DataFrame: Dados no formato de `dados_sus3.csv`
+    """
+    rng = np.random.default_rng(seed)
+    names, probs = cities if cities is not None else city_weights()
+
+    # Diagnóstico: respiratório, comum não respiratório ou raro
+    kind = rng.random(rows)
+    respiratory = kind < RESPIRATORY_SHARE
+    rare = kind > 1 - RARE_CID_SHARE
+    resp_codes, resp_p = _weighted(RESPIRATORY_CIDS)
+    other_codes, other_p = _weighted(OTHER_CIDS)
+    diag = rng.choice(other_codes, size=rows, p=other_p).astype("U4")
+    diag[respiratory] = rng.choice(resp_codes, size=int(respiratory.sum()), p=resp_p)
+    diag[rare] = _rare_cids(rng, int(rare.sum()))
+
+    # Idade: mistura de faixas; respiratórios puxam para bebês e idosos
+    bands = np.array([w for _, _, w in AGE_MIXTURE])
+    band = rng.choice(len(AGE_MIXTURE), size=rows, p=bands / bands.sum())
+    resp_bands = np.array([0.30, 0.10, 0.20, 0.40])
+    band[respiratory] = rng.choice(len(AGE_MIXTURE), size=int(respiratory.sum()), p=resp_bands)
+    low = np.array([lo for lo, _, _ in AGE_MIXTURE])[band]
+    high = np.array([hi for _, hi, _ in AGE_MIXTURE])[band]
+    age = low + np.floor(rng.random(rows) * (high - low + 1)).astype(int)
+
+    # Datas: uniformes no período; respiratórios reamostram o mês para o inverno
+    span = int((END_DATE - START_DATE).astype(int))
+    dt_inter = START_DATE + rng.integers(0, span, size=rows).astype("timedelta64[D]")
+    n_resp = int(respiratory.sum())
+    if n_resp:
+        winter = rng.random(n_resp) < 0.5
+        year_start = dt_inter[respiratory].astype("datetime64[Y]").astype("datetime64[D]")
+        winter_day = rng.integers(151, 243, size=n_resp).astype("timedelta64[D]")  # jun–ago
+        dt_inter[respiratory] = np.where(winter, year_start + winter_day, dt_inter[respiratory])
+    stay = rng.negative_binomial(2, 2 / 7, size=rows)  # média ~5 dias
+    dt_saida = dt_inter + stay.astype("timedelta64[D]")
+
+    # Valor total: log-normal escalada pela permanência
+    val_tot = np.round(rng.lognormal(mean=6.3, sigma=0.7, size=rows) * (1 + 0.35 * stay), 2)
+
+    # Óbito: cresce com a idade e é maior nos respiratórios
+    logit = -5.6 + 0.045 * age + 0.8 * respiratory
+    morte = (rng.random(rows) < 1 / (1 + np.exp(-logit))).astype(np.int8)
+
+    return pd.DataFrame({
+        "DIAG_PRINC": diag,
+        "IDADE": age,
+        "CIDADE_RESIDENCIA_PACIENTE": rng.choice(np.array(names), size=rows, p=probs),
+        "DT_INTER": dt_inter,
+        "DT_SAIDA": dt_saida,
+        "VAL_TOT": val_tot,
+        "MORTE": morte,
+        "SEXO": rng.choice([1, 3], size=rows),
+        "ano": dt_inter.astype("datetime64[Y]").astype(int) + 1970,
+    }, columns=SUS_COLUMNS)
+
+
+def write_sus_csv(
+    path: Path,
+    rows: int,
+    seed: int = 0,
+    chunk_rows: int = 1_000_000,
+) -> Path:
+    """
+    Grava `rows` linhas sintéticas em CSV, em blocos de `chunk_rows` para
+    manter a memória constante mesmo com 10M de linhas.
+
+    O arquivo é escrito em `<path>.tmp` e renomeado no final, para que uma
+    geração interrompida não deixe um CSV incompleto no lugar.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    cities = city_weights()
+    with open(tmp_path, "w", encoding="utf-8", newline="") as fh:
+        for i, start in enumerate(range(0, rows, chunk_rows)):
+            chunk = generate_sus(min(chunk_rows, rows - start), seed=seed * 1_000_003 + i, cities=cities)
+            chunk.to_csv(fh, index=False, header=(i == 0), date_format="%Y-%m-%d")
+    tmp_path.replace(path)
+    return path
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Gera dados sintéticos no formato do SUS")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, default=get_raw_dir() / "dados_sus3.csv")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    write_sus_csv(args.output, args.rows, seed=args.seed)
+    print(f"{args.rows} linhas em {args.output} ({time.perf_counter() - started:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Tokens de prompt e latência com e sem a poda de ferramentas
+(`tool_selection.py`).
+
+Responde as perguntas do conjunto de avaliação do roteador com o
+`FakeChatModel` (roteador e cache de respostas desligados, para que as duas
+chamadas ao LLM aconteçam) e compara, por pergunta:
+
+- `todas`: todas as ferramentas vinculadas (`bind_tools` da registry);
+- `poda`: `PrunedToolAgent`, só as ferramentas relevantes.
+
+O modelo falso cobra `--prompt-token-ms` por token de entrada, então a
+diferença de latência reflete só o tamanho do prompt (os schemas).
+
+Uso:
+    python benchmarks/tool_pruning.py --prompt-token-ms 0.2
+"""
+import argparse
+import logging
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+
+def run(agent: Any, prompts: List[str]) -> List[Dict[str, float]]:
+    """Tokens de entrada (soma das chamadas ao LLM) e latência (ms) por pergunta."""
+    from agent import get_response
+
+    results = []
+    for prompt in prompts:
+        start = time.perf_counter()
+        _, messages = get_response(agent, prompt, answer_cache=None, router=None, warm_dataset=False)
+        elapsed = (time.perf_counter() - start) * 1000
+        tokens = sum((getattr(m, "usage_metadata", None) or {}).get("input_tokens", 0) for m in messages)
+        results.append({"tokens": tokens, "ms": elapsed})
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Poda de ferramentas: tokens de prompt e latência")
+    parser.add_argument("--prompt-token-ms", type=float, default=0.2,
+                        help="Milissegundos de processamento por token de entrada no modelo falso")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    from agent import TOOL_REGISTRY
+    from fake_llm import FakeChatModel
+    from router import load_eval_set
+    from tool_selection import PrunedToolAgent
+    from tools import DATASET
+
+    DATASET.get()
+    prompts = [case["prompt"] for case in load_eval_set()]
+    model = FakeChatModel(latency=0.0, prompt_token_latency=args.prompt_token_ms / 1000)
+    tools = list(TOOL_REGISTRY.values())
+    pruned = PrunedToolAgent(model, tools)
+    full = run(model.bind_tools(tools), prompts)
+    cut = run(pruned, prompts)
+
+    print(f"{'pergunta':<52} {'ferramentas':>11} {'tokens':>13} {'ms':>15}")
+    for prompt, a, b in zip(prompts, full, cut):
+        bound = len(pruned.selector.select(prompt).tools)
+        print(
+            f"{prompt[:52]:<52} {bound:>11} {a['tokens']:>6}→{b['tokens']:<6} "
+            f"{a['ms']:>7.1f}→{b['ms']:<7.1f}"
+        )
+    total = lambda rows, key: sum(r[key] for r in rows)  # noqa: E731
+    print(
+        f"{'total':<52} {'':>11} {total(full, 'tokens'):>6.0f}→{total(cut, 'tokens'):<6.0f} "
+        f"{total(full, 'ms'):>7.1f}→{total(cut, 'ms'):<7.1f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,14 @@
 #!/usr/bin/env python3
 import argparse
+from functools import lru_cache
 from langchain_ollama.chat_models import ChatOllama
 from langchain_core.tools import tool
 from langchain_core.messages import SystemMessage, HumanMessage
 import requests
 
+# One HTTP session (keep-alive connections) for every weather lookup
+SESSION = requests.Session()
+
 #
 #   TOOL DEFINITION
 #
@@ -13,11 +17,31 @@ import requests
 def get_weather(latitude, longitude):
     """Fetches weather for given city"""
 
-    response = requests.get(f"https://api.open-meteo.com/v1/forecast?latitude={latitude}&longitude={longitude}&current=temperature_2m,wind_speed_10m&hourly=temperature_2m,relative_humidity_2m,wind_speed_10m")
+    response = SESSION.get(f"https://api.open-meteo.com/v1/forecast?latitude={latitude}&longitude={longitude}&current=temperature_2m,wind_speed_10m&hourly=temperature_2m,relative_humidity_2m,wind_speed_10m")
     data = response.json()
     return data['current']['temperature_2m']
 
 
+#
+#   MODEL
+#
+
+@lru_cache(maxsize=None)
+def get_model():
+    """
+    Builds the model once per process, so every call reuses the same
+    ChatOllama HTTP client; keep_alive keeps the model loaded in the server
+    between prompts.
+    """
+    return ChatOllama(model="llama3.2", keep_alive="30m")
+
+
+@lru_cache(maxsize=None)
+def get_tool_model():
+    """The shared model with the tools bound (same client as get_model)."""
+    return get_model().bind_tools([get_weather])
+
+
 #
 #   RESPONSE FUNCTION
 #
@@ -29,7 +53,7 @@ def get_response(prompt: str, use_function_calling: bool):
     ]
 
     if use_function_calling:
-        model = ChatOllama(model="llama3.2").bind_tools([get_weather])
+        model = get_tool_model()
         # initial call
         res = model.invoke(messages)
         messages.append(res)
@@ -45,7 +69,7 @@ def get_response(prompt: str, use_function_calling: bool):
         res = model.invoke(messages)
         messages.append(res)
     else:
-        model = ChatOllama(model="llama3.2")
+        model = get_model()
         res = model.invoke(messages)
         messages.append(res)
 
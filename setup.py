@@ -10,4 +10,8 @@ setup(
         "pandas"
 
     ],
+    extras_require={
+        "cache": ["pyarrow"],
+        "server": ["aiohttp"],
+    },
 )
@@ -1,12 +1,36 @@
 import argparse
+import asyncio
 import json
 import logging
-from typing import Any, Dict, List, Tuple, Union
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Awaitable, Callable, Dict, Generator, List, NamedTuple, Optional, Set, Tuple, Union
 
 from langchain_ollama.chat_models import ChatOllama
-from langchain_core.messages import SystemMessage, HumanMessage
+from langchain_core.messages import AIMessage, SystemMessage, HumanMessage, ToolMessage
 
-from tools import get_top_ages, get_admission_age_groups, get_top_admission_age_group, get_top_cities
+from answer_cache import AnswerCache
+from answer_templates import AnswerTemplates
+from memory import ConversationMemory, count_tokens
+from model_tiers import PHASE_STATS, SELECTION, SYNTHESIS, ModelConfig, TieredAgent, model_label
+from resilience import Deadline, GatedCallback, LLMGuard, LLMUnavailable
+from router import IntentRouter, covers
+from streaming import TokenCallback, astream_final, stream_final
+from tool_cache import ToolResultCache
+from tool_selection import PrunedToolAgent, ToolSelection, prefill_seconds_per_token
+from tracing import METRICS, Span, Trace, current_trace, maybe_span, start_trace
+from tools import (
+    DATASET,
+    SQL_ENGINE,
+    aggregate_hospitalizations,
+    get_top_ages,
+    get_admission_age_groups,
+    get_top_admission_age_group,
+    get_top_cities,
+    query_data,
+)
 
 # Configure logger
 logging.basicConfig(
@@ -20,35 +44,210 @@ TOOL_REGISTRY: Dict[str, Any] = {
     get_top_ages.name: get_top_ages,
     get_admission_age_groups.name: get_admission_age_groups,
     get_top_admission_age_group.name: get_top_admission_age_group,
-    get_top_cities.name: get_top_cities
+    get_top_cities.name: get_top_cities,
+    aggregate_hospitalizations.name: aggregate_hospitalizations,
+    query_data.name: query_data,
 }
 
+# Dataset cuja versão invalida o cache de cada ferramenta (padrão: DATASET)
+TOOL_DATASETS: Dict[str, Any] = {query_data.name: SQL_ENGINE}
+
+# Cache dos resultados das ferramentas: todas são funções puras do dataset,
+# então a chave inclui a versão do dataset (invalidada em `DATASET.reload()`)
+TOOL_CACHE = ToolResultCache(maxsize=256, ttl=None)
+
+# Chamadas de ferramenta simultâneas previstas por requisição (dimensiona
+# `TOOL_EXECUTOR` em `configure_tool_executor`)
+TOOL_CALLS_PER_REQUEST = 2
+
+# Execução concorrente das chamadas de ferramenta de um mesmo turno
+TOOL_WORKERS = 4 * TOOL_CALLS_PER_REQUEST
+TOOL_EXECUTOR = ThreadPoolExecutor(max_workers=TOOL_WORKERS, thread_name_prefix="tool")
+
+# Chamadas que passaram do timeout e ainda ocupam um worker (uma thread não
+# pode ser interrompida); saem do conjunto quando terminam
+_ABANDONED_TOOLS: Set[Future] = set()
+_ABANDONED_LOCK = threading.Lock()
+
+# Timeout (segundos) por ferramenta; as ausentes usam DEFAULT_TOOL_TIMEOUT
+DEFAULT_TOOL_TIMEOUT = 30.0
+TOOL_TIMEOUTS: Dict[str, float] = {}
+
+# Cache semântico de respostas: perguntas equivalentes não chamam o LLM
+ANSWER_CACHE = AnswerCache(threshold=0.8, maxsize=1024)
+
+# Roteador determinístico: pula a chamada de seleção de ferramenta do LLM
+ROUTER = IntentRouter(TOOL_REGISTRY.values())
+
+# Respostas por template: pula a chamada de síntese do LLM para resultados simples
+TEMPLATES = AnswerTemplates()
+
+# Timeouts, prazo da requisição e circuit breaker das chamadas ao LLM
+LLM_GUARD = LLMGuard()
+
+# Limiar do roteador quando o LLM está indisponível (modo degradado): melhor
+# uma rota menos certa do que nenhuma resposta
+DEGRADED_ROUTER_THRESHOLD = 0.3
+
+# Falhas do modelo de seleção que fazem a seleção escalar para o modelo maior
+# (circuito aberto e prazo esgotado valem para os dois modelos)
+ESCALATE_ON_UNAVAILABLE = ("timeout", "error")
 
-def build_model(model_name: str = "llama3.2") -> ChatOllama:
+
+def build_model(
+    model_name: Union[str, ModelConfig] = "llama3.2",
+    max_connections: Optional[int] = None,
+    timeout: Optional[float] = None,
+) -> ChatOllama:
     """
     Cria e configura o modelo LLM para Function Calling.
+
+    `model_name` é o nome do modelo (saída JSON, temperatura 0, mantido
+    carregado por `DEFAULT_KEEP_ALIVE`) ou um `ModelConfig` completo.
+
+    O ChatOllama mantém um cliente HTTP (com pool de conexões) por instância;
+    `max_connections` limita esse pool, que é compartilhado por todas as
+    requisições que usam o mesmo agente. `timeout` (segundos) limita a
+    espera do cliente HTTP, para que uma chamada abandonada por `LLM_GUARD`
+    não segure a conexão para sempre.
     """
+    client_kwargs: Dict[str, Any] = {}
+    if timeout is not None:
+        client_kwargs["timeout"] = timeout
+    if max_connections is not None:
+        import httpx
+        client_kwargs["limits"] = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+        )
+    config = ModelConfig(model_name) if isinstance(model_name, str) else model_name
     return ChatOllama(
-        model=model_name,
-        format="json",    # Garante saída JSON para ferramentas
-        temperature=0,      # Saída determinística
+        model=config.name,
+        format=config.format,            # "json" garante saída JSON para ferramentas
+        temperature=config.temperature,  # 0 = saída determinística
+        num_ctx=config.num_ctx,
+        keep_alive=config.keep_alive,    # Mantém o modelo carregado entre perguntas
+        client_kwargs=client_kwargs,
     )
 
 
-
-def build_agent(model_name: str = "llama3.2") -> Any:
+def build_agent(
+    model_name: Union[str, ModelConfig] = "llama3.2",
+    max_connections: Optional[int] = None,
+    prune_tools: bool = True,
+    selection_model: Union[str, ModelConfig, None] = None,
+) -> Any:
     """
     Vincula as ferramentas ao modelo e retorna o agente.
+
+    Com `prune_tools`, o agente é um `PrunedToolAgent`: cada pergunta vincula
+    só as ferramentas relevantes (ver `tool_selection`), o que encurta o
+    prompt das duas chamadas ao LLM. Sem ele, todas são vinculadas sempre.
+
+    Com `selection_model` (ex.: "llama3.2:1b"), o agente é um `TieredAgent`:
+    esse modelo escolhe a ferramenta e `model_name` redige a resposta,
+    refazendo a seleção quando o modelo pequeno não devolve uma chamada
+    válida (ver `model_tiers`).
     """
-    model = build_model(model_name)
     tools = list(TOOL_REGISTRY.values())
-    return model.bind_tools(tools)
 
-def dispatch_tool_calls(res: Any, messages: List[Any]) -> None:
+    def bind(config: Union[str, ModelConfig], selector: Any = None) -> Any:
+        model = build_model(config, max_connections=max_connections, timeout=LLM_GUARD.call_timeout)
+        if prune_tools:
+            return PrunedToolAgent(model, tools, selector=selector)
+        return model.bind_tools(tools)
+
+    agent = bind(model_name)
+    if selection_model is None:
+        return agent
+    return TieredAgent(bind(selection_model, selector=getattr(agent, "selector", None)), agent, tools)
+
+
+def configure_tool_executor(max_concurrency: int, calls_per_request: int = TOOL_CALLS_PER_REQUEST) -> None:
     """
-    Itera sobre chamadas de ferramentas sugeridas pelo LLM, executa cada uma e
-    anexa o resultado ao histórico de mensagens.
+    Dimensiona `TOOL_EXECUTOR` pelo limite de requisições simultâneas (ex.:
+    `--max-concurrency` do servidor ou `--concurrency` do modo batch), para
+    que requisições admitidas não esperem por workers. O pool anterior
+    termina as chamadas em andamento.
     """
+    global TOOL_EXECUTOR, TOOL_WORKERS
+    previous = TOOL_EXECUTOR
+    TOOL_WORKERS = max(1, max_concurrency * calls_per_request)
+    TOOL_EXECUTOR = ThreadPoolExecutor(max_workers=TOOL_WORKERS, thread_name_prefix="tool")
+    previous.shutdown(wait=False)
+
+
+def _abandon(future: Future) -> None:
+    """
+    Desiste de uma chamada que passou do timeout: cancelada se ainda está na
+    fila; senão acompanhada em `_ABANDONED_TOOLS` até terminar.
+    """
+    if future.cancel():
+        return
+    with _ABANDONED_LOCK:
+        _ABANDONED_TOOLS.add(future)
+
+    def release(done: Future) -> None:
+        with _ABANDONED_LOCK:
+            _ABANDONED_TOOLS.discard(done)
+
+    future.add_done_callback(release)
+
+
+def tool_executor_stats() -> Dict[str, int]:
+    """Workers de `TOOL_EXECUTOR` e chamadas abandonadas que ainda os ocupam."""
+    with _ABANDONED_LOCK:
+        abandoned = len(_ABANDONED_TOOLS)
+    return {"workers": TOOL_WORKERS, "abandoned": abandoned}
+
+
+def _run_tool(
+    name: str,
+    fn: Any,
+    tool_call: Any,
+    args: Any,
+    call_id: Optional[str],
+    cache: Optional[ToolResultCache],
+    span: Optional[Span] = None,
+) -> Any:
+    """
+    Executa uma ferramenta (ou reaproveita o resultado em cache) e devolve a
+    ToolMessage com o `tool_call_id` desta chamada.
+
+    `span`, se passado, é marcado com o início e a duração da execução.
+    """
+    if span is not None:
+        span.start = time.perf_counter()
+    try:
+        if cache is None:
+            return fn.invoke(tool_call)
+        tool_msg = cache.get_or_compute(
+            name, args, TOOL_DATASETS.get(name, DATASET).version, lambda: fn.invoke(tool_call)
+        )
+        if isinstance(tool_msg, ToolMessage) and tool_msg.tool_call_id != call_id:
+            tool_msg = tool_msg.model_copy(update={"tool_call_id": call_id})
+        return tool_msg
+    finally:
+        if span is not None:
+            span.duration = time.perf_counter() - span.start
+
+
+def _tool_error(name: str, call_id: Optional[str], detail: str) -> ToolMessage:
+    """ToolMessage de erro, para o LLM explicar a falha em vez de travar o turno."""
+    return ToolMessage(
+        content=json.dumps({"error": detail}, ensure_ascii=False),
+        name=name,
+        tool_call_id=call_id or "",
+        status="error",
+    )
+
+
+def _parse_tool_calls(res: Any) -> List[Tuple[str, Any, Any, Any, Optional[str]]]:
+    """
+    Extrai (nome, função, tool_call, argumentos, id) de cada chamada de
+    ferramenta de `res`, ignorando ferramentas fora da registry.
+    """
+    calls = []
     for tool_call in getattr(res, "tool_calls", []):
         # Nome da ferramenta
         name = (
@@ -61,6 +260,7 @@ def dispatch_tool_calls(res: Any, messages: List[Any]) -> None:
         fn = TOOL_REGISTRY.get(name)
         if fn is None:
             LOGGER.error("Tool '%s' not found in registry", name)
+            METRICS.tool_calls.inc(tool=name, status="unknown")
             continue
 
         # Extrai argumentos (pode ser dict ou JSON string)
@@ -78,49 +278,684 @@ def dispatch_tool_calls(res: Any, messages: List[Any]) -> None:
                 LOGGER.warning("Could not parse arguments for tool '%s'", name)
                 args = {}
 
-        # PRINT DE DEBUG: função e argumentos extraídos
-        print(f"[DEBUG] Function identified: {name}, arguments: {args}")
+        LOGGER.debug("Function identified: %s, arguments: %s", name, args)
+
+        call_id = (
+            tool_call.get("id") if isinstance(tool_call, dict)
+            else getattr(tool_call, "id", None)
+        )
+        calls.append((name, fn, tool_call, args, call_id))
+    return calls
+
 
-        # Invoca a ferramenta
-        tool_msg = fn.invoke(tool_call)
+def dispatch_tool_calls(
+    res: Any,
+    messages: List[Any],
+    cache: Optional[ToolResultCache] = TOOL_CACHE,
+    timeouts: Optional[Dict[str, float]] = None,
+) -> None:
+    """
+    Itera sobre chamadas de ferramentas sugeridas pelo LLM, executa cada uma e
+    anexa o resultado ao histórico de mensagens.
+
+    Resultados são reaproveitados de `cache` quando a mesma ferramenta já foi
+    chamada com os mesmos argumentos sobre a mesma versão do dataset.
+
+    Várias chamadas no mesmo turno rodam em paralelo em `TOOL_EXECUTOR`; as
+    ToolMessages são anexadas na ordem original. Uma ferramenta que falha ou
+    passa do seu timeout (`timeouts`, padrão `TOOL_TIMEOUTS`) vira uma
+    ToolMessage de erro sem afetar as demais; a chamada é cancelada se ainda
+    não começou, ou contada em `tool_executor_stats` até terminar.
+
+    No trace ativo, registra o span "parse_args" e um span "tool" por
+    chamada, e conta as chamadas em `chatbot_tool_calls_total`.
+    """
+    timeouts = TOOL_TIMEOUTS if timeouts is None else timeouts
+    trace = current_trace()
+    with maybe_span("parse_args", parent="tools"):
+        calls = _parse_tool_calls(res)
+
+    # Submete todas as chamadas antes de esperar por qualquer uma
+    spans = [Span("tool", parent="tools", tool=name) for name, *_ in calls]
+    futures = [
+        TOOL_EXECUTOR.submit(_run_tool, name, fn, tool_call, args, call_id, cache, span)
+        for (name, fn, tool_call, args, call_id), span in zip(calls, spans)
+    ]
+    started = time.monotonic()
+    for (name, _, _, _, call_id), future, span in zip(calls, futures, spans):
+        deadline = started + timeouts.get(name, DEFAULT_TOOL_TIMEOUT)
+        try:
+            tool_msg = future.result(timeout=max(0.0, deadline - time.monotonic()))
+            if getattr(tool_msg, "status", "success") == "error":
+                span.status = "error"
+        except FutureTimeoutError:
+            LOGGER.error("Tool '%s' timed out", name)
+            _abandon(future)
+            tool_msg = _tool_error(name, call_id, "A ferramenta excedeu o tempo limite.")
+            span.status = "timeout"
+        except Exception as exc:
+            LOGGER.exception("Tool '%s' failed", name)
+            tool_msg = _tool_error(name, call_id, str(exc))
+            span.status = "error"
+            span.set(error=f"{type(exc).__name__}: {exc}")
+        if cache is not None:
+            LOGGER.debug("Tool cache: %s", cache.stats())
+        METRICS.tool_calls.inc(tool=name, status=span.status)
+        if trace is not None:
+            trace.finish_span(span)
         messages.append(tool_msg)
 
 
+SYSTEM_PROMPT = """
+    Você é um assistente de saúde pública e um chatbot amigável.
+    Quando receber o resultado de uma ferramenta em JSON, **não devolva o JSON cru**:
+    - Interprete e explique em linguagem natural em português.
+    - Use tom acolhedor: “Claro! …”, “Com certeza! …”, “Veja só: …”.
+    - Seja direto na resposta principal e dê contexto breve.
+    """
+
+
+def _route_message(route: Any) -> AIMessage:
+    """AIMessage com a chamada de ferramenta escolhida pelo roteador."""
+    return AIMessage(
+        content="",
+        tool_calls=[{
+            "name": route.tool,
+            "args": route.args,
+            "id": f"route-{uuid.uuid4().hex[:12]}",
+        }],
+    )
+
+
+def _wait_for_dataset(trace: Trace) -> None:
+    """
+    Espera a carga dos dados (iniciada por `warm_async`) no span
+    "data_load". Uma falha é registrada e fica para as ferramentas, que a
+    devolvem como ToolMessage de erro.
+    """
+    try:
+        with trace.span("data_load", already_loaded=DATASET.loaded):
+            DATASET.get()
+    except Exception:
+        LOGGER.exception("Falha ao carregar o dataset '%s'", DATASET.name)
+
+
+def _start_messages(prompt: str, memory: Optional[ConversationMemory]) -> List[Any]:
+    """Mensagens iniciais do turno: só sistema e pergunta, ou o histórico da memória."""
+    if memory is None:
+        return [SystemMessage(SYSTEM_PROMPT), HumanMessage(prompt)]
+    return memory.messages_for(SYSTEM_PROMPT, prompt)
+
+
+def _select_tools(agent: Any, prompt: str, trace: Trace, prune: bool) -> Tuple[Any, Optional[ToolSelection]]:
+    """
+    Vínculo com as ferramentas relevantes para `prompt` (span
+    "tool_pruning"), se `agent` for um `PrunedToolAgent` (ou um
+    `TieredAgent` sobre eles); senão o próprio `agent`, sem seleção.
+    """
+    pruned = agent.synthesis if isinstance(agent, TieredAgent) else agent
+    if not prune or not isinstance(pruned, PrunedToolAgent):
+        return agent, None
+    with trace.span("tool_pruning") as span:
+        bound, selection = agent.for_prompt(prompt)
+        span.set(tools=list(selection.tools), pruned=selection.pruned, score=round(selection.score, 3))
+    return bound, selection
+
+
+def _record_pruning(trace: Trace, selection: Optional[ToolSelection], responses: List[Any]) -> None:
+    """
+    Registra no trace os tokens de schema enviados e poupados nas chamadas ao
+    LLM que geraram `responses` e, se o modelo informa a taxa de
+    processamento do prompt, a variação estimada de latência
+    (`latency_delta_ms`: custo da seleção menos o tempo de prompt poupado;
+    negativa quando a poda acelera a resposta).
+    """
+    if selection is None:
+        return
+    sent = selection.schema_tokens * len(responses)
+    saved = selection.saved_tokens * len(responses)
+    trace.attributes.update(tools_bound=len(selection.tools), schema_tokens=sent, schema_tokens_saved=saved)
+    METRICS.tool_schema_tokens.inc(sent, kind="sent")
+    METRICS.tool_schema_tokens.inc(saved, kind="saved")
+    rates = [r for r in map(prefill_seconds_per_token, responses) if r is not None]
+    if rates:
+        saved_seconds = sum(selection.saved_tokens * rate for rate in rates)
+        cost = trace.durations().get("tool_pruning", 0.0)
+        trace.attributes["latency_delta_ms"] = round((cost - saved_seconds) * 1000, 3)
+
+
+def _template_answer(
+    templates: Optional[AnswerTemplates], messages: List[Any], prompt: str, request: Any,
+) -> Optional[AIMessage]:
+    """
+    Resposta final por template, ou None para a síntese pelo LLM.
+
+    O template descreve o que a ferramenta calcula, não a pergunta; só é
+    usado quando o vocabulário de cada ferramenta chamada em `request` cobre
+    a pergunta inteira (`router.covers`), venha a chamada do roteador ou do
+    LLM. Nos outros casos o LLM vê o resultado junto com a pergunta e pode
+    apontar a diferença (outro município, período ou doença).
+    """
+    calls = getattr(request, "tool_calls", None) or []
+    if templates is None or not calls or not all(covers(call["name"], prompt) for call in calls):
+        return None
+    answer = templates.render(messages)
+    return None if answer is None else AIMessage(answer)
+
+
+def _call_llm(guard: Optional[LLMGuard], deadline: Optional[Deadline], fn: Any) -> Any:
+    """Chamada ao LLM com os limites de `guard` (ou direta, sem guard)."""
+    return fn() if guard is None else guard.call(fn, deadline)
+
+
+async def _acall_llm(guard: Optional[LLMGuard], deadline: Optional[Deadline], fn: Any) -> Any:
+    """Versão assíncrona de `_call_llm`; `fn()` devolve uma corrotina."""
+    return await (fn() if guard is None else guard.acall(fn, deadline))
+
+
+def _record_phase(phase: str, model: str, started: float) -> None:
+    seconds = time.perf_counter() - started
+    PHASE_STATS.record(phase, model, seconds)
+    METRICS.llm_call_seconds.observe(seconds, phase=phase, model=model)
+
+
+def _timed_call(phase: str, model: str, guard: Optional[LLMGuard], deadline: Optional[Deadline], fn: Any) -> Any:
+    """`_call_llm` com a latência registrada por fase e modelo (`PHASE_STATS`)."""
+    started = time.perf_counter()
+    result = _call_llm(guard, deadline, fn)
+    _record_phase(phase, model, started)
+    return result
+
+
+async def _atimed_call(phase: str, model: str, guard: Optional[LLMGuard], deadline: Optional[Deadline], fn: Any) -> Any:
+    """Versão assíncrona de `_timed_call`."""
+    started = time.perf_counter()
+    result = await _acall_llm(guard, deadline, fn)
+    _record_phase(phase, model, started)
+    return result
+
+
+def _escalate(agent: TieredAgent, span: Span, reason: Optional[str]) -> bool:
+    """
+    Registra o resultado da seleção pelo modelo pequeno ("accepted" ou o
+    motivo) e diz se ela deve ser refeita pelo modelo de síntese.
+    """
+    outcome = reason or "accepted"
+    PHASE_STATS.record_selection(agent.selection_name, outcome)
+    METRICS.tool_selection.inc(model=agent.selection_name, outcome=outcome)
+    span.set(model=agent.selection_name if reason is None else agent.synthesis_name)
+    if reason is not None:
+        span.set(escalated=reason)
+        LOGGER.info("Seleção escalada de %s para %s (%s)", agent.selection_name, agent.synthesis_name, reason)
+    return reason is not None
+
+
+def _llm_selection(
+    agent: Any, messages: List[Any], guard: Optional[LLMGuard], deadline: Optional[Deadline], span: Span,
+) -> List[Any]:
+    """
+    Chamadas ao LLM para escolher a ferramenta; a última resposta é a usada.
+
+    Com um `TieredAgent`, o modelo de seleção tenta primeiro; se a resposta
+    não tiver uma chamada de ferramenta válida, ou o modelo falhar, a seleção
+    é refeita pelo modelo de síntese (atributo `escalated` do span).
+    """
+    if not isinstance(agent, TieredAgent):
+        model = model_label(agent)
+        span.set(model=model)
+        return [_timed_call(SELECTION, model, guard, deadline, lambda: agent.invoke(messages))]
+    responses: List[Any] = []
+    try:
+        responses.append(_timed_call(
+            SELECTION, agent.selection_name, guard, deadline, lambda: agent.selection.invoke(messages)
+        ))
+        reason = agent.problem(responses[-1])
+    except LLMUnavailable as exc:
+        if exc.reason not in ESCALATE_ON_UNAVAILABLE:
+            raise
+        reason = exc.reason
+    if _escalate(agent, span, reason):
+        responses.append(_timed_call(
+            SELECTION, agent.synthesis_name, guard, deadline, lambda: agent.synthesis.invoke(messages)
+        ))
+    return responses
+
+
+async def _allm_selection(
+    agent: Any, messages: List[Any], guard: Optional[LLMGuard], deadline: Optional[Deadline], span: Span,
+) -> List[Any]:
+    """Versão assíncrona de `_llm_selection`."""
+    if not isinstance(agent, TieredAgent):
+        model = model_label(agent)
+        span.set(model=model)
+        return [await _atimed_call(SELECTION, model, guard, deadline, lambda: agent.ainvoke(messages))]
+    responses: List[Any] = []
+    try:
+        responses.append(await _atimed_call(
+            SELECTION, agent.selection_name, guard, deadline, lambda: agent.selection.ainvoke(messages)
+        ))
+        reason = agent.problem(responses[-1])
+    except LLMUnavailable as exc:
+        if exc.reason not in ESCALATE_ON_UNAVAILABLE:
+            raise
+        reason = exc.reason
+    if _escalate(agent, span, reason):
+        responses.append(await _atimed_call(
+            SELECTION, agent.synthesis_name, guard, deadline, lambda: agent.synthesis.ainvoke(messages)
+        ))
+    return responses
+
+
+def _mark_degraded(trace: Trace, span: Span, exc: LLMUnavailable) -> None:
+    """Marca o span e o trace como respondidos em modo degradado."""
+    span.status = "timeout" if exc.reason in ("timeout", "deadline") else "error"
+    span.set(source="degraded", reason=exc.reason)
+    trace.attributes["degraded"] = exc.reason
+    METRICS.degraded.inc(stage=span.name, reason=exc.reason)
+
+
+def _degraded_route(router: Optional[IntentRouter], prompt: str) -> AIMessage:
+    """
+    Chamada de ferramenta sem o LLM: a rota do roteador com limiar menor, ou
+    uma mensagem sem chamadas (a resposta será `UNAVAILABLE_ANSWER`).
+    """
+    route = router.route(prompt, threshold=DEGRADED_ROUTER_THRESHOLD) if router is not None else None
+    return _route_message(route) if route is not None else AIMessage(content="")
+
+
+def _degraded_text(templates: Optional[AnswerTemplates], messages: List[Any], gate: Optional[GatedCallback]) -> str:
+    """
+    Resposta degradada (ver `AnswerTemplates.degraded_answer`); se parte da
+    resposta do LLM já foi transmitida, o texto vem depois de uma linha em
+    branco.
+    """
+    text = (templates or TEMPLATES).degraded_answer(messages)
+    return "\n\n" + text if gate is not None and gate.emitted else text
+
+
+def _finish_synthesis(span: Span, source: str) -> None:
+    span.set(source=source)
+    METRICS.synthesis.inc(source=source)
+
+
+def _remember(memory: Optional[ConversationMemory], messages: List[Any], trace: Trace) -> None:
+    """Guarda o turno na memória, com o tamanho estimado do prompt da resposta final."""
+    if memory is None:
+        return
+    prompt_tokens = count_tokens(messages[:-1])
+    trace.attributes["prompt_tokens"] = prompt_tokens
+    turn_start = max(i for i, m in enumerate(messages) if isinstance(m, HumanMessage))
+    memory.add_turn(messages[turn_start:], prompt_tokens=prompt_tokens)
+
+
+class _Effect(NamedTuple):
+    """
+    Passo de E/S pedido por `_pipeline` ao executor: `kind` é uma de
+    `_SELECT`, `_WAIT_DATASET`, `_RUN_TOOLS`, `_SYNTHESIZE` ou `_EMIT`.
+    """
+    kind: str
+    args: Tuple[Any, ...] = ()
+
+
+# Escolha da ferramenta pelo LLM (agente, span) -> respostas
+_SELECT = "select"
+# Espera da carga dos dados (trace)
+_WAIT_DATASET = "wait_dataset"
+# Execução das chamadas de ferramenta (mensagem com as chamadas)
+_RUN_TOOLS = "run_tools"
+# Resposta final pelo LLM (agente) -> mensagem
+_SYNTHESIZE = "synthesize"
+# Texto pronto para `on_token` (cache, template ou modo degradado)
+_EMIT = "emit"
+
+_Pipeline = Generator[_Effect, Any, Tuple[str, List[Any]]]
+
+
+def _pipeline(
+    agent: Any,
+    prompt: str,
+    messages: List[Any],
+    gate: Optional[GatedCallback],
+    use_function_calling: bool,
+    warm_dataset: bool,
+    answer_cache: Optional[AnswerCache],
+    router: Optional[IntentRouter],
+    memory: Optional[ConversationMemory],
+    templates: Optional[AnswerTemplates],
+    stages: Optional[Dict[str, float]] = None,
+) -> _Pipeline:
+    """
+    Etapas de uma resposta (ver `get_response`), sem E/S: cada chamada ao
+    LLM, às ferramentas ou a `on_token` é pedida ao executor com `yield
+    _Effect(...)`, e o resultado (ou a exceção) volta por `send`/`throw`.
+    `get_response` e `aget_response` só diferem no executor.
+
+    Returns:
+        Tuple (conteúdo final, histórico de mensagens)
+    """
+    prune = memory is None or not memory.has_history
+    if not prune:
+        answer_cache = router = None
+
+    def degrade(span: Span, exc: LLMUnavailable) -> Generator[_Effect, Any, AIMessage]:
+        _mark_degraded(trace, span, exc)
+        if gate is not None:
+            gate.close()
+        text = _degraded_text(templates, messages, gate)
+        yield _Effect(_EMIT, (text,))
+        return AIMessage(text.lstrip("\n"))
+
+    with start_trace("get_response", function_calling=use_function_calling) as trace:
+        try:
+            if not use_function_calling:
+                with trace.span("synthesis") as span:
+                    try:
+                        non_fc_res = yield _Effect(_SYNTHESIZE, (agent,))
+                        span.record_usage(non_fc_res)
+                    except LLMUnavailable as exc:
+                        non_fc_res = yield from degrade(span, exc)
+                messages.append(non_fc_res)
+                _remember(memory, messages, trace)
+                return non_fc_res.content, messages
+
+            if answer_cache is not None:
+                with trace.span("answer_cache") as span:
+                    cached = answer_cache.lookup(prompt, version=DATASET.version)
+                    span.set(hit=cached is not None)
+                if cached is not None:
+                    yield _Effect(_EMIT, (cached.answer,))
+                    messages.append(AIMessage(cached.answer))
+                    _remember(memory, messages, trace)
+                    return cached.answer, messages
+
+            if warm_dataset:
+                DATASET.warm_async()
+
+            agent, selection = _select_tools(agent, prompt, trace, prune)
+            llm_responses: List[Any] = []
+            degraded: Optional[LLMUnavailable] = None
+            with trace.span("tool_selection") as span:
+                route = router.route(prompt) if router is not None else None
+                if route is not None:
+                    # Caminho rápido: a chamada de ferramenta vem do roteador
+                    first_res = _route_message(route)
+                    span.set(source="router", tool=route.tool)
+                else:
+                    # Primeira invocação para detectar tool calls
+                    try:
+                        responses = yield _Effect(_SELECT, (agent, span))
+                        llm_responses.extend(responses)
+                        first_res = responses[-1]
+                        span.set(source="llm")
+                        for res in responses:
+                            span.record_usage(res)
+                    except LLMUnavailable as exc:
+                        degraded = exc
+                        _mark_degraded(trace, span, exc)
+                        first_res = _degraded_route(router, prompt)
+            messages.append(first_res)
+
+            # Executa e anexa resultados das ferramentas
+            if getattr(first_res, "tool_calls", None):
+                yield _Effect(_WAIT_DATASET, (trace,))
+            with trace.span("tools", calls=len(getattr(first_res, "tool_calls", None) or [])):
+                yield _Effect(_RUN_TOOLS, (first_res,))
+
+            # Resposta final: template para resultados simples, senão LLM +
+            # resultados de ferramentas (ou modo degradado, sem o LLM)
+            with trace.span("synthesis") as span:
+                final_res = _template_answer(templates, messages, prompt, first_res)
+                if final_res is not None:
+                    _finish_synthesis(span, "template")
+                    yield _Effect(_EMIT, (final_res.content,))
+                elif degraded is not None:
+                    final_res = yield from degrade(span, degraded)
+                    _finish_synthesis(span, "degraded")
+                else:
+                    try:
+                        final_res = yield _Effect(_SYNTHESIZE, (agent,))
+                        llm_responses.append(final_res)
+                        span.set(model=model_label(agent))
+                        span.record_usage(final_res)
+                        _finish_synthesis(span, "llm")
+                    except LLMUnavailable as exc:
+                        degraded = exc
+                        final_res = yield from degrade(span, exc)
+                        _finish_synthesis(span, "degraded")
+            messages.append(final_res)
+            _record_pruning(trace, selection, llm_responses)
+            if (
+                answer_cache is not None and degraded is None and final_res.content
+                and _has_tool_data(messages, first_res)
+            ):
+                answer_cache.store(prompt, final_res.content, version=DATASET.version)
+            _remember(memory, messages, trace)
+            return final_res.content, messages
+        finally:
+            if stages is not None:
+                stages.update(trace.durations())
+
+
+def _drive(steps: _Pipeline, perform: Callable[[_Effect], Any]) -> Tuple[str, List[Any]]:
+    """
+    Executa `_pipeline` de forma síncrona. Exceções de um passo voltam ao
+    pipeline, para que os spans e o trace as registrem.
+    """
+    result: Any = None
+    error: Optional[BaseException] = None
+    while True:
+        try:
+            effect = steps.send(result) if error is None else steps.throw(error)
+        except StopIteration as stop:
+            return stop.value
+        result, error = None, None
+        try:
+            result = perform(effect)
+        except BaseException as exc:
+            error = exc
+
+
+async def _adrive(steps: _Pipeline, perform: Callable[[_Effect], Awaitable[Any]]) -> Tuple[str, List[Any]]:
+    """Versão assíncrona de `_drive`: cada passo é aguardado no event loop."""
+    result: Any = None
+    error: Optional[BaseException] = None
+    while True:
+        try:
+            effect = steps.send(result) if error is None else steps.throw(error)
+        except StopIteration as stop:
+            return stop.value
+        result, error = None, None
+        try:
+            result = await perform(effect)
+        except BaseException as exc:
+            error = exc
+
+
 def get_response(
     agent: Any,
     prompt: str,
-    use_function_calling: bool = True
+    use_function_calling: bool = True,
+    warm_dataset: bool = True,
+    answer_cache: Optional[AnswerCache] = ANSWER_CACHE,
+    router: Optional[IntentRouter] = ROUTER,
+    on_token: Optional[TokenCallback] = None,
+    memory: Optional[ConversationMemory] = None,
+    templates: Optional[AnswerTemplates] = TEMPLATES,
+    guard: Optional[LLMGuard] = LLM_GUARD,
 ) -> Tuple[str, List[Any]]:
     """
     Executa a conversa com ou sem Function Calling, retornando
     o conteúdo final e o histórico de mensagens.
+
+    Com `on_token`, a resposta final é transmitida em streaming: cada pedaço
+    gerado é passado ao callback assim que chega, e TTFT/tokens por segundo
+    ficam em `response_metadata["stream_stats"]` da última mensagem. A
+    seleção de ferramentas continua sem streaming, em modo JSON.
+
+    Com `warm_dataset`, os dados começam a ser carregados em segundo plano
+    enquanto o LLM escolhe a ferramenta. Com Function Calling, perguntas
+    equivalentes a uma já respondida com dados de ferramentas são servidas
+    por `answer_cache` sem chamar o LLM, e perguntas reconhecidas por
+    `router` vão direto para a ferramenta, sem a primeira chamada ao LLM. Resultados simples de uma só
+    ferramenta viram a resposta final por `templates`, sem a segunda.
+
+    Com `memory`, o prompt inclui o resumo e os turnos recentes da conversa,
+    e o turno é guardado ao final. Havendo histórico, a pergunta pode ser de
+    seguimento ("e para Canoas?"), então o cache de respostas, o roteador e a
+    poda de ferramentas (que olham só a pergunta) não são usados.
+
+    Se `agent` for um `PrunedToolAgent`, as chamadas ao LLM vinculam só as
+    ferramentas relevantes para a pergunta; os tokens de schema poupados e a
+    variação estimada de latência ficam nos atributos do trace. Se for um
+    `TieredAgent`, a ferramenta é escolhida pelo modelo pequeno, com
+    escalonamento para o modelo de síntese (ver `_llm_selection`); a
+    latência de cada chamada fica em `PHASE_STATS`, por fase e modelo.
+
+    Com `guard`, cada chamada ao LLM tem timeout e a requisição um prazo
+    total, e um circuit breaker corta as chamadas quando o modelo está
+    falhando ou lento (ver `resilience`). Se o LLM não escolher a
+    ferramenta a tempo, o roteador tenta com limiar menor; se não redigir a
+    resposta, ela sai das ferramentas (templates ou dados formatados). O
+    trace fica com o atributo `degraded` (motivo) nesses casos.
+
+    Cada etapa é medida num span do trace da resposta (ver `tracing`); as
+    etapas ficam em `_pipeline`, compartilhadas com `aget_response`.
     """
-    # Mensagens iniciais
-    system_prompt = """
-    Você é um assistente de saúde pública e um chatbot amigável.
-    Quando receber o resultado de uma ferramenta em JSON, **não devolva o JSON cru**:
-    - Interprete e explique em linguagem natural em português.
-    - Use tom acolhedor: “Claro! …”, “Com certeza! …”, “Veja só: …”.
-    - Seja direto na resposta principal e dê contexto breve.
+    messages: List[Any] = _start_messages(prompt, memory)
+    deadline = guard.deadline() if guard is not None else None
+    gate = GatedCallback(on_token) if on_token is not None else None
+
+    def perform(effect: _Effect) -> Any:
+        if effect.kind == _SELECT:
+            selector, span = effect.args
+            return _llm_selection(selector, messages, guard, deadline, span)
+        if effect.kind == _WAIT_DATASET:
+            return _wait_for_dataset(*effect.args)
+        if effect.kind == _RUN_TOOLS:
+            return dispatch_tool_calls(effect.args[0], messages)
+        if effect.kind == _SYNTHESIZE:
+            final_agent = effect.args[0]
+            model = model_label(final_agent)
+            if gate is not None:
+                return _timed_call(
+                    SYNTHESIS, model, guard, deadline, lambda: stream_final(final_agent, messages, gate)[0]
+                )
+            return _timed_call(SYNTHESIS, model, guard, deadline, lambda: final_agent.invoke(messages))
+        if on_token is not None:
+            on_token(effect.args[0])
+        return None
+
+    steps = _pipeline(
+        agent, prompt, messages, gate, use_function_calling, warm_dataset,
+        answer_cache, router, memory, templates,
+    )
+    return _drive(steps, perform)
+
+
+async def aget_response(
+    agent: Any,
+    prompt: str,
+    use_function_calling: bool = True,
+    warm_dataset: bool = True,
+    answer_cache: Optional[AnswerCache] = ANSWER_CACHE,
+    router: Optional[IntentRouter] = ROUTER,
+    on_token: Optional[TokenCallback] = None,
+    stages: Optional[Dict[str, float]] = None,
+    memory: Optional[ConversationMemory] = None,
+    templates: Optional[AnswerTemplates] = TEMPLATES,
+    guard: Optional[LLMGuard] = LLM_GUARD,
+) -> Tuple[str, List[Any]]:
     """
-    messages: List[Any] = [SystemMessage(system_prompt), HumanMessage(prompt)]
+    Versão assíncrona de `get_response`: as chamadas ao LLM usam `ainvoke`
+    (ou `astream`, com `on_token`) e as ferramentas (pandas, bloqueantes)
+    rodam fora do event loop. `on_token` pode ser uma corrotina.
 
-    if use_function_calling:
-        # Primeira invocação para detectar tool calls
-        first_res = agent.invoke(messages)
-        messages.append(first_res)
+    Se `stages` for passado, recebe a duração em segundos de cada etapa
+    executada ("answer_cache", "tool_pruning", "tool_selection", "data_load",
+    "tools", "synthesis"). `memory`, `templates` e `guard` funcionam como em
+    `get_response`; o timeout cancela a chamada ao LLM em andamento.
+    """
+    messages: List[Any] = _start_messages(prompt, memory)
+    deadline = guard.deadline() if guard is not None else None
+    gate = GatedCallback(on_token) if on_token is not None else None
 
-        # Executa e anexa resultados das ferramentas
-        dispatch_tool_calls(first_res, messages)
+    async def perform(effect: _Effect) -> Any:
+        if effect.kind == _SELECT:
+            selector, span = effect.args
+            return await _allm_selection(selector, messages, guard, deadline, span)
+        if effect.kind == _WAIT_DATASET:
+            return await asyncio.to_thread(_wait_for_dataset, *effect.args)
+        if effect.kind == _RUN_TOOLS:
+            return await asyncio.to_thread(dispatch_tool_calls, effect.args[0], messages)
+        if effect.kind == _SYNTHESIZE:
+            final_agent = effect.args[0]
+            model = model_label(final_agent)
+            if gate is not None:
+                async def stream() -> Any:
+                    message, _ = await astream_final(final_agent, messages, gate)
+                    return message
+                return await _atimed_call(SYNTHESIS, model, guard, deadline, stream)
+            return await _atimed_call(SYNTHESIS, model, guard, deadline, lambda: final_agent.ainvoke(messages))
+        if on_token is not None:
+            result = on_token(effect.args[0])
+            if asyncio.iscoroutine(result):
+                await result
+        return None
 
-        # Resposta final combinando LLM + resultados de ferramentas
-        final_res = agent.invoke(messages)
-        messages.append(final_res)
-        return final_res.content, messages
-    else:
-        non_fc_res = agent.invoke(messages)
-        messages.append(non_fc_res)
-        return non_fc_res.content, messages
+    steps = _pipeline(
+        agent, prompt, messages, gate, use_function_calling, warm_dataset,
+        answer_cache, router, memory, templates, stages,
+    )
+    return await _adrive(steps, perform)
+
+
+def _has_tool_data(messages: List[Any], request: Any) -> bool:
+    """
+    Se a resposta do turno se apoia em dados: `request` chamou ferramentas e
+    todas devolveram um resultado sem erro. Só essas respostas vão para o
+    cache de respostas; "Não sei responder a isso." ou uma explicação de
+    falha não devem ser servidas a perguntas futuras.
+    """
+    ids = {call.get("id") for call in getattr(request, "tool_calls", None) or []}
+    if not ids:
+        return False
+    results = [m for m in messages if isinstance(m, ToolMessage) and m.tool_call_id in ids]
+    if len(results) < len(ids):
+        return False
+    for msg in results:
+        if getattr(msg, "status", "success") == "error":
+            return False
+        try:
+            content = json.loads(msg.content)
+        except (TypeError, ValueError):
+            content = msg.content
+        if not content or (isinstance(content, dict) and "error" in content):
+            return False
+    return True
+
+
+def collect_tool_calls(messages: List[Any]) -> List[Dict[str, Any]]:
+    """Ferramentas chamadas numa conversa, como [{"name", "args"}, ...]."""
+    calls = []
+    for msg in messages:
+        for call in getattr(msg, "tool_calls", None) or []:
+            calls.append({"name": call["name"], "args": call.get("args", {})})
+    return calls
+
+
+_DEFAULT_AGENT: Optional[Any] = None
+
+
+def run_agent(prompt: str) -> str:
+    """
+    Responde `prompt` com Function Calling usando um agente padrão criado
+    uma única vez por processo.
+    """
+    global _DEFAULT_AGENT
+    if _DEFAULT_AGENT is None:
+        _DEFAULT_AGENT = build_agent()
+    answer, _ = get_response(_DEFAULT_AGENT, prompt, use_function_calling=True)
+    return answer
 
 
 def interactive_loop(agent: Any) -> None:
@@ -128,14 +963,20 @@ def interactive_loop(agent: Any) -> None:
     Modo REPL de terminal: lê prompts do usuário até 'exit' ou 'quit'.
     """
     print("Iniciando modo interativo (digite 'exit' para sair)")
+    memory = ConversationMemory()
     while True:
         try:
             user_input = input("Você: ").strip()
             if user_input.lower() in ("exit", "quit"):
                 print("Encerrando.")
                 break
-            answer, _ = get_response(agent, user_input, use_function_calling=True)
-            print(f"Assistente: {answer}\n")
+            print("Assistente: ", end="", flush=True)
+            get_response(
+                agent, user_input, use_function_calling=True,
+                on_token=lambda token: print(token, end="", flush=True),
+                memory=memory,
+            )
+            print("\n")
         except KeyboardInterrupt:
             print("\nEncerrando por interrupt.")
             break
@@ -166,10 +1007,11 @@ def main() -> None:
     else:
         if not args.prompt:
             parser.error("É necessário passar --prompt ou usar --interactive.")
-        answer, _ = get_response(
-            agent, args.prompt, use_function_calling=args.function_calling
+        get_response(
+            agent, args.prompt, use_function_calling=args.function_calling,
+            on_token=lambda token: print(token, end="", flush=True),
         )
-        print(answer)
+        print()
 
 
 if __name__ == "__main__":
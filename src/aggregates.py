@@ -0,0 +1,281 @@
+"""
+Agregados resumidos do SUS, calculados em memória ou em streaming
+(out-of-core) e mantidos pelo armazenamento incremental de `ingest.py`:
+
+- histograma de idades (internações respiratórias; todas, se não houver
+  nenhuma respiratória);
+- contagem de internações respiratórias por cidade;
+- o cubo cidade × CID × ano × mês × idade × sexo de `cube.build_cube_frame`,
+  base das colunas codificadas que as ferramentas consultam (`columnar.py`).
+
+Todos são somas, então podem ser calculados bloco a bloco: no modo
+`chunked` o CSV é lido em blocos de `DEFAULT_CHUNK_ROWS` linhas, cada bloco
+passa por `prepare_sus` e é agregado e somado ao total. O pico de memória
+depende do tamanho do bloco e da cardinalidade dos agregados, não do
+tamanho do arquivo. O modo `memory` (padrão) agrega o DataFrame completo de
+`load_sus` com o mesmo código, então os dois modos dão o mesmo resultado.
+
+O modo vem da variável de ambiente `INGEST_MODE_ENV`; os agregados são
+persistidos em `data/cache/` como tabelas derivadas do CSV.
+"""
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from cube import CUBE_OPTIONAL_COLUMNS, build_cube_frame, load_cube_frame, sum_cubes
+from loader import (
+    RAW_SOURCES,
+    RESPIRATORY_COLUMN,
+    SUS_REQUIRED_COLUMNS,
+    get_raw_dir,
+    load_derived,
+    load_sus,
+    prepare_sus,
+)
+
+logger = logging.getLogger(__name__)
+
+# Variável de ambiente com o modo de ingestão: "memory" ou "chunked"
+INGEST_MODE_ENV = "CHATBOT_PYSUS_INGEST"
+INGEST_MODES = ("memory", "chunked")
+
+# Linhas por bloco no modo `chunked`
+DEFAULT_CHUNK_ROWS = 500_000
+
+# Incremente ao mudar a lógica dos agregados para invalidar o cache
+AGGREGATES_VERSION = 1
+
+# Colunas da tabela persistida de contagens: tipo, chave, contagem
+COUNT_KINDS = ("idade_respiratorio", "idade_todas", "cidade_respiratorio")
+
+
+def ingest_mode() -> str:
+    """
+    Modo de ingestão configurado em `INGEST_MODE_ENV` (padrão "memory").
+
+    Raises:
+        ValueError: Se o modo não for um de `INGEST_MODES`
+    """
+    mode = os.environ.get(INGEST_MODE_ENV, "memory").strip().lower() or "memory"
+    if mode not in INGEST_MODES:
+        raise ValueError(f"{INGEST_MODE_ENV} inválido: {mode!r} (use {' ou '.join(INGEST_MODES)})")
+    return mode
+
+
+def _sum_counts(series: List[pd.Series]) -> pd.Series:
+    return pd.concat(series).groupby(level=0).sum().astype("int64")
+
+
+def _sort_counts(counts: pd.Series) -> pd.Series:
+    """Ordena por contagem decrescente e, no empate, pela chave."""
+    frame = counts.rename("count").rename_axis("key").reset_index()
+    frame = frame.sort_values(["count", "key"], ascending=[False, True], kind="stable")
+    return pd.Series(frame["count"].to_numpy(), index=pd.Index(frame["key"].to_numpy()), name="count")
+
+
+class SusAggregates:
+    """
+    Agregados do SUS, somáveis bloco a bloco com `merge`.
+
+    Attributes:
+        respiratory_ages: Internações respiratórias por idade
+        all_ages: Internações (todas) por idade
+        city_counts: Internações respiratórias por cidade, em ordem decrescente
+        cube: Frame do cubo (`cube.CUBE_COLUMNS`)
+        rows: Linhas lidas
+        respiratory_rows: Linhas com diagnóstico respiratório
+    """
+
+    def __init__(
+        self,
+        respiratory_ages: pd.Series,
+        all_ages: pd.Series,
+        city_counts: pd.Series,
+        cube: pd.DataFrame,
+        rows: int,
+        respiratory_rows: int,
+    ) -> None:
+        self.respiratory_ages = respiratory_ages
+        self.all_ages = all_ages
+        self.city_counts = city_counts
+        self.cube = cube
+        self.rows = rows
+        self.respiratory_rows = respiratory_rows
+
+    @property
+    def ages(self) -> pd.Series:
+        """
+        Histograma de idades usado pelas ferramentas: o respiratório, ou o de
+        todas as internações se não houver nenhuma respiratória.
+        """
+        return self.respiratory_ages if self.respiratory_rows else self.all_ages
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "SusAggregates":
+        """Agrega um DataFrame já preparado por `prepare_sus`."""
+        resp = df[df[RESPIRATORY_COLUMN]]
+        ages = df["IDADE"].dropna().astype("int64")
+        resp_ages = resp["IDADE"].dropna().astype("int64")
+        cities = resp["CIDADE_RESIDENCIA_PACIENTE"].dropna().astype(str)
+        return cls(
+            respiratory_ages=resp_ages.value_counts(sort=False).sort_index(),
+            all_ages=ages.value_counts(sort=False).sort_index(),
+            city_counts=_sort_counts(cities.value_counts(sort=False)),
+            cube=build_cube_frame(df),
+            rows=len(df),
+            respiratory_rows=len(resp),
+        )
+
+    def merge(self, other: "SusAggregates") -> "SusAggregates":
+        """Soma dois agregados (ex.: o acumulado e o de um novo bloco)."""
+        return SusAggregates.combine([self, other])
+
+    @classmethod
+    def combine(cls, parts: List["SusAggregates"]) -> "SusAggregates":
+        """
+        Soma vários agregados de uma vez (ex.: todas as partições mensais),
+        com uma única concatenação por tabela.
+
+        Raises:
+            ValueError: Se `parts` estiver vazia
+        """
+        if not parts:
+            raise ValueError("Nenhum agregado para somar.")
+        return cls(
+            respiratory_ages=_sum_counts([p.respiratory_ages for p in parts]).sort_index(),
+            all_ages=_sum_counts([p.all_ages for p in parts]).sort_index(),
+            city_counts=_sort_counts(_sum_counts([p.city_counts for p in parts])),
+            cube=sum_cubes([p.cube for p in parts]),
+            rows=sum(p.rows for p in parts),
+            respiratory_rows=sum(p.respiratory_rows for p in parts),
+        )
+
+    def counts_frame(self) -> pd.DataFrame:
+        """Histogramas e contagens numa tabela longa (kind, key, count) para o cache."""
+        parts = []
+        for kind, series in zip(COUNT_KINDS, (self.respiratory_ages, self.all_ages, self.city_counts)):
+            parts.append(pd.DataFrame({
+                "kind": kind,
+                "key": series.index.astype(str),
+                "count": series.to_numpy(dtype="int64"),
+            }))
+        totals = pd.DataFrame({
+            "kind": "linhas",
+            "key": ["todas", "respiratorio"],
+            "count": [self.rows, self.respiratory_rows],
+        })
+        return pd.concat(parts + [totals], ignore_index=True)
+
+    @classmethod
+    def from_tables(cls, counts: pd.DataFrame, cube: pd.DataFrame) -> "SusAggregates":
+        """Reconstrói os agregados a partir de `counts_frame` e do cubo."""
+        def series(kind: str, numeric: bool) -> pd.Series:
+            part = counts[counts["kind"] == kind]
+            index = part["key"].astype("int64") if numeric else part["key"].astype(str)
+            return pd.Series(part["count"].to_numpy(dtype="int64"), index=pd.Index(index.to_numpy()), name="count")
+
+        totals = series("linhas", numeric=False)
+        return cls(
+            respiratory_ages=series("idade_respiratorio", numeric=True),
+            all_ages=series("idade_todas", numeric=True),
+            city_counts=series("cidade_respiratorio", numeric=False),
+            cube=cube,
+            rows=int(totals.get("todas", 0)),
+            respiratory_rows=int(totals.get("respiratorio", 0)),
+        )
+
+
+def aggregate_csv(
+    path: Optional[os.PathLike] = None,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+) -> SusAggregates:
+    """
+    Agrega o CSV do SUS em streaming, bloco a bloco.
+
+    Só as colunas de `SUS_REQUIRED_COLUMNS` e `cube.CUBE_OPTIONAL_COLUMNS`
+    são lidas; as datas são convertidas bloco a bloco pelo cubo.
+
+    Args:
+        path: CSV do SUS (padrão: `data/raw/dados_sus3.csv`)
+        chunk_rows: Linhas por bloco
+
+    Returns:
+        SusAggregates: Agregados do arquivo inteiro
+
+    Raises:
+        FileNotFoundError: Se o CSV não existir
+        ValueError: Se faltar alguma coluna obrigatória
+    """
+    filename, read_kwargs = RAW_SOURCES["sus"]
+    path = path or get_raw_dir() / filename
+    kwargs = {k: v for k, v in read_kwargs.items() if k not in ("parse_dates", "low_memory")}
+
+    started = time.perf_counter()
+    total: Optional[SusAggregates] = None
+    wanted = set(SUS_REQUIRED_COLUMNS) | set(CUBE_OPTIONAL_COLUMNS)
+    reader = pd.read_csv(path, chunksize=chunk_rows, usecols=lambda col: col in wanted, **kwargs)
+    with reader:
+        for chunk in reader:
+            prepared, _ = prepare_sus(chunk)
+            part = SusAggregates.from_frame(prepared)
+            total = part if total is None else total.merge(part)
+            logger.debug("Agregação em blocos: %d linhas lidas", total.rows)
+    if total is None:
+        raise ValueError(f"CSV do SUS vazio: {path}")
+    logger.info(
+        "Agregação em blocos: %d linhas (%d respiratórias) em %.1fs",
+        total.rows, total.respiratory_rows, time.perf_counter() - started,
+    )
+    return total
+
+
+_BUILT: Dict[str, SusAggregates] = {}
+_BUILD_LOCK = threading.Lock()
+
+
+def compute_aggregates(mode: Optional[str] = None) -> SusAggregates:
+    """
+    Calcula os agregados (sem cache em disco) no modo pedido; o resultado
+    fica em memória para que o cache das várias tabelas derivadas seja
+    preenchido com uma única passada pelos dados.
+    """
+    mode = mode or ingest_mode()
+    with _BUILD_LOCK:
+        if mode not in _BUILT:
+            if mode == "chunked":
+                _BUILT[mode] = aggregate_csv()
+            else:
+                _BUILT[mode] = SusAggregates.from_frame(load_sus())
+        return _BUILT[mode]
+
+
+def clear_aggregates() -> None:
+    """Descarta os agregados calculados em memória (ex.: após trocar o CSV)."""
+    with _BUILD_LOCK:
+        _BUILT.clear()
+
+
+def load_aggregates(use_cache: bool = True) -> SusAggregates:
+    """
+    Carrega os agregados da versão atual do armazenamento particionado
+    (`ingest.py`), se houver; senão do cache em `data/cache/`, ou os calcula
+    a partir do CSV no modo de `ingest_mode()` e grava o cache.
+    """
+    # Import tardio: `ingest` importa este módulo
+    from ingest import load_store_aggregates
+
+    stored = load_store_aggregates()
+    if stored is not None:
+        return stored
+    counts = load_derived(
+        "sus_counts",
+        source="sus",
+        build=lambda: compute_aggregates().counts_frame(),
+        version=AGGREGATES_VERSION,
+        use_cache=use_cache,
+    )
+    return SusAggregates.from_tables(counts, load_cube_frame(use_cache=use_cache))
@@ -0,0 +1,333 @@
+"""
+Cache semântico local de respostas para perguntas repetidas.
+
+A pergunta é normalizada e vetorizada por um vetorizador de hashing offline
+(sem modelo de embeddings); se uma pergunta já respondida for similar o
+bastante, a resposta é servida sem nenhuma chamada ao LLM. Termos-chave
+precisam coincidir exatamente: números, superlativos, a métrica ou agregação
+pedida e as entidades da pergunta (`entities.extract_entities`: município,
+sexo, faixa de idade, CID ou doença, período e quantidade pedida). Assim "top
+5 cidades" não responde "top 10 cidades", "santa maria" não responde "santa
+rosa", "mulheres" não responde "homens", "custo total" não responde "custo
+médio" e "qual a cidade" (uma) não responde "quais as cidades" (várias).
+
+`python answer_cache.py` avalia o cache sobre pares de perguntas que devem
+(ou não) reaproveitar a resposta uma da outra
+(data/eval/answer_cache_eval.jsonl).
+"""
+import argparse
+import json
+import logging
+import re
+import threading
+import time
+import unicodedata
+import zlib
+from pathlib import Path
+from typing import Any, Dict, FrozenSet, List, NamedTuple, Optional
+
+import numpy as np
+
+from entities import extract_entities
+
+logger = logging.getLogger(__name__)
+
+_TOKEN = re.compile(r"\w+")
+
+# Palavras sem conteúdo informativo para a similaridade
+STOPWORDS = frozenset(
+    "a as o os um uma uns umas de da das do dos em no na nos nas por para pra "
+    "com sem que qual quais quanto quantos quantas e ou se sao eh foi ser tem "
+    "ha me nos voce mim meu minha seu sua isso esse essa este esta aquele "
+    "como onde quando numero quantidade total".split()
+)
+
+# Sinônimos de domínio mapeados para um termo canônico
+SYNONYMS: Dict[str, str] = {
+    "maioria": "maior", "maiores": "maior", "mais": "maior", "concentram": "maior",
+    "concentra": "maior", "concentrase": "maior", "concentramse": "maior",
+    "predominam": "maior", "top": "maior",
+    "menores": "menor", "menos": "menor",
+    "internacao": "internacoes", "internacoes": "internacoes", "internados": "internacoes",
+    "hospitalizacao": "internacoes", "hospitalizacoes": "internacoes",
+    "idade": "etaria", "idades": "etaria", "etarias": "etaria",
+    "cidade": "municipio", "cidades": "municipio", "municipios": "municipio",
+    "medio": "media", "medios": "media", "medias": "media",
+    "maxima": "maximo", "maximos": "maximo", "maximas": "maximo",
+    "minima": "minimo", "minimos": "minimo", "minimas": "minimo",
+    "taxas": "taxa", "soma": "total",
+    "mortalidade": "obitos", "obito": "obitos", "morte": "obitos", "mortes": "obitos",
+    "permanencias": "permanencia",
+}
+
+# Termos canônicos cuja presença muda a intenção da pergunta: direção do
+# ranking e métrica/agregação pedida
+_INTENT_TERMS = frozenset({
+    "maior", "menor", "total", "media", "maximo", "minimo", "taxa", "obitos", "permanencia",
+})
+
+
+def fold_text(text: str) -> str:
+    """Remove acentos e converte para minúsculas."""
+    text = unicodedata.normalize("NFKD", str(text))
+    return "".join(ch for ch in text if not unicodedata.combining(ch)).casefold()
+
+
+def tokenize(prompt: str) -> List[str]:
+    """
+    Tokens normalizados da pergunta: sem acento, sem stopwords e com
+    sinônimos de domínio unificados.
+    """
+    tokens = []
+    for raw in _TOKEN.findall(fold_text(prompt).replace("-", "")):
+        if raw in STOPWORDS:
+            continue
+        tokens.append(SYNONYMS.get(raw, raw))
+    return tokens
+
+
+def key_terms(prompt: str) -> FrozenSet[str]:
+    """
+    Termos que precisam coincidir para reaproveitar uma resposta: números,
+    marcadores de intenção (inclusive os que são stopwords para a
+    similaridade, como "total") e as entidades extraídas da pergunta, com
+    municípios reconhecidos sem depender de caixa ou acento.
+    """
+    terms = set(extract_entities(prompt).key())
+    folded = _TOKEN.findall(fold_text(prompt).replace("-", ""))
+    terms.update(str(int(word)) for word in folded if word.isdigit())
+    terms.update(t for t in (SYNONYMS.get(w, w) for w in folded) if t in _INTENT_TERMS)
+    return frozenset(terms)
+
+
+class HashingVectorizer:
+    """
+    Vetorizador offline: unigramas (binários) e trigramas de caracteres dos
+    tokens, projetados por hashing em `dim` dimensões e normalizados (L2).
+    """
+
+    def __init__(self, dim: int = 2048, char_ngram: int = 3, char_weight: float = 0.5) -> None:
+        self.dim = dim
+        self.char_ngram = char_ngram
+        self.char_weight = char_weight
+
+    def _bucket(self, feature: str) -> int:
+        return zlib.crc32(feature.encode("utf-8")) % self.dim
+
+    def transform(self, prompt: str) -> np.ndarray:
+        """Vetor float32 normalizado da pergunta."""
+        vec = np.zeros(self.dim, dtype=np.float32)
+        for token in set(tokenize(prompt)):
+            vec[self._bucket("w:" + token)] += 1.0
+            padded = f"<{token}>"
+            for i in range(len(padded) - self.char_ngram + 1):
+                vec[self._bucket("c:" + padded[i:i + self.char_ngram])] += self.char_weight
+        norm = float(np.linalg.norm(vec))
+        return vec / norm if norm else vec
+
+
+class VectorIndex:
+    """
+    Índice de vizinho mais próximo por similaridade de cosseno.
+
+    Os vetores ficam numa matriz pré-alocada; a busca é um único produto
+    matriz-vetor, e a remoção libera a linha para reutilização.
+    """
+
+    def __init__(self, dim: int, capacity: int) -> None:
+        self.matrix = np.zeros((capacity, dim), dtype=np.float32)
+        self.used = np.zeros(capacity, dtype=bool)
+
+    def add(self, slot: int, vector: np.ndarray) -> None:
+        self.matrix[slot] = vector
+        self.used[slot] = True
+
+    def remove(self, slot: int) -> None:
+        self.matrix[slot] = 0.0
+        self.used[slot] = False
+
+    def clear(self) -> None:
+        self.matrix[:] = 0.0
+        self.used[:] = False
+
+    def nearest(self, vector: np.ndarray, k: int = 1) -> List[tuple]:
+        """Os `k` slots ocupados mais similares, como (slot, similaridade)."""
+        if not self.used.any():
+            return []
+        scores = self.matrix @ vector
+        scores[~self.used] = -1.0
+        k = min(k, int(self.used.sum()))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(slot), float(scores[slot])) for slot in top]
+
+
+class CachedAnswer(NamedTuple):
+    """Resposta servida pelo cache."""
+    prompt: str
+    answer: str
+    similarity: float
+
+
+class _Stored(NamedTuple):
+    prompt: str
+    answer: str
+    terms: FrozenSet[str]
+    created_at: float
+
+
+class AnswerCache:
+    """
+    Cache semântico de respostas com despejo LRU e invalidação por versão
+    do dataset.
+
+    Args:
+        threshold: Similaridade de cosseno mínima para servir do cache
+        maxsize: Número máximo de respostas
+        ttl: Tempo de vida em segundos (None = sem expiração)
+        vectorizer: Vetorizador (padrão: `HashingVectorizer`)
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.8,
+        maxsize: int = 1024,
+        ttl: Optional[float] = None,
+        vectorizer: Optional[HashingVectorizer] = None,
+    ) -> None:
+        self.threshold = threshold
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.vectorizer = vectorizer or HashingVectorizer()
+        self.index = VectorIndex(self.vectorizer.dim, maxsize)
+        self._slots: Dict[int, _Stored] = {}
+        self._last_used = np.zeros(maxsize, dtype=np.float64)
+        self._version: Any = None
+        self._lock = threading.Lock()
+        self.enabled = True
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def _check_version(self, version: Any) -> None:
+        if version != self._version:
+            if self._slots:
+                logger.info("Dataset mudou (versão %s); limpando cache de respostas", version)
+            self._slots.clear()
+            self.index.clear()
+            self._version = version
+
+    def lookup(self, prompt: str, version: Any = None) -> Optional[CachedAnswer]:
+        """
+        Busca uma resposta para uma pergunta equivalente já respondida.
+
+        Args:
+            prompt: Pergunta do usuário
+            version: Versão do dataset atual
+
+        Returns:
+            CachedAnswer ou None em caso de falta (ou cache desativado)
+        """
+        if not self.enabled:
+            return None
+        vector = self.vectorizer.transform(prompt)
+        terms = key_terms(prompt)
+        with self._lock:
+            self._check_version(version)
+            now = time.monotonic()
+            for slot, score in self.index.nearest(vector, k=5):
+                if score < self.threshold:
+                    break
+                stored = self._slots[slot]
+                if self.ttl is not None and now - stored.created_at > self.ttl:
+                    self.index.remove(slot)
+                    del self._slots[slot]
+                    continue
+                if stored.terms != terms:
+                    continue
+                self._last_used[slot] = now
+                self.hits += 1
+                logger.info("Cache de respostas: '%s' ≈ '%s' (%.2f)", prompt, stored.prompt, score)
+                return CachedAnswer(stored.prompt, stored.answer, score)
+            self.misses += 1
+            return None
+
+    def store(self, prompt: str, answer: str, version: Any = None) -> None:
+        """
+        Guarda a resposta de `prompt`, despejando a menos usada se cheio.
+        """
+        if not self.enabled:
+            return
+        vector = self.vectorizer.transform(prompt)
+        with self._lock:
+            self._check_version(version)
+            free = np.flatnonzero(~self.index.used)
+            if free.size:
+                slot = int(free[0])
+            else:
+                slot = int(np.argmin(self._last_used))
+                self._slots.pop(slot, None)
+            now = time.monotonic()
+            self.index.add(slot, vector)
+            self._slots[slot] = _Stored(prompt, answer, key_terms(prompt), now)
+            self._last_used[slot] = now
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores do cache e taxa de acerto."""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._slots),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+def load_eval_set(path: Optional[Path] = None) -> List[Dict[str, Any]]:
+    """
+    Carrega os pares de avaliação (JSONL com `cached`, `prompt` e `hit`: se
+    `prompt` deve ser respondida pela resposta guardada de `cached`).
+    """
+    if path is None:
+        path = Path(__file__).parent.parent / "data" / "eval" / "answer_cache_eval.jsonl"
+    with open(path, encoding="utf-8") as fh:
+        return [json.loads(line) for line in fh if line.strip()]
+
+
+def evaluate(threshold: float, cases: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Avalia o cache: fração dos pares equivalentes servidos do cache e
+    respostas erradas (pares diferentes servidos do cache).
+    """
+    hits = expected = 0
+    errors = []
+    for case in cases:
+        cache = AnswerCache(threshold=threshold, maxsize=4)
+        cache.store(case["cached"], "resposta")
+        found = cache.lookup(case["prompt"])
+        expected += case["hit"]
+        hits += case["hit"] and found is not None
+        if (found is not None) != case["hit"]:
+            similarity = float(cache.vectorizer.transform(case["cached"]) @ cache.vectorizer.transform(case["prompt"]))
+            errors.append({**case, "similarity": round(similarity, 3)})
+    return {
+        "cases": len(cases),
+        "hit_rate": hits / expected if expected else 0.0,
+        "wrong_hits": sum(not e["hit"] for e in errors),
+        "errors": errors,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Avaliação offline do cache semântico de respostas")
+    parser.add_argument("--eval-set", type=Path, help="JSONL de avaliação (padrão: data/eval/answer_cache_eval.jsonl)")
+    parser.add_argument("--threshold", type=float, default=0.8)
+    args = parser.parse_args()
+    print(json.dumps(evaluate(args.threshold, load_eval_set(args.eval_set)), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
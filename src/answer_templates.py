@@ -0,0 +1,304 @@
+"""
+Respostas por template para resultados simples de ferramentas.
+
+Depois das ferramentas, o agente faz uma segunda chamada ao LLM só para
+transformar o resultado em texto. Para as ferramentas de formato fixo
+(faixas etárias, idades, ranking de cidades), `AnswerTemplates` monta a
+resposta em português diretamente, seguindo o tom do prompt de sistema
+(acolhedor, direto, sem JSON cru), e a chamada de síntese é pulada.
+
+O template só é usado quando o turno teve exatamente uma chamada de
+ferramenta, bem-sucedida, cujo resultado tem o formato esperado. Várias
+ferramentas, erros, resultados vazios e as ferramentas genéricas
+(`aggregate_hospitalizations`, `query_data`, cujos filtros e métricas
+variam) continuam com a síntese pelo LLM.
+
+Com o LLM indisponível (ver `resilience`), `degraded_answer` responde com o
+que houver: os templates que se aplicam e, para o resto, os dados das
+ferramentas formatados como lista.
+"""
+import json
+import logging
+import threading
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+logger = logging.getLogger(__name__)
+
+# Renderizador: (argumentos da chamada, resultado decodificado) -> resposta ou None
+Renderer = Callable[[Dict[str, Any], Any], Optional[str]]
+
+# Resposta quando nem o LLM nem as ferramentas têm o que responder
+UNAVAILABLE_ANSWER = (
+    "Desculpe, o assistente está temporariamente indisponível. Tente novamente em instantes."
+)
+
+# Aviso anexado às respostas degradadas
+DEGRADED_NOTE = "(Resposta simplificada: o modelo de linguagem está indisponível no momento.)"
+
+# Itens listados por resultado numa resposta degradada
+MAX_DEGRADED_ITEMS = 20
+
+
+def format_count(value: int) -> str:
+    """Inteiro com separador de milhar do português (1.234)."""
+    return f"{int(value):,}".replace(",", ".")
+
+
+def join_items(items: List[str]) -> str:
+    """Junta itens como em português: "a, b e c"."""
+    if len(items) <= 1:
+        return "".join(items)
+    return ", ".join(items[:-1]) + " e " + items[-1]
+
+
+def age_group_label(group: str) -> str:
+    """Rótulo de uma faixa etária: "60-69" → "60 a 69 anos", "90+" → "90 anos ou mais"."""
+    if group.endswith("+"):
+        return f"{group[:-1]} anos ou mais"
+    low, _, high = group.partition("-")
+    return f"{low} a {high} anos" if high else f"{group} anos"
+
+
+def format_value(value: Any) -> str:
+    """
+    Valor de um resultado como texto; decimais com vírgula (12,34). Inteiros
+    ficam sem separador de milhar, pois podem ser anos ou códigos.
+    """
+    if isinstance(value, float):
+        return str(int(value)) if value.is_integer() else f"{value:.2f}".replace(".", ",")
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return str(value)
+
+
+def _format_item(item: Any) -> str:
+    if isinstance(item, dict):
+        return ", ".join(f"{k}: {format_value(v)}" for k, v in item.items())
+    return format_value(item)
+
+
+def format_result(name: str, result: Any, max_items: int = MAX_DEGRADED_ITEMS) -> str:
+    """Resultado de uma ferramenta como texto simples, sem template (modo degradado)."""
+    if _is_error(result):
+        return f"A consulta '{name}' falhou: {result['error']}"
+    if isinstance(result, dict) and isinstance(result.get("rows"), list):
+        result = result["rows"]  # formato de `query_data`
+    if isinstance(result, dict):
+        items = [f"{k}: {format_value(v)}" for k, v in result.items()]
+    elif isinstance(result, list):
+        items = [_format_item(r) for r in result]
+    else:
+        return f"Resultado de '{name}': {format_value(result)}"
+    if not items:
+        return f"A consulta '{name}' não retornou dados."
+    lines = [f"- {item}" for item in items[:max_items]]
+    if len(items) > max_items:
+        lines.append(f"- … (mais {len(items) - max_items})")
+    return f"Resultado de '{name}':\n" + "\n".join(lines)
+
+
+def _is_error(result: Any) -> bool:
+    return isinstance(result, dict) and "error" in result
+
+
+def _decode(message: ToolMessage) -> Any:
+    """Conteúdo da ToolMessage decodificado do JSON (ou o texto, se não for JSON)."""
+    if not isinstance(message.content, str):
+        return message.content
+    try:
+        return json.loads(message.content)
+    except json.JSONDecodeError:
+        return message.content
+
+
+def _turn_results(messages: List[Any]) -> List[Tuple[Dict[str, Any], ToolMessage]]:
+    """
+    (chamada, ToolMessage) de cada ferramenta do turno que termina em
+    `messages`: a última AIMessage com tool_calls depois da pergunta (não a
+    de um turno anterior da memória) e as ToolMessages que a seguem.
+    """
+    for i in range(len(messages) - 1, -1, -1):
+        if isinstance(messages[i], HumanMessage):
+            return []
+        if isinstance(messages[i], AIMessage) and messages[i].tool_calls:
+            break
+    else:
+        return []
+    results = {m.tool_call_id: m for m in messages[i + 1:] if isinstance(m, ToolMessage)}
+    return [(call, results[call["id"]]) for call in messages[i].tool_calls if call.get("id") in results]
+
+
+def _max_age(args: Dict[str, Any], result: Any) -> Optional[str]:
+    if not isinstance(result, int):
+        return None
+    return f"Claro! A maior idade registrada nos dados é de {result} anos."
+
+
+def _ages(ages: List[Any]) -> str:
+    return join_items([str(a) for a in ages]) + " anos"
+
+
+def _top_ages(args: Dict[str, Any], result: Any) -> Optional[str]:
+    if isinstance(result, dict) and not _is_error(result):
+        if not result.get("menores") or not result.get("maiores"):
+            return None
+        return (
+            f"Claro! As menores idades registradas são {_ages(result['menores'])}, "
+            f"e as maiores, {_ages(result['maiores'])}."
+        )
+    if not isinstance(result, list) or not result:
+        return None
+    side = str(args.get("range", "")).strip().lower()
+    if side not in ("menores", "maiores"):
+        return None
+    if len(result) == 1:
+        adjective = "menor" if side == "menores" else "maior"
+        return f"Claro! A {adjective} idade registrada é {result[0]} anos."
+    return f"Claro! As {len(result)} {side} idades registradas são {_ages(result)}."
+
+
+def _age_groups(args: Dict[str, Any], result: Any) -> Optional[str]:
+    if not isinstance(result, dict) or _is_error(result) or not any(result.values()):
+        return None
+    top = max(result, key=result.get)
+    lines = [f"- {age_group_label(group)}: {format_count(count)}" for group, count in result.items()]
+    return (
+        "Veja só as internações por faixa etária:\n"
+        + "\n".join(lines)
+        + f"\n\nA faixa com mais internações é a de {age_group_label(top)}, "
+        f"com {format_count(result[top])}."
+    )
+
+
+def _top_age_group(args: Dict[str, Any], result: Any) -> Optional[str]:
+    if not isinstance(result, dict) or not result.get("count") or "age_group" not in result:
+        return None
+    return (
+        f"Com certeza! A faixa etária com mais internações é a de "
+        f"{age_group_label(str(result['age_group']))}, com {format_count(result['count'])} internações."
+    )
+
+
+def _top_cities(args: Dict[str, Any], result: Any) -> Optional[str]:
+    if not isinstance(result, list) or not result:
+        return None
+    if not all(isinstance(r, dict) and {"cidade", "internacoes"} <= r.keys() for r in result):
+        return None
+    if len(result) == 1:
+        city = result[0]
+        return (
+            f"Claro! A cidade com mais internações respiratórias (CID J) é {city['cidade']}, "
+            f"com {format_count(city['internacoes'])} internações."
+        )
+    lines = [
+        f"{i}. {r['cidade']}: {format_count(r['internacoes'])} internações"
+        for i, r in enumerate(result, start=1)
+    ]
+    return (
+        f"Claro! Estas são as {len(result)} cidades com mais internações respiratórias (CID J):\n"
+        + "\n".join(lines)
+    )
+
+
+# Templates por ferramenta (nome LangChain)
+RENDERERS: Dict[str, Renderer] = {
+    "get_max_age": _max_age,
+    "get_top_ages": _top_ages,
+    "get_admission_age_groups": _age_groups,
+    "get_top_admission_age_group": _top_age_group,
+    "get_top_cities": _top_cities,
+}
+
+
+class TemplateMetrics:
+    """Contadores de respostas finais por template vs. síntese pelo LLM."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.template: Counter = Counter()
+        self.llm = 0
+
+    def record(self, tool: Optional[str]) -> None:
+        with self._lock:
+            if tool is None:
+                self.llm += 1
+            else:
+                self.template[tool] += 1
+
+    def as_dict(self) -> Dict[str, Any]:
+        templated = sum(self.template.values())
+        total = templated + self.llm
+        return {
+            "answers": total,
+            "template": templated,
+            "llm": self.llm,
+            "template_rate": templated / total if total else 0.0,
+            "by_tool": dict(self.template),
+        }
+
+
+class AnswerTemplates:
+    """
+    Gera a resposta final por template quando o resultado do turno permite.
+
+    Args:
+        renderers: Templates por ferramenta (padrão: `RENDERERS`)
+    """
+
+    def __init__(self, renderers: Optional[Dict[str, Renderer]] = None) -> None:
+        self.renderers = RENDERERS if renderers is None else renderers
+        self.enabled = True
+        self.metrics = TemplateMetrics()
+
+    def _apply(self, call: Dict[str, Any], message: ToolMessage) -> Optional[str]:
+        """Template da ferramenta de `call` para o resultado em `message`, se aplicável."""
+        renderer = self.renderers.get(call["name"])
+        if renderer is None or message.status == "error":
+            return None
+        result = _decode(message)
+        if _is_error(result):
+            return None
+        try:
+            return renderer(call.get("args") or {}, result) or None
+        except Exception:
+            logger.exception("Falha no template de '%s'", call["name"])
+            return None
+
+    def _render(self, messages: List[Any]) -> Optional[Tuple[str, str]]:
+        results = _turn_results(messages)
+        if len(results) != 1:
+            return None
+        call, message = results[0]
+        answer = self._apply(call, message)
+        return (call["name"], answer) if answer else None
+
+    def render(self, messages: List[Any]) -> Optional[str]:
+        """
+        Resposta por template para o turno que termina em `messages` (pedido
+        de ferramenta do modelo seguido das ToolMessages), ou None para usar
+        a síntese pelo LLM.
+        """
+        if not self.enabled:
+            return None
+        rendered = self._render(messages)
+        self.metrics.record(rendered[0] if rendered else None)
+        logger.debug("Template: %s", rendered[0] if rendered else "não aplicável")
+        return rendered[1] if rendered else None
+
+    def degraded_answer(self, messages: List[Any]) -> str:
+        """
+        Resposta sem o LLM para o turno que termina em `messages`: o template
+        de cada resultado de ferramenta, ou os dados formatados, seguidos de
+        `DEGRADED_NOTE`; sem resultados, `UNAVAILABLE_ANSWER`.
+        """
+        results = _turn_results(messages)
+        if not results:
+            return UNAVAILABLE_ANSWER
+        parts = [
+            self._apply(call, message) or format_result(call["name"], _decode(message))
+            for call, message in results
+        ]
+        return "\n\n".join(parts + [DEGRADED_NOTE])
@@ -0,0 +1,182 @@
+"""
+Modo batch: executa muitas perguntas de um JSONL com um único agente e um
+único dataset carregado, com concorrência configurável.
+
+Entrada: uma pergunta por linha, como `{"id": "...", "prompt": "..."}` ou
+apenas uma string JSON. Sem `id`, usa o número da linha.
+
+Saída: um JSONL com resposta, ferramentas chamadas, argumentos e latência por
+etapa. Cada linha é gravada assim que a pergunta termina; ao reexecutar com
+o mesmo arquivo de saída, perguntas já respondidas com sucesso são puladas.
+"""
+import asyncio
+import json
+import logging
+import os
+import statistics
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Set
+
+logger = logging.getLogger(__name__)
+
+
+def read_questions(path: Path) -> Iterator[Dict[str, Any]]:
+    """
+    Lê as perguntas do JSONL de entrada.
+
+    Raises:
+        ValueError: Se uma linha não tiver `prompt`
+    """
+    with open(path, encoding="utf-8") as fh:
+        for lineno, line in enumerate(fh, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line)
+            if isinstance(item, str):
+                item = {"prompt": item}
+            if not item.get("prompt"):
+                raise ValueError(f"{path}:{lineno}: linha sem 'prompt'")
+            item.setdefault("id", str(lineno))
+            item["id"] = str(item["id"])
+            yield item
+
+
+def completed_ids(path: Path) -> Set[str]:
+    """Ids já respondidos com sucesso num arquivo de saída existente."""
+    done: Set[str] = set()
+    if not path.exists():
+        return done
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # Última linha truncada por uma queda: `drop_partial_line` a remove e a pergunta é refeita
+                continue
+            if not record.get("error"):
+                done.add(str(record.get("id")))
+    return done
+
+
+def drop_partial_line(path: Path, block_size: int = 1 << 16) -> None:
+    """
+    Remove do fim de `path` uma linha sem "\\n" (gravação interrompida),
+    para que o próximo registro acrescentado comece numa linha própria.
+    """
+    if not path.exists():
+        return
+    with open(path, "rb+") as fh:
+        end = fh.seek(0, os.SEEK_END)
+        position = end
+        while position > 0:
+            start = max(0, position - block_size)
+            fh.seek(start)
+            block = fh.read(position - start)
+            newline = block.rfind(b"\n")
+            if newline >= 0:
+                position = start + newline + 1
+                break
+            position = start
+        if position < end:
+            logger.warning("Batch: descartando linha incompleta no fim de %s", path)
+            fh.truncate(position)
+
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+async def run_batch(
+    agent: Any,
+    input_path: Path,
+    output_path: Path,
+    concurrency: int = 4,
+    use_function_calling: bool = True,
+) -> Dict[str, Any]:
+    """
+    Responde todas as perguntas de `input_path` e grava em `output_path`.
+
+    Args:
+        agent: Agente compartilhado por todas as perguntas
+        input_path: JSONL de entrada
+        output_path: JSONL de saída (acrescentado; permite retomar)
+        concurrency: Perguntas em andamento ao mesmo tempo
+        use_function_calling: Repassado para `aget_response`
+
+    Returns:
+        Dict com as estatísticas de vazão e latência
+    """
+    from agent import aget_response, collect_tool_calls
+
+    drop_partial_line(output_path)
+    done = completed_ids(output_path)
+    pending = [q for q in read_questions(input_path) if q["id"] not in done]
+    logger.info("Batch: %d perguntas a responder, %d já respondidas", len(pending), len(done))
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors = 0
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, "a", encoding="utf-8") as out:
+        async def answer(question: Dict[str, Any]) -> None:
+            nonlocal errors
+            async with semaphore:
+                stages: Dict[str, float] = {}
+                record: Dict[str, Any] = {"id": question["id"], "prompt": question["prompt"]}
+                began = time.perf_counter()
+                try:
+                    text, messages = await aget_response(
+                        agent, question["prompt"],
+                        use_function_calling=use_function_calling,
+                        stages=stages,
+                    )
+                    record["answer"] = text
+                    record["tool_calls"] = collect_tool_calls(messages)
+                except Exception as exc:
+                    logger.exception("Falha na pergunta %s", question["id"])
+                    record["error"] = f"{type(exc).__name__}: {exc}"
+                    errors += 1
+                total = time.perf_counter() - began
+                record["latency_s"] = {"total": total, **stages}
+                if "error" not in record:
+                    latencies.append(total)
+                # Uma linha por pergunta, gravada já: permite retomar após queda
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(answer(q) for q in pending))
+        elapsed = time.perf_counter() - started
+
+    stats: Dict[str, Any] = {
+        "answered": len(latencies),
+        "errors": errors,
+        "skipped": len(done),
+        "elapsed_s": elapsed,
+        "throughput_qps": len(latencies) / elapsed if elapsed > 0 else 0.0,
+    }
+    if latencies:
+        stats.update({
+            "latency_p50_s": _percentile(latencies, 0.5),
+            "latency_p95_s": _percentile(latencies, 0.95),
+            "latency_mean_s": statistics.mean(latencies),
+        })
+    return stats
+
+
+def format_stats(stats: Dict[str, Any]) -> str:
+    """Resumo legível das estatísticas de `run_batch`."""
+    lines = [
+        f"respondidas: {stats['answered']}  erros: {stats['errors']}  puladas: {stats['skipped']}",
+        f"tempo: {stats['elapsed_s']:.1f}s  vazão: {stats['throughput_qps']:.2f} perguntas/s",
+    ]
+    if "latency_p50_s" in stats:
+        lines.append(
+            f"latência p50: {stats['latency_p50_s']:.2f}s  p95: {stats['latency_p95_s']:.2f}s  "
+            f"média: {stats['latency_mean_s']:.2f}s"
+        )
+    return "\n".join(lines)
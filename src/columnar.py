@@ -0,0 +1,399 @@
+"""
+Cubo do SUS codificado em colunas inteiras e uma agregação genérica sobre ele.
+
+Cada célula do cubo (`cube.build_cube_frame`: cidade × CID × ano × mês ×
+idade × sexo) vira uma linha de colunas NumPy compactas: cidade e CID como
+códigos de categoria (dicionários em ordem alfabética), as demais dimensões
+como inteiros pequenos (-1 quando ausente) e as medidas somáveis (contagem,
+custo, óbitos, permanência). O número de linhas é o de células, não o de
+internações. A tabela é persistida como `.npy` (`load_shared`) e aberta via
+memory-map, compartilhada entre processos.
+
+`SusColumns.aggregate` responde a uma `AggregationSpec` (filtros, uma
+dimensão de agrupamento, uma métrica e top n) numa única passada
+vetorizada: os filtros viram índices de células (cidades e prefixos de CID
+são resolvidos sobre os dicionários, não célula a célula), a dimensão um
+código inteiro por célula e as métricas `np.bincount` ponderados pelas
+medidas. As ferramentas de `tools.py` e `functions.py` são especializações
+desta consulta.
+"""
+import logging
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from cube import CUBE_VERSION, load_cube_frame
+from ingest import store_version
+from loader import load_derived, load_shared, shared_enabled
+from municipios import MunicipalityIndex, build_index, fold_name
+
+logger = logging.getLogger(__name__)
+
+# Incremente ao mudar a codificação de `build_columns_frame`
+COLUMNS_VERSION = 2
+
+# Faixas etárias fixas (idades de 0 a 120; acima de 90 na última)
+AGE_GROUPS = ["0-9", "10-19", "20-29", "30-39", "40-49", "50-59", "60-69", "70-79", "80-89", "90+"]
+MAX_AGE = 120
+
+# Códigos de `SEXO` no SIH/SUS
+SEX_CODES = {"masculino": 1, "feminino": 3}
+_SEX_LABELS = {code: label for label, code in SEX_CODES.items()}
+
+# Dimensões de agrupamento
+DIMENSIONS = ("cidade", "ano", "mes", "cid", "idade", "faixa_etaria", "sexo")
+
+# Métricas: contagem, custo (VAL_TOT) total/médio, taxa de óbito e
+# permanência média (dias entre internação e saída)
+METRICS = ("internacoes", "custo_total", "custo_medio", "taxa_mortalidade", "permanencia_media")
+
+# Ordenações de grupos: pelo valor da métrica ou pela chave
+ORDERS = ("desc", "asc", "chave")
+
+# Prefixos de CID cujas linhas ficam memorizadas por `SusColumns`
+PREFIX_CACHE_SIZE = 8
+
+
+class AggregationSpec(NamedTuple):
+    """
+    Consulta declarativa sobre as internações.
+
+    Attributes:
+        metric: Uma de `METRICS`
+        group_by: Uma de `DIMENSIONS`, ou None para um único total
+        city: Município (resolvido via `MunicipalityIndex`)
+        year_from: Primeiro ano (inclusivo)
+        year_to: Último ano (inclusivo)
+        cid_prefix: Prefixo do CID (ex.: "J" para respiratórias, "J45")
+        age_min: Idade mínima (inclusiva)
+        age_max: Idade máxima (inclusiva)
+        sex: "masculino"/"feminino" ou o código do SUS
+        top_n: Limite de grupos devolvidos
+        order: "desc"/"asc" pelo valor da métrica ou "chave"; empates
+            seguem a ordem da chave
+    """
+    metric: str = "internacoes"
+    group_by: Optional[str] = None
+    city: Optional[str] = None
+    year_from: Optional[int] = None
+    year_to: Optional[int] = None
+    cid_prefix: Optional[str] = None
+    age_min: Optional[int] = None
+    age_max: Optional[int] = None
+    sex: Optional[Union[str, int]] = None
+    top_n: Optional[int] = None
+    order: str = "desc"
+
+
+class AggregationResult(NamedTuple):
+    """
+    Resultado de `SusColumns.aggregate`: chaves dos grupos (vazias sem
+    `group_by`), valor da métrica e número de internações de cada grupo.
+    """
+    keys: List[Union[str, int]]
+    values: List[float]
+    counts: List[int]
+
+
+# ---------------------------------------------------------------------------
+# Construção
+# ---------------------------------------------------------------------------
+
+def _categorical(values: pd.Series) -> pd.Categorical:
+    """Textos como categoria com dicionário em ordem alfabética (nulos: código -1)."""
+    names = sorted(values.dropna().astype(str).unique())
+    return pd.Categorical(values.astype(object).where(values.notna()), categories=names)
+
+
+def build_columns_frame(cube: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """
+    Codifica o cubo do SUS nas colunas compactas.
+
+    Os dicionários de cidade e CID ficam em ordem alfabética, então o código
+    de categoria segue a ordem das chaves (desempate das ordenações).
+
+    Args:
+        cube: Frame do cubo (padrão: `cube.load_cube_frame`, do armazenamento
+            particionado ou calculado em memória ou em blocos, conforme
+            `aggregates.ingest_mode`)
+    """
+    started = time.perf_counter()
+    cube = cube if cube is not None else load_cube_frame()
+    frame = pd.DataFrame({
+        "CIDADE_RESIDENCIA_PACIENTE": _categorical(cube["CIDADE_RESIDENCIA_PACIENTE"]),
+        "DIAG_PRINC": _categorical(cube["DIAG_PRINC"]),
+        "ano": cube["ano"].to_numpy(dtype=np.int16),
+        "mes": cube["mes"].to_numpy(dtype=np.int8),
+        "IDADE": cube["IDADE"].to_numpy(dtype=np.int16),
+        "SEXO": cube["SEXO"].to_numpy(dtype=np.int8),
+        "count": cube["count"].to_numpy(dtype=np.int32),
+        "val_sum": cube["val_sum"].to_numpy(dtype=np.float64),
+        "val_count": cube["val_count"].to_numpy(dtype=np.int32),
+        "morte_sum": cube["morte_sum"].to_numpy(dtype=np.int32),
+        "stay_sum": cube["stay_sum"].to_numpy(dtype=np.int64),
+        "stay_count": cube["stay_count"].to_numpy(dtype=np.int32),
+    })
+    logger.info(
+        "Cubo do SUS codificado em %.1fs: %d células, %d internações, %d cidades, %d CIDs",
+        time.perf_counter() - started, len(frame), int(frame["count"].sum()),
+        len(frame["CIDADE_RESIDENCIA_PACIENTE"].cat.categories), len(frame["DIAG_PRINC"].cat.categories),
+    )
+    return frame
+
+
+def load_columns_frame(use_cache: bool = True) -> pd.DataFrame:
+    """
+    Carrega as colunas codificadas do cache (compartilhado via memory-map,
+    salvo com `SHARED_ENV=0`) ou as calcula com `build_columns_frame`. O
+    cache também é invalidado por uma nova versão do armazenamento, cujo
+    cubo total já vem somado pela ingestão (só as partições novas são lidas).
+    """
+    version = f"{COLUMNS_VERSION}.{CUBE_VERSION}.{store_version()}"
+    if shared_enabled():
+        return load_shared(
+            "sus_columns_shared", source="sus", build=build_columns_frame, version=version, use_cache=use_cache
+        )
+    return load_derived("sus_columns", source="sus", build=build_columns_frame, version=version, use_cache=use_cache)
+
+
+# ---------------------------------------------------------------------------
+# Consulta
+# ---------------------------------------------------------------------------
+
+def _optional_int(value: Optional[Union[int, str]], name: str) -> Optional[int]:
+    if value is None or value == "":
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Parâmetro '{name}' deve ser um inteiro.") from None
+
+
+class SusColumns:
+    """
+    Cubo codificado do SUS e o índice de municípios para os filtros.
+
+    Args:
+        frame: Frame de `build_columns_frame`/`load_columns_frame`
+        index: Índice de municípios (nomes do IBGE/IDH), só consultado; as
+            cidades do SUS fora dele recebem ids locais
+
+    Attributes:
+        cells: Células do cubo
+        rows: Internações
+        respiratory_rows: Internações com CID J
+    """
+
+    def __init__(self, frame: pd.DataFrame, index: MunicipalityIndex) -> None:
+        self.frame = frame
+        self.index = index
+        self.cells = len(frame)
+
+        city = frame["CIDADE_RESIDENCIA_PACIENTE"].array
+        cid = frame["DIAG_PRINC"].array
+        self.city = np.asarray(city.codes)
+        self.city_names = np.asarray(city.categories, dtype=object)
+        self.cid = np.asarray(cid.codes)
+        self.cid_names = np.asarray(cid.categories, dtype=object)
+        self.year = frame["ano"].to_numpy()
+        self.month = frame["mes"].to_numpy()
+        self.age = frame["IDADE"].to_numpy()
+        self.sex = frame["SEXO"].to_numpy()
+        self.count = frame["count"].to_numpy()
+        self.val_sum = frame["val_sum"].to_numpy()
+        self.val_count = frame["val_count"].to_numpy()
+        self.death = frame["morte_sum"].to_numpy()
+        self.stay_sum = frame["stay_sum"].to_numpy()
+        self.stay_count = frame["stay_count"].to_numpy()
+        self.rows = int(self.count.sum())
+
+        # Município de cada nome de cidade do dicionário: o id do índice ou,
+        # para cidades só do SUS, um id local após os do índice
+        self._local_ids: Dict[str, int] = {}
+        city_ids = []
+        for name in self.city_names:
+            folded = fold_name(name)
+            city_id = index.ids.get(folded)
+            if city_id is None:
+                city_id = self._local_ids.setdefault(folded, len(index) + len(self._local_ids))
+            city_ids.append(city_id)
+        self.city_ids = np.array(city_ids, dtype=np.int64)
+        # Lookup idade -> faixa etária (-1 fora de 0..MAX_AGE)
+        self._age_groups = np.full(max(int(self.age.max(initial=0)), MAX_AGE) + 2, -1, dtype=np.int8)
+        self._age_groups[:MAX_AGE + 1] = np.minimum(np.arange(MAX_AGE + 1) // 10, len(AGE_GROUPS) - 1)
+        years = self.year[self.year >= 0]
+        self._year_min = int(years.min()) if len(years) else 0
+        self._prefix_cache: Dict[str, np.ndarray] = {}
+        self.respiratory_rows = int(self.count.take(self._prefix_cells("J")).sum())
+
+    def _prefix_cells(self, prefix: str) -> np.ndarray:
+        """Células cujo CID começa com `prefix` (memorizadas: "J" é o filtro comum)."""
+        prefix = prefix.strip().upper()
+        cells = self._prefix_cache.get(prefix)
+        if cells is None:
+            hits = np.asarray(pd.Index(self.cid_names).str.startswith(prefix), dtype=bool)
+            cells = np.flatnonzero(np.append(hits, False)[self.cid])
+            if len(self._prefix_cache) >= PREFIX_CACHE_SIZE:
+                self._prefix_cache.pop(next(iter(self._prefix_cache)))
+            self._prefix_cache[prefix] = cells
+        return cells
+
+    def _city_id(self, city: str) -> int:
+        """
+        Id do município de `city`: cidade só do SUS pelo nome exato, senão
+        pelo índice (com fallback aproximado).
+
+        Raises:
+            ValueError: Se o município não for encontrado
+        """
+        local = self._local_ids.get(fold_name(city))
+        return local if local is not None else self.index.resolve(city)
+
+    def _cells(self, spec: AggregationSpec) -> Optional[np.ndarray]:
+        """
+        Índices das células que passam pelos filtros (None: todas). Cada
+        filtro só lê as células que sobraram dos anteriores.
+        """
+        cells: Optional[np.ndarray] = None
+
+        def keep(values: np.ndarray, test: Callable[[np.ndarray], np.ndarray]) -> None:
+            nonlocal cells
+            hits = np.flatnonzero(test(_take(values, cells)))
+            cells = hits if cells is None else cells.take(hits)
+
+        if spec.cid_prefix:
+            cells = self._prefix_cells(str(spec.cid_prefix))
+        if spec.city:
+            city_lut = np.append(self.city_ids == self._city_id(spec.city), False)
+            keep(self.city, lambda city: city_lut[city])
+        year_from = _optional_int(spec.year_from, "year_from")
+        year_to = _optional_int(spec.year_to, "year_to")
+        if year_from is not None:
+            keep(self.year, lambda year: year >= year_from)
+        if year_to is not None:
+            keep(self.year, lambda year: (year >= 0) & (year <= year_to))
+        age_min = _optional_int(spec.age_min, "age_min")
+        age_max = _optional_int(spec.age_max, "age_max")
+        if age_min is not None:
+            keep(self.age, lambda age: age >= age_min)
+        if age_max is not None:
+            keep(self.age, lambda age: (age >= 0) & (age <= age_max))
+        if spec.sex is not None and spec.sex != "":
+            code = SEX_CODES.get(str(spec.sex).strip().lower())
+            if code is None:
+                code = _optional_int(spec.sex, "sex")
+            keep(self.sex, lambda sex: sex == code)
+        return cells
+
+    def _groups(
+        self, dimension: str, cells: Optional[np.ndarray]
+    ) -> Tuple[np.ndarray, List[Union[str, int]]]:
+        """Código do grupo de cada célula de `cells` (-1: sem grupo) e a chave de cada código."""
+        if dimension == "cidade":
+            return _take(self.city, cells), self.city_names.tolist()
+        if dimension == "cid":
+            return _take(self.cid, cells), self.cid_names.tolist()
+        if dimension == "ano":
+            year = _take(self.year, cells)
+            span = int(self.year.max(initial=self._year_min)) - self._year_min + 1
+            codes = np.where(year >= 0, year.astype(np.int32) - self._year_min, -1)
+            return codes, list(range(self._year_min, self._year_min + span))
+        if dimension == "mes":
+            month = _take(self.month, cells).astype(np.int32)
+            return np.where(month > 0, month - 1, -1), list(range(1, 13))
+        if dimension == "idade":
+            return _take(self.age, cells), list(range(int(self.age.max(initial=0)) + 1))
+        if dimension == "faixa_etaria":
+            return self._age_groups[_take(self.age, cells)], list(AGE_GROUPS)
+        if dimension == "sexo":
+            keys = [_SEX_LABELS.get(code, code) for code in range(int(self.sex.max(initial=-1)) + 1)]
+            return _take(self.sex, cells), keys
+        raise ValueError(f"Dimensão inválida: {dimension!r}. Use uma de {', '.join(DIMENSIONS)}.")
+
+    def aggregate(self, spec: AggregationSpec) -> AggregationResult:
+        """
+        Executa `spec` numa passada: células filtradas, código do grupo e
+        somas das medidas por `np.bincount`. Grupos sem internações são
+        omitidos.
+
+        Raises:
+            ValueError: Se a métrica, a dimensão, a ordenação ou algum filtro
+                for inválido, ou se o município não for encontrado
+        """
+        if spec.metric not in METRICS:
+            raise ValueError(f"Métrica inválida: {spec.metric!r}. Use uma de {', '.join(METRICS)}.")
+        if spec.order not in ORDERS:
+            raise ValueError(f"Ordenação inválida: {spec.order!r}. Use uma de {', '.join(ORDERS)}.")
+        top_n = _optional_int(spec.top_n, "top_n")
+        if top_n is not None and top_n < 1:
+            raise ValueError("Parâmetro 'top_n' deve ser maior ou igual a 1.")
+
+        cells = self._cells(spec)
+        if spec.group_by is None:
+            codes, keys = np.zeros(self.cells if cells is None else len(cells), dtype=np.int8), [None]
+        else:
+            codes, keys = self._groups(spec.group_by, cells)
+            if codes.min(initial=0) < 0:
+                grouped = np.flatnonzero(codes >= 0)
+                codes = codes.take(grouped)
+                cells = grouped if cells is None else cells.take(grouped)
+
+        size = len(keys)
+
+        def total(measure: np.ndarray) -> np.ndarray:
+            return np.bincount(codes, weights=_take(measure, cells), minlength=size)
+
+        counts = np.rint(total(self.count)).astype(np.int64)
+        if spec.metric == "internacoes":
+            values = counts.astype(np.float64)
+        elif spec.metric in ("custo_total", "custo_medio"):
+            values = total(self.val_sum)
+            if spec.metric == "custo_medio":
+                values = _ratio(values, total(self.val_count))
+        elif spec.metric == "taxa_mortalidade":
+            values = _ratio(total(self.death), counts)
+        else:
+            values = _ratio(total(self.stay_sum), total(self.stay_count))
+
+        if spec.group_by is None:
+            return AggregationResult([], [float(values[0])], [int(counts[0])])
+        groups = np.flatnonzero(counts)
+        if spec.order != "chave":
+            sign = -1 if spec.order == "desc" else 1
+            groups = groups[np.argsort(sign * values[groups], kind="stable")]
+        if top_n is not None:
+            groups = groups[:top_n]
+        return AggregationResult(
+            [keys[g] for g in groups], values[groups].tolist(), counts[groups].tolist()
+        )
+
+
+def _take(values: np.ndarray, cells: Optional[np.ndarray]) -> np.ndarray:
+    # `take` com índices: bem mais rápido que máscara booleana em memory-map
+    return values if cells is None else values.take(cells)
+
+
+def _ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    """Razão por grupo; 0.0 onde o denominador é zero."""
+    out = np.zeros_like(numerator, dtype=np.float64)
+    np.divide(numerator, denominator, out=out, where=denominator > 0)
+    return out
+
+
+def load_columns(
+    frame: Optional[pd.DataFrame] = None,
+    index: Optional[MunicipalityIndex] = None,
+) -> SusColumns:
+    """
+    Constrói `SusColumns` a partir das colunas persistidas e do índice de
+    municípios (IBGE/IDH).
+    """
+    frame = frame if frame is not None else load_columns_frame()
+    columns = SusColumns(frame, index if index is not None else build_index())
+    logger.info(
+        "Colunas do SUS carregadas: %d registros (%d células), %d com diagnóstico J",
+        columns.rows, columns.cells, columns.respiratory_rows,
+    )
+    return columns
@@ -0,0 +1,112 @@
+"""
+Cubo de agregados do SUS: uma célula por cidade × CID × ano × mês × idade ×
+sexo, com as somas de que as métricas precisam.
+
+Calculado uma única vez a partir do SUS (e persistido em `data/cache/` ou no
+armazenamento de `ingest.py`), é a base de `columnar.SusColumns`: contagem,
+custo, óbitos e permanência de qualquer filtro e agrupamento de uma
+`AggregationSpec` são somas sobre as células. O tamanho do cubo depende da
+cardinalidade das dimensões, não do número de internações, e as medidas são
+somas, então cubos de blocos do CSV ou de partições mensais se juntam com
+`sum_cubes`.
+"""
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from loader import load_derived
+
+# Incremente ao mudar a lógica de `build_cube_frame` para invalidar o cache
+CUBE_VERSION = 5
+
+# Dimensões das células (inteiros com -1 quando ausente; textos com nulo)
+CUBE_KEYS = ["CIDADE_RESIDENCIA_PACIENTE", "DIAG_PRINC", "ano", "mes", "IDADE", "SEXO"]
+
+# Medidas somáveis: internações, custo (soma e valores presentes), óbitos e
+# permanência em dias (soma e valores presentes)
+CUBE_MEASURES = ["count", "val_sum", "val_count", "morte_sum", "stay_sum", "stay_count"]
+
+CUBE_COLUMNS = CUBE_KEYS + CUBE_MEASURES
+
+# Colunas opcionais do CSV usadas pelo cubo (mês, permanência e sexo)
+CUBE_OPTIONAL_COLUMNS = ["DT_INTER", "DT_SAIDA", "SEXO"]
+
+
+def _int_key(values: pd.Series) -> pd.Series:
+    # float64 antes do fillna: o IDADE preparado é UInt8 e não comporta -1
+    return pd.to_numeric(values, errors="coerce").astype("float64").fillna(-1).astype("int64")
+
+
+def build_cube_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Agrega as internações por cidade, CID, ano, mês de `DT_INTER`, idade e
+    sexo.
+
+    Args:
+        df: DataFrame do SUS preparado (`loader.prepare_sus`); as colunas de
+            `CUBE_OPTIONAL_COLUMNS` são usadas se existirem
+
+    Returns:
+        pd.DataFrame com as colunas de `CUBE_COLUMNS`, ordenado pelas chaves
+    """
+    missing = pd.Series(np.nan, index=df.index)
+    dt_inter = pd.to_datetime(df["DT_INTER"], errors="coerce") if "DT_INTER" in df.columns else None
+    dt_saida = pd.to_datetime(df["DT_SAIDA"], errors="coerce") if "DT_SAIDA" in df.columns else None
+    stay = (dt_saida - dt_inter).dt.days if dt_inter is not None and dt_saida is not None else missing
+    stay = stay.where(stay >= 0)
+    # Soma em float64: VAL_TOT é float32 e as somas por célula (e entre
+    # blocos e partições) perderiam precisão
+    cost = pd.to_numeric(df["VAL_TOT"], errors="coerce").astype("float64")
+
+    cells = pd.DataFrame({
+        "CIDADE_RESIDENCIA_PACIENTE": df["CIDADE_RESIDENCIA_PACIENTE"].astype("string"),
+        "DIAG_PRINC": df["DIAG_PRINC"].astype("string"),
+        "ano": _int_key(df["ano"]),
+        "mes": _int_key(dt_inter.dt.month if dt_inter is not None else missing),
+        "IDADE": _int_key(df["IDADE"]),
+        "SEXO": _int_key(df["SEXO"] if "SEXO" in df.columns else missing),
+        "count": np.ones(len(df), dtype=np.int64),
+        "val_sum": cost.fillna(0.0),
+        "val_count": cost.notna().astype("int64"),
+        # Óbito ausente conta como não óbito (a internação segue no denominador)
+        "morte_sum": _int_key(df["MORTE"].astype("Int8")).clip(lower=0),
+        "stay_sum": stay.fillna(0).astype("int64"),
+        "stay_count": stay.notna().astype("int64"),
+    })
+    return _group_cells(cells)
+
+
+def _group_cells(cells: pd.DataFrame) -> pd.DataFrame:
+    grouped = cells.groupby(CUBE_KEYS, sort=True, dropna=False)[CUBE_MEASURES].sum().reset_index()
+    return grouped[CUBE_COLUMNS]
+
+
+def sum_cubes(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    """Soma cubos (ex.: de blocos do CSV ou de partições) numa única concatenação."""
+    if len(frames) == 1:
+        return frames[0]
+    return _group_cells(pd.concat(frames, ignore_index=True))
+
+
+def load_cube_frame(use_cache: bool = True) -> pd.DataFrame:
+    """
+    Carrega o frame do cubo do armazenamento particionado (`ingest.py`), se
+    houver; senão do cache, ou o calcula a partir do SUS (em memória ou em
+    blocos, conforme `aggregates.ingest_mode()`).
+    """
+    # Imports tardios: `aggregates` e `ingest` importam este módulo
+    from aggregates import compute_aggregates
+    from ingest import load_store_aggregates
+
+    stored = load_store_aggregates()
+    if stored is not None:
+        return stored.cube
+
+    return load_derived(
+        "cube_sus",
+        source="sus",
+        build=lambda: compute_aggregates().cube,
+        version=CUBE_VERSION,
+        use_cache=use_cache,
+    )
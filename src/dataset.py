@@ -0,0 +1,115 @@
+"""
+Handle preguiçoso (lazy) para datasets carregados sob demanda.
+
+Evita que importar `tools.py` (e, por consequência, `agent.py`) carregue os
+dados: a carga acontece na primeira chamada de ferramenta que precisar deles,
+ou antecipadamente em uma thread de fundo via `warm_async()`.
+"""
+import logging
+import threading
+import time
+from typing import Callable, Generic, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class LazyDataset(Generic[T]):
+    """
+    Carrega um valor (tipicamente um DataFrame) na primeira vez que é pedido.
+
+    É thread-safe: chamadas concorrentes a `get()` esperam a mesma carga, e
+    `warm_async()` pode iniciar a carga em segundo plano enquanto a primeira
+    chamada ao LLM está em andamento.
+    """
+
+    def __init__(self, factory: Callable[[], T], name: str = "dataset") -> None:
+        self._factory = factory
+        self.name = name
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._value: Optional[T] = None
+        self._loaded = False
+        self._thread: Optional[threading.Thread] = None
+        self.version = 0
+        self.load_seconds: Optional[float] = None
+
+    @property
+    def loaded(self) -> bool:
+        """Indica se o valor já está em memória."""
+        return self._loaded
+
+    def get(self) -> T:
+        """
+        Retorna o valor, carregando-o se necessário.
+        """
+        if self._loaded:
+            return self._value  # type: ignore[return-value]
+        with self._lock:
+            if not self._loaded:
+                start = time.perf_counter()
+                self._value = self._factory()
+                self.load_seconds = time.perf_counter() - start
+                self._loaded = True
+                logger.info(
+                    "Dataset '%s' carregado em %.3fs", self.name, self.load_seconds
+                )
+        return self._value  # type: ignore[return-value]
+
+    def warm_async(self) -> Optional[threading.Thread]:
+        """
+        Inicia a carga em uma thread daemon, se ainda não carregado.
+
+        Returns:
+            A thread de carga, ou None se o valor já estava carregado.
+        """
+        if self._loaded:
+            return None
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._warm, name=f"warm-{self.name}", daemon=True
+                )
+                self._thread.start()
+            return self._thread
+
+    def _warm(self) -> None:
+        try:
+            self.get()
+        except Exception:  # erro será relançado na próxima chamada de get()
+            logger.exception("Falha ao pré-carregar dataset '%s'", self.name)
+
+    def reload(self) -> T:
+        """
+        Carrega novamente e troca o valor atual de forma atômica.
+
+        Enquanto a nova carga acontece, `get()` continua devolvendo o valor
+        antigo (troca sem indisponibilidade); se a carga falhar, o valor
+        antigo é mantido. Incrementa `version`, que caches derivados (ex.:
+        resultados de ferramentas) usam para se invalidar.
+        """
+        with self._reload_lock:
+            start = time.perf_counter()
+            value = self._factory()
+            with self._lock:
+                self._value = value
+                self._loaded = True
+                self.version += 1
+                self.load_seconds = time.perf_counter() - start
+            logger.info(
+                "Dataset '%s' recarregado (versão %d) em %.3fs",
+                self.name, self.version, self.load_seconds,
+            )
+        return value
+
+    def refresh(self) -> None:
+        """
+        Recarrega (via `reload`) se o valor já estiver em memória; senão
+        apenas incrementa `version`, e a próxima `get()` lê os dados novos.
+        """
+        with self._lock:
+            if not self._loaded:
+                self.version += 1
+                return
+        self.reload()
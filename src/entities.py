@@ -0,0 +1,200 @@
+"""
+Filtros e entidades de uma pergunta: município, ano, mês, período relativo,
+região, exclusão, sexo, faixa de idade, CID ou doença e quantidade pedida.
+
+O roteador usa os filtros para não mandar uma pergunta filtrada a uma
+ferramenta que não os aceita, e o cache de respostas usa as entidades como
+chave: perguntas com entidades diferentes ("Santa Maria" e "Santa Rosa",
+"homens" e "mulheres", "a cidade" e "as cidades") nunca compartilham a
+resposta.
+
+Municípios são reconhecidos pelo `MunicipalityIndex` (IBGE/IDH) sobre o
+texto sem acento e sem caixa, então "em pelotas" conta como "em Pelotas".
+"""
+import re
+from functools import lru_cache
+from typing import FrozenSet, List, NamedTuple, Optional, Set, Tuple
+
+from municipios import MunicipalityIndex, build_index, fold_name
+
+MONTHS = {
+    "janeiro": 1, "fevereiro": 2, "marco": 3, "abril": 4, "maio": 5, "junho": 6,
+    "julho": 7, "agosto": 8, "setembro": 9, "outubro": 10, "novembro": 11, "dezembro": 12,
+}
+
+_NUMBER_WORDS = {
+    "dois": 2, "duas": 2, "tres": 3, "quatro": 4, "cinco": 5, "seis": 6,
+    "sete": 7, "oito": 8, "nove": 9, "dez": 10, "quinze": 15, "vinte": 20,
+}
+
+# Texto já normalizado por `fold_name` (sem acento, caixa e pontuação)
+_RE_YEAR = re.compile(r"\b((?:19|20)\d{2})\b")
+_RE_COUNT = re.compile(r"\b(\d{1,3})\b")
+_RE_STATE = re.compile(r"\b(rio grande do sul|rs|estado|estadual)\b")
+_RE_PERIOD = re.compile(
+    r"\b((?:ano|mes|semestre|trimestre|semana)s?\s+(?:passad[oa]s?|anterior(?:es)?|atual|corrente|retrasado)|"
+    r"(?:este|esse|neste|nesse|deste|desse)\s+(?:ano|mes|semestre|trimestre)|"
+    r"ultim[oa]s?(?:\s+\w+)?|recentes?|recentemente|hoje|ontem|desde|ate|antes|depois|"
+    r"periodo|pandemia|inverno|verao|outono|primavera)\b"
+)
+_RE_REGION = re.compile(
+    r"\b(regi(?:ao|oes)(?:\s+\w+)?|serra(?:\s+gaucha)?|litoral(?:\s+\w+)?|metropolitana|"
+    r"grande\s+porto\s+alegre|fronteira(?:\s+oeste)?|campanha|missoes|vale\s+do\s+\w+|"
+    r"capital|interior|norte|sul|leste|oeste|nordeste|noroeste|sudeste|sudoeste|centro|central)\b"
+)
+_RE_EXCLUSION = re.compile(
+    r"\b(exceto|excluindo|excluid[oa]s?|sem\s+contar|sem|fora|tirando|salvo|alem\s+de|nao\s+incluindo)\b"
+)
+_SEX_TERMS = {
+    "homem": "masculino", "homens": "masculino", "masculino": "masculino", "masculinos": "masculino",
+    "mulher": "feminino", "mulheres": "feminino", "feminino": "feminino", "femininos": "feminino",
+    "gestantes": "feminino", "gravidas": "feminino", "sexo": "sexo", "genero": "sexo",
+}
+_AGE_TERMS = {
+    "crianca": "criancas", "criancas": "criancas", "infantil": "criancas", "infantis": "criancas",
+    "bebe": "bebes", "bebes": "bebes", "recem": "bebes", "lactentes": "bebes",
+    "adolescente": "adolescentes", "adolescentes": "adolescentes",
+    "jovem": "jovens", "jovens": "jovens",
+    "adulto": "adultos", "adultos": "adultos",
+    "idoso": "idosos", "idosos": "idosos", "idosa": "idosos", "idosas": "idosos", "terceira": "idosos",
+}
+_RE_AGE_BOUND = re.compile(
+    r"\b(?:(acima|abaixo|maiores|menores|mais|menos)\s+de\s+)?(\d{1,3})\s+anos\b"
+)
+_RE_CID = re.compile(r"\b([a-z]\d{2}(?:\s?\d)?)\b")
+_DISEASES = {
+    "asma": "asma", "asmaticos": "asma", "pneumonia": "pneumonia", "pneumonias": "pneumonia",
+    "bronquite": "bronquite", "bronquites": "bronquite", "bronquiolite": "bronquiolite",
+    "gripe": "influenza", "influenza": "influenza", "covid": "covid", "coronavirus": "covid",
+    "dpoc": "dpoc", "enfisema": "dpoc", "tuberculose": "tuberculose", "sinusite": "sinusite",
+    "rinite": "rinite", "faringite": "faringite", "amigdalite": "amigdalite", "laringite": "laringite",
+    "cancer": "cancer", "tumor": "cancer", "tumores": "cancer", "neoplasia": "cancer",
+    "infarto": "infarto", "avc": "avc", "diabetes": "diabetes", "hipertensao": "hipertensao",
+    "dengue": "dengue", "fraturas": "fraturas", "fratura": "fraturas", "parto": "parto", "partos": "parto",
+}
+# "doença(s) X" (cardíacas, renais...): X vira a entidade; respiratórias é o padrão das ferramentas
+_RE_DISEASE_GROUP = re.compile(r"\b(?:doencas?|problemas?|causas?)\s+(?:d[eoa]s?\s+)?(\w+)")
+_RE_PLURAL = re.compile(r"\b(quais|cidades|municipios|faixas|idades|cids|diagnosticos)\b")
+
+
+class QueryEntities(NamedTuple):
+    """
+    Entidades de uma pergunta (conjuntos de termos normalizados).
+
+    Attributes:
+        cities: Municípios citados (nome normalizado do índice)
+        years: Anos citados
+        months: Meses citados (1–12)
+        periods: Períodos relativos ("ano passado", "ultimos")
+        regions: Regiões ("serra gaucha", "metropolitana")
+        exclusions: Marcadores de exclusão ("exceto", "sem")
+        sexes: "masculino", "feminino" ou "sexo" (agrupamento)
+        ages: Grupos ("criancas", "idosos") e limites ("acima de 60 anos")
+        diseases: CIDs (em maiúsculas) e doenças citadas
+        count: Quantidade pedida: o número ("5"), "singular" ou "plural"
+    """
+    cities: FrozenSet[str] = frozenset()
+    years: FrozenSet[int] = frozenset()
+    months: FrozenSet[int] = frozenset()
+    periods: FrozenSet[str] = frozenset()
+    regions: FrozenSet[str] = frozenset()
+    exclusions: FrozenSet[str] = frozenset()
+    sexes: FrozenSet[str] = frozenset()
+    ages: FrozenSet[str] = frozenset()
+    diseases: FrozenSet[str] = frozenset()
+    count: str = "singular"
+
+    @property
+    def has_filters(self) -> bool:
+        """Se a pergunta restringe ou separa os dados (tudo menos `count`)."""
+        return any(self[:-1])
+
+    def key(self) -> FrozenSet[str]:
+        """Termos marcados pelo tipo ("cidade:pelotas", "n:5"), para comparar perguntas."""
+        terms = {f"n:{self.count}"}
+        for field, values in zip(self._fields[:-1], self[:-1]):
+            terms.update(f"{field}:{value}" for value in values)
+        return frozenset(terms)
+
+
+@lru_cache(maxsize=1)
+def _default_index() -> MunicipalityIndex:
+    """Índice de municípios (IBGE/IDH), construído uma vez por processo."""
+    return build_index()
+
+
+def _city_names(index: MunicipalityIndex) -> Tuple[Set[str], int]:
+    names = set(index.ids)
+    return names, max((len(name.split()) for name in names), default=0)
+
+
+def find_cities(text: str, index: Optional[MunicipalityIndex] = None) -> Tuple[List[str], str]:
+    """
+    Municípios citados em `text` (já normalizado por `fold_name`), pelo
+    nome mais longo que casa em cada posição ("santa maria" antes de
+    "santa"), e o texto sem eles.
+    """
+    names, longest = _city_names(index if index is not None else _default_index())
+    words = text.split()
+    found: List[str] = []
+    rest: List[str] = []
+    i = 0
+    while i < len(words):
+        for size in range(min(longest, len(words) - i), 0, -1):
+            candidate = " ".join(words[i:i + size])
+            if candidate in names:
+                found.append(candidate)
+                i += size
+                break
+        else:
+            rest.append(words[i])
+            i += 1
+    return found, " ".join(rest)
+
+
+def extract_entities(prompt: str, index: Optional[MunicipalityIndex] = None) -> QueryEntities:
+    """
+    Extrai as entidades de `prompt`.
+
+    Args:
+        prompt: Pergunta do usuário
+        index: Índice de municípios (padrão: IBGE/IDH do projeto)
+    """
+    text = _RE_STATE.sub(" ", fold_name(prompt))
+    cities, text = find_cities(text, index)
+    words = text.split()
+
+    years = {int(y) for y in _RE_YEAR.findall(text)}
+    text_no_years = _RE_YEAR.sub(" ", text)
+    ages = {_AGE_TERMS[w] for w in words if w in _AGE_TERMS}
+    for bound, age in _RE_AGE_BOUND.findall(text_no_years):
+        ages.add(f"{bound} {int(age)} anos".strip())
+    # "mais jovens" é direção (get_top_ages), não filtro
+    if "jovens" in ages and re.search(r"\bmais\s+jovens\b", text):
+        ages.discard("jovens")
+    diseases = {code.replace(" ", "").upper() for code in _RE_CID.findall(text)}
+    diseases.update(_DISEASES[w] for w in words if w in _DISEASES)
+    diseases.update(
+        group for group in _RE_DISEASE_GROUP.findall(text) if not group.startswith("respirator")
+    )
+
+    count_text = _RE_AGE_BOUND.sub(" ", text_no_years)
+    match = _RE_COUNT.search(count_text)
+    if match:
+        count = str(int(match.group(1)))
+    else:
+        count = next((str(_NUMBER_WORDS[w]) for w in count_text.split() if w in _NUMBER_WORDS), "")
+        count = count or ("plural" if _RE_PLURAL.search(count_text) else "singular")
+
+    return QueryEntities(
+        cities=frozenset(cities),
+        years=frozenset(years),
+        months=frozenset(MONTHS[w] for w in words if w in MONTHS),
+        periods=frozenset(m.group(0) for m in _RE_PERIOD.finditer(text)),
+        regions=frozenset(m.group(0) for m in _RE_REGION.finditer(text)),
+        exclusions=frozenset(m.group(0) for m in _RE_EXCLUSION.finditer(text)),
+        sexes=frozenset(_SEX_TERMS[w] for w in words if w in _SEX_TERMS),
+        ages=frozenset(ages),
+        diseases=frozenset(diseases),
+        count=count,
+    )
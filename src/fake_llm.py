@@ -0,0 +1,210 @@
+"""
+Modelo de chat falso e local, usado como substituto do Ollama em testes de
+carga e desenvolvimento.
+
+Simula a latência do LLM (síncrona e assíncrona) e escolhe ferramentas com o
+roteador de intenções, devolvendo respostas no mesmo formato do ChatOllama.
+"""
+import asyncio
+import json
+import random
+import time
+import uuid
+from functools import lru_cache
+from typing import Any, AsyncIterator, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import PrivateAttr
+
+from tool_selection import schema_tokens
+
+
+class FakeLLMError(RuntimeError):
+    """Falha injetada pelo `FakeChatModel`."""
+
+
+@lru_cache(maxsize=64)
+def _router_for(tool_names: Tuple[str, ...]) -> Any:
+    # Import tardio: `agent` importa este módulo indiretamente
+    from agent import TOOL_REGISTRY
+    from router import IntentRouter
+
+    tools = [TOOL_REGISTRY[n] for n in tool_names if n in TOOL_REGISTRY]
+    return IntentRouter(tools, threshold=0.0)
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Modelo de chat determinístico com latência configurável.
+
+    - Se a última mensagem é do usuário e há ferramentas vinculadas, responde
+      com uma chamada de ferramenta escolhida pelo `IntentRouter`.
+    - Caso contrário, resume o conteúdo das ToolMessages em português.
+
+    Os tokens de entrada incluem os schemas das ferramentas vinculadas, como
+    no Ollama; com `prompt_token_latency`, o tempo de processamento do prompt
+    cresce com eles e é informado em `response_metadata`
+    (`prompt_eval_count`, `prompt_eval_duration` em ns).
+
+    Attributes:
+        latency: Segundos de espera por chamada
+        jitter: Variação aleatória (±) somada à latência
+        failure_rate: Probabilidade (0–1) de levantar `FakeLLMError`
+        stall_rate: Probabilidade (0–1) de a chamada travar por `stall_latency`
+            segundos a mais (servidor de modelo sobrecarregado)
+        token_latency: Segundos entre pedaços no streaming
+        prompt_token_latency: Segundos de processamento por token de entrada
+        misroute_rate: Probabilidade (0–1) de responder sem chamar a
+            ferramenta quando deveria (como um modelo pequeno que erra a
+            seleção)
+        model: Nome do modelo (métricas por modelo)
+    """
+
+    latency: float = 0.5
+    jitter: float = 0.0
+    failure_rate: float = 0.0
+    stall_rate: float = 0.0
+    stall_latency: float = 30.0
+    seed: Optional[int] = None
+    token_latency: float = 0.0
+    prompt_token_latency: float = 0.0
+    tool_names: List[str] = []
+    tool_tokens: int = 0
+    misroute_rate: float = 0.0
+    model: str = "fake"
+
+    _rng: random.Random = PrivateAttr(default=None)
+
+    def model_post_init(self, __context: Any) -> None:
+        self._rng = random.Random(self.seed)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any) -> "FakeChatModel":
+        """Retorna uma cópia que conhece as ferramentas vinculadas."""
+        return self.model_copy(update={
+            "tool_names": [t.name for t in tools],
+            "tool_tokens": sum(schema_tokens(t) for t in tools),
+        })
+
+    def _delay(self, message: AIMessage) -> float:
+        if self.failure_rate and self._rng.random() < self.failure_rate:
+            raise FakeLLMError("Falha simulada do modelo.")
+        prefill = self.prompt_token_latency * message.usage_metadata["input_tokens"]
+        stall = self.stall_latency if self.stall_rate and self._rng.random() < self.stall_rate else 0.0
+        return max(0.0, self.latency + prefill + stall + self._rng.uniform(-self.jitter, self.jitter))
+
+    def _with_usage(self, messages: List[BaseMessage], message: AIMessage) -> AIMessage:
+        """Anexa `usage_metadata` aproximado (palavras), como o ChatOllama informa tokens."""
+        input_tokens = sum(len(str(m.content).split()) for m in messages) + self.tool_tokens
+        output_tokens = len(str(message.content).split()) + len(message.tool_calls)
+        message.usage_metadata = {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+        }
+        if self.prompt_token_latency:
+            message.response_metadata = {
+                "prompt_eval_count": input_tokens,
+                "prompt_eval_duration": int(input_tokens * self.prompt_token_latency * 1e9),
+            }
+        return message
+
+    def _respond(self, messages: List[BaseMessage]) -> AIMessage:
+        return self._with_usage(messages, self._choose(messages))
+
+    def _choose(self, messages: List[BaseMessage]) -> AIMessage:
+        last = messages[-1]
+        if isinstance(last, HumanMessage) and self.tool_names:
+            route = _router_for(tuple(self.tool_names)).route(str(last.content))
+            misrouted = self.misroute_rate and self._rng.random() < self.misroute_rate
+            if route is not None and not misrouted:
+                return AIMessage(
+                    content="",
+                    tool_calls=[{
+                        "name": route.tool,
+                        "args": route.args,
+                        "id": f"fake-{uuid.uuid4().hex[:12]}",
+                    }],
+                )
+        results = [str(m.content) for m in messages if isinstance(m, ToolMessage)]
+        if results:
+            return AIMessage(content="Claro! Veja só: " + "; ".join(results))
+        return AIMessage(content=json.dumps({"resposta": "Não sei responder a isso."}, ensure_ascii=False))
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        message = self._respond(messages)
+        time.sleep(self._delay(message))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        message = self._respond(messages)
+        await asyncio.sleep(self._delay(message))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _chunks(self, message: AIMessage) -> List[AIMessageChunk]:
+        if message.tool_calls:
+            return [AIMessageChunk(
+                content="",
+                usage_metadata=message.usage_metadata,
+                response_metadata=message.response_metadata,
+                tool_call_chunks=[
+                    {"name": c["name"], "args": json.dumps(c["args"]), "id": c["id"], "index": i}
+                    for i, c in enumerate(message.tool_calls)
+                ],
+            )]
+        words = str(message.content).split(" ")
+        chunks = [
+            AIMessageChunk(content=word if i == 0 else " " + word)
+            for i, word in enumerate(words)
+        ]
+        # Como no Ollama, o uso de tokens vem no último pedaço
+        chunks[-1].usage_metadata = message.usage_metadata
+        chunks[-1].response_metadata = message.response_metadata
+        return chunks
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        message = self._respond(messages)
+        time.sleep(self._delay(message))
+        for chunk in self._chunks(message):
+            yield ChatGenerationChunk(message=chunk)
+            time.sleep(self.token_latency)
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        message = self._respond(messages)
+        await asyncio.sleep(self._delay(message))
+        for chunk in self._chunks(message):
+            yield ChatGenerationChunk(message=chunk)
+            await asyncio.sleep(self.token_latency)
@@ -1,7 +1,14 @@
-from loader import load_raw
 from langchain_core.tools import tool
 from typing import List, Tuple
 
+from columnar import AggregationResult, AggregationSpec
+from tools import aggregate
+
+
+def _respiratory(city: str, year: int, **kwargs) -> AggregationResult:
+    """Internações CID J de um município e ano (ver `columnar.AggregationSpec`)."""
+    return aggregate(AggregationSpec(city=city, year_from=year, year_to=year, cid_prefix="J", **kwargs))
+
 
 @tool(parse_docstring=True)
 def total_hospitalizations(city: str, year: int) -> int:
@@ -16,14 +23,7 @@ def total_hospitalizations(city: str, year: int) -> int:
     Returns:
         int: Número de internações
     """
-    df, df1, df2, df3 = load_raw()
-    # filtrar CID-10 J00–J99
-    df_resp = df[
-        df["DIAG_PRINC"].str.startswith("J", na=False) &
-        (df["CIDADE_RESIDENCIA_PACIENTE"].str.lower() == city.lower()) &
-        (df["ano"] == year)
-        ]
-    return int(df_resp.shape[0])
+    return _respiratory(city, year).counts[0]
 
 
 @tool(parse_docstring=True)
@@ -39,13 +39,8 @@ def avg_cost(city: str, year: int) -> float:
     Returns:
         float: Valor médio de VAL_TOT
     """
-    df = load_sus()
-    df_resp = df[
-        df["DIAG_PRINC"].str.startswith("J", na=False) &
-        (df["CIDADE_RESIDENCIA_PACIENTE"].str.lower() == city.lower()) &
-        (df["ano"] == year)
-        ]
-    return float(df_resp["VAL_TOT"].mean() or 0.0)
+    # 0.0 quando não há valores
+    return _respiratory(city, year, metric="custo_medio").values[0]
 
 
 @tool(parse_docstring=True)
@@ -61,15 +56,7 @@ def mortality_rate(city: str, year: int) -> float:
     Returns:
         float: Taxa de mortalidade (0.0–1.0)
     """
-    df = load_sus()
-    df_resp = df[
-        df["DIAG_PRINC"].str.startswith("J", na=False) &
-        (df["CIDADE_RESIDENCIA_PACIENTE"].str.lower() == city.lower()) &
-        (df["ano"] == year)
-        ]
-    if df_resp.empty:
-        return 0.0
-    return float(df_resp["MORTE"].sum() / df_resp.shape[0])
+    return _respiratory(city, year, metric="taxa_mortalidade").values[0]
 
 
 @tool(parse_docstring=True)
@@ -86,15 +73,6 @@ def top_diagnoses(city: str, year: int, n: int = 5) -> List[Tuple[str, int]]:
     Returns:
         List[Tuple[str,int]]: Lista de (CID-10, contagem)
     """
-    df = load_sus()
-    df_resp = df[
-        df["DIAG_PRINC"].str.startswith("J", na=False) &
-        (df["CIDADE_RESIDENCIA_PACIENTE"].str.lower() == city.lower()) &
-        (df["ano"] == year)
-        ]
-    top = (
-        df_resp.groupby("DIAG_PRINC").size()
-        .nlargest(n)
-        .reset_index(name="count")
-    )
-    return list(top.itertuples(index=False, name=None))
+    # Empates pela ordem do CID
+    result = _respiratory(city, year, group_by="cid", top_n=n)
+    return list(zip(result.keys, result.counts))
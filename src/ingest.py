@@ -0,0 +1,542 @@
+"""
+Ingestão incremental de arquivos mensais do SUS (SIH/DATASUS).
+
+Os arquivos novos (CSV no formato de `dados_sus3.csv`) são lidos em blocos,
+preparados com `prepare_sus` e gravados num armazenamento particionado por
+ano (`ano`) e mês de internação (`DT_INTER`):
+
+    data/store/sus/
+        manifest.json                                  versão, arquivos e partições
+        ano=2024/mes=01/<arquivo>-<hash>-<bloco>.feather   linhas preparadas
+        ano=2024/mes=01/agg-v000007-{counts,cube}.feather  agregados da partição
+        totals/v000007-{counts,cube}.feather               agregados totais
+
+Só as partições tocadas por um arquivo são regravadas. Os agregados
+(`aggregates.SusAggregates`) são somas, então o total novo é o anterior mais
+o delta do arquivo. Reingerir um arquivo com o mesmo nome e conteúdo
+diferente (mês republicado) substitui as linhas antigas e recalcula as
+partições afetadas a partir das linhas guardadas.
+
+Cada ingestão incrementa a `version` do manifesto, gravado por último e de
+forma atômica: leitores sempre veem uma versão completa. Processos em
+execução usam `StoreWatcher` para perceber a versão nova e trocar os
+datasets sem parar de atender.
+
+Quando o armazenamento existe, ele é a fonte dos agregados das ferramentas,
+no lugar de `data/raw/dados_sus3.csv`.
+
+Uso:
+    python src/ingest.py --bootstrap                 # carga inicial com o CSV atual
+    python src/ingest.py RDRS2401.csv RDRS2402.csv   # novos meses
+    python src/ingest.py --status
+"""
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+import pandas as pd
+
+try:
+    import pyarrow.feather as feather
+    _HAS_ARROW = True
+except ImportError:  # pragma: no cover - depende do ambiente
+    _HAS_ARROW = False
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+from aggregates import DEFAULT_CHUNK_ROWS, SusAggregates, clear_aggregates
+from dataset import LazyDataset
+from loader import RAW_SOURCES, get_raw_dir, get_store_dir, load_raw, load_sus, prepare_sus, source_fingerprint
+
+logger = logging.getLogger(__name__)
+
+# Incremente ao mudar o layout do armazenamento ou as colunas do cubo
+STORE_FORMAT_VERSION = 2
+
+MANIFEST_NAME = "manifest.json"
+
+# Versões anteriores dos agregados totais mantidas em disco, para processos
+# que leram o manifesto antigo e ainda estão abrindo os arquivos
+KEEP_VERSIONS = 1
+
+
+class IngestResult(NamedTuple):
+    """Resumo de uma chamada a `ingest_files`."""
+    version: int
+    ingested: List[str]
+    skipped: List[str]
+    partitions: List[str]
+    rows: int
+
+
+def get_sus_store_dir() -> Path:
+    """Diretório do armazenamento do SUS (`data/store/sus`)."""
+    return get_store_dir() / "sus"
+
+
+def _partition_dir(store: Path, partition: str) -> Path:
+    year, month = partition.split("-")
+    return store / f"ano={year}" / f"mes={month}"
+
+
+def _version_name(version: int) -> str:
+    return f"v{version:06d}"
+
+
+def _empty_manifest() -> Dict[str, Any]:
+    return {"format_version": STORE_FORMAT_VERSION, "version": 0, "files": {}, "partitions": {}}
+
+
+def read_manifest(store: Optional[Path] = None) -> Optional[Dict[str, Any]]:
+    """
+    Manifesto do armazenamento, ou None se ainda não houve ingestão.
+
+    Raises:
+        ValueError: Se o armazenamento tiver um formato incompatível
+    """
+    path = (store or get_sus_store_dir()) / MANIFEST_NAME
+    try:
+        manifest = json.loads(path.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return None
+    if manifest.get("format_version") != STORE_FORMAT_VERSION:
+        raise ValueError(
+            f"Formato do armazenamento incompatível em {path}: "
+            f"{manifest.get('format_version')} (esperado {STORE_FORMAT_VERSION})"
+        )
+    return manifest
+
+
+def store_version(store: Optional[Path] = None) -> Optional[int]:
+    """Versão atual do armazenamento (None se ainda não houve ingestão)."""
+    manifest = read_manifest(store)
+    return None if manifest is None else int(manifest["version"])
+
+
+def _write_json(path: Path, data: Dict[str, Any]) -> None:
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_text(json.dumps(data, indent=2, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+def _write_feather(df: pd.DataFrame, path: Path) -> None:
+    tmp_path = path.with_name(path.name + ".tmp")
+    feather.write_feather(df.reset_index(drop=True), tmp_path, compression="uncompressed")
+    os.replace(tmp_path, path)
+
+
+def _read_feather(path: Path) -> pd.DataFrame:
+    return feather.read_table(path, memory_map=True).to_pandas()
+
+
+def _aggregate_paths(prefix: Path) -> Tuple[Path, Path]:
+    return prefix.with_name(prefix.name + "-counts.feather"), prefix.with_name(prefix.name + "-cube.feather")
+
+
+def _write_aggregates(aggregates: SusAggregates, prefix: Path) -> None:
+    counts_path, cube_path = _aggregate_paths(prefix)
+    prefix.parent.mkdir(parents=True, exist_ok=True)
+    _write_feather(aggregates.counts_frame(), counts_path)
+    _write_feather(aggregates.cube, cube_path)
+
+
+def _read_aggregates(prefix: Path) -> SusAggregates:
+    counts_path, cube_path = _aggregate_paths(prefix)
+    return SusAggregates.from_tables(_read_feather(counts_path), _read_feather(cube_path))
+
+
+def _partition_prefix(store: Path, partition: str, version: int) -> Path:
+    return _partition_dir(store, partition) / f"agg-{_version_name(version)}"
+
+
+def _totals_prefix(store: Path, version: int) -> Path:
+    return store / "totals" / _version_name(version)
+
+
+def load_store_aggregates(store: Optional[Path] = None) -> Optional[SusAggregates]:
+    """
+    Agregados totais da versão atual do armazenamento, ou None se ainda não
+    houve ingestão (as ferramentas então usam o CSV de `data/raw`).
+    """
+    store = store or get_sus_store_dir()
+    manifest = read_manifest(store)
+    if manifest is None or not manifest["version"] or not _HAS_ARROW:
+        return None
+    logger.debug("Lendo agregados da versão %d de %s", manifest["version"], store)
+    return _read_aggregates(_totals_prefix(store, manifest["version"]))
+
+
+def store_partitions(store: Optional[Path] = None) -> Dict[str, List[str]]:
+    """
+    Arquivos de linhas de cada partição ("AAAA-MM") da versão atual do
+    armazenamento (vazio se ainda não houve ingestão). Uma partição cuja
+    lista não mudou entre duas versões tem as mesmas linhas.
+    """
+    manifest = read_manifest(store)
+    if manifest is None:
+        return {}
+    return {partition: list(info["parts"]) for partition, info in sorted(manifest["partitions"].items())}
+
+
+def iter_store_frames(
+    store: Optional[Path] = None,
+    partitions: Optional[Iterable[str]] = None,
+) -> Iterator[pd.DataFrame]:
+    """
+    Linhas preparadas da versão atual do armazenamento, uma parte por vez,
+    em ordem de partição (ano, mês).
+
+    Args:
+        store: Diretório do armazenamento (padrão: `data/store/sus`)
+        partitions: Só estas partições ("AAAA-MM"; padrão: todas)
+    """
+    store = store or get_sus_store_dir()
+    manifest = read_manifest(store)
+    if manifest is None:
+        return
+    wanted = None if partitions is None else set(partitions)
+    for partition, info in sorted(manifest["partitions"].items()):
+        if wanted is not None and partition not in wanted:
+            continue
+        directory = _partition_dir(store, partition)
+        for name in info["parts"]:
+            yield _read_feather(directory / name)
+
+
+@contextmanager
+def _store_lock(store: Path) -> Iterator[None]:
+    """Exclusão mútua entre processos de ingestão (quando há `fcntl`)."""
+    store.mkdir(parents=True, exist_ok=True)
+    with open(store / ".lock", "w") as fh:
+        if fcntl is not None:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+        yield
+
+
+def _read_chunks(path: Path, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    """Lê o CSV em blocos, com os parâmetros de leitura do SUS."""
+    _, read_kwargs = RAW_SOURCES["sus"]
+    kwargs = {k: v for k, v in read_kwargs.items() if k not in ("parse_dates", "low_memory")}
+    columns = set(pd.read_csv(path, nrows=0, **kwargs).columns)
+    kwargs["parse_dates"] = [col for col in read_kwargs.get("parse_dates", []) if col in columns]
+    with pd.read_csv(path, chunksize=chunk_rows, **kwargs) as reader:
+        yield from reader
+
+
+def partition_codes(df: pd.DataFrame) -> pd.Series:
+    """
+    Código AAAAMM da partição de cada linha: `ano` e o mês de `DT_INTER`
+    (mês 00 quando a data estiver ausente ou inválida).
+    """
+    years = pd.to_numeric(df["ano"], errors="coerce").fillna(0).astype("int64")
+    if "DT_INTER" in df.columns:
+        months = pd.to_datetime(df["DT_INTER"], errors="coerce").dt.month.fillna(0).astype("int64")
+    else:
+        months = pd.Series(0, index=df.index, dtype="int64")
+    return years * 100 + months
+
+
+def _write_file_parts(
+    store: Path,
+    path: Path,
+    sha256: str,
+    chunk_rows: int,
+) -> Tuple[Dict[str, SusAggregates], Dict[str, List[str]], int]:
+    """
+    Grava as linhas preparadas de `path` nas partições.
+
+    Returns:
+        Tuple (delta dos agregados por partição, arquivos gravados por
+        partição, linhas lidas)
+    """
+    stem = f"{path.stem}-{sha256[:8]}"
+    deltas: Dict[str, SusAggregates] = {}
+    parts: Dict[str, List[str]] = {}
+    rows = 0
+    for i, chunk in enumerate(_read_chunks(path, chunk_rows)):
+        prepared, _ = prepare_sus(chunk)
+        for code, group in prepared.groupby(partition_codes(prepared), sort=True):
+            partition = f"{code // 100:04d}-{code % 100:02d}"
+            directory = _partition_dir(store, partition)
+            directory.mkdir(parents=True, exist_ok=True)
+            part_name = f"{stem}-{i:04d}.feather"
+            _write_feather(group, directory / part_name)
+            parts.setdefault(partition, []).append(part_name)
+            delta = SusAggregates.from_frame(group)
+            deltas[partition] = deltas[partition].merge(delta) if partition in deltas else delta
+        rows += len(prepared)
+    return deltas, parts, rows
+
+
+def _recompute_partition(store: Path, partition: str, parts: List[str]) -> Optional[SusAggregates]:
+    """Agregados de uma partição a partir das linhas guardadas (None se vazia)."""
+    directory = _partition_dir(store, partition)
+    aggregates = [SusAggregates.from_frame(_read_feather(directory / name)) for name in parts]
+    return SusAggregates.combine(aggregates) if aggregates else None
+
+
+def ingest_files(
+    paths: Sequence[os.PathLike],
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+    store: Optional[Path] = None,
+) -> IngestResult:
+    """
+    Acrescenta arquivos mensais ao armazenamento particionado e atualiza os
+    agregados de forma incremental.
+
+    Arquivos já ingeridos com o mesmo conteúdo (SHA-256) são ignorados; com
+    o mesmo nome e conteúdo diferente, substituem a versão anterior.
+
+    Args:
+        paths: CSVs no formato de `dados_sus3.csv`
+        chunk_rows: Linhas por bloco de leitura
+        store: Diretório do armazenamento (padrão: `data/store/sus`)
+
+    Returns:
+        IngestResult com a versão resultante e as partições regravadas
+
+    Raises:
+        RuntimeError: Se o pyarrow não estiver instalado
+        FileNotFoundError: Se algum arquivo não existir
+        ValueError: Se faltar alguma coluna obrigatória
+    """
+    if not _HAS_ARROW:
+        raise RuntimeError("pyarrow não está instalado; o armazenamento particionado está indisponível.")
+    store = Path(store) if store else get_sus_store_dir()
+    started = time.perf_counter()
+
+    with _store_lock(store):
+        manifest = read_manifest(store) or _empty_manifest()
+        previous = int(manifest["version"])
+        version = previous + 1
+        deltas: Dict[str, SusAggregates] = {}
+        recompute: Set[str] = set()
+        obsolete: List[Path] = []
+        ingested: List[str] = []
+        skipped: List[str] = []
+        rows = 0
+
+        for path in map(Path, paths):
+            fingerprint = source_fingerprint(path, {})
+            entry = manifest["files"].get(path.name)
+            if entry and entry["sha256"] == fingerprint["sha256"]:
+                logger.info("'%s' já foi ingerido; ignorando", path.name)
+                skipped.append(path.name)
+                continue
+            if entry:
+                # Mês republicado: as linhas antigas saem e as partições são recalculadas
+                logger.info("'%s' mudou desde a última ingestão; substituindo", path.name)
+                for partition, names in entry["parts"].items():
+                    info = manifest["partitions"][partition]
+                    info["parts"] = [name for name in info["parts"] if name not in names]
+                    obsolete.extend(_partition_dir(store, partition) / name for name in names)
+                    recompute.add(partition)
+
+            file_deltas, parts, file_rows = _write_file_parts(store, path, fingerprint["sha256"], chunk_rows)
+            for partition, delta in file_deltas.items():
+                info = manifest["partitions"].setdefault(partition, {"parts": [], "aggregates": None})
+                info["parts"].extend(parts[partition])
+                deltas[partition] = deltas[partition].merge(delta) if partition in deltas else delta
+            manifest["files"][path.name] = {
+                "sha256": fingerprint["sha256"],
+                "size": fingerprint["size"],
+                "rows": file_rows,
+                "parts": parts,
+                "ingested_at": datetime.now().isoformat(timespec="seconds"),
+                "version": version,
+            }
+            ingested.append(path.name)
+            rows += file_rows
+            logger.info("'%s': %d linhas em %d partições", path.name, file_rows, len(parts))
+
+        touched = sorted(set(deltas) | recompute)
+        if not ingested:
+            return IngestResult(previous, ingested, skipped, [], 0)
+
+        # Agregados das partições tocadas: anterior + delta, ou recalculados
+        replaced_prefixes = []
+        for partition in touched:
+            info = manifest["partitions"][partition]
+            if info["aggregates"]:
+                replaced_prefixes.append(_partition_prefix(store, partition, info["aggregates"]))
+            if partition in recompute:
+                aggregates = _recompute_partition(store, partition, info["parts"])
+            elif info["aggregates"]:
+                aggregates = _read_aggregates(_partition_prefix(store, partition, info["aggregates"]))
+                aggregates = aggregates.merge(deltas[partition])
+            else:
+                aggregates = deltas[partition]
+            if aggregates is None:
+                del manifest["partitions"][partition]
+                continue
+            _write_aggregates(aggregates, _partition_prefix(store, partition, version))
+            info.update(aggregates=version, rows=aggregates.rows)
+
+        # Agregados totais: anterior + deltas; com substituição, soma das partições
+        if recompute:
+            parts = [
+                _read_aggregates(_partition_prefix(store, partition, info["aggregates"]))
+                for partition, info in sorted(manifest["partitions"].items())
+            ]
+        else:
+            parts = list(deltas.values())
+            if previous:
+                parts.insert(0, _read_aggregates(_totals_prefix(store, previous)))
+        totals = SusAggregates.combine(parts)
+        _write_aggregates(totals, _totals_prefix(store, version))
+
+        manifest.update(
+            version=version,
+            updated_at=datetime.now().isoformat(timespec="seconds"),
+            rows=totals.rows,
+            respiratory_rows=totals.respiratory_rows,
+        )
+        # Ponto de confirmação: a partir daqui leitores veem a versão nova
+        _write_json(store / MANIFEST_NAME, manifest)
+
+        for prefix in replaced_prefixes:
+            obsolete.extend(_aggregate_paths(prefix))
+        if version - KEEP_VERSIONS - 1 > 0:
+            obsolete.extend(_aggregate_paths(_totals_prefix(store, version - KEEP_VERSIONS - 1)))
+        for stale in obsolete:
+            stale.unlink(missing_ok=True)
+
+    logger.info(
+        "Armazenamento do SUS na versão %d: %d linhas novas, %d partições regravadas em %.1fs",
+        version, rows, len(touched), time.perf_counter() - started,
+    )
+    return IngestResult(version, ingested, skipped, touched, rows)
+
+
+def refresh_datasets(datasets: Iterable[LazyDataset]) -> None:
+    """
+    Descarta os dados memorizados (agregados, `load_sus`, `load_raw`) e troca
+    os datasets pela versão nova; os ainda não carregados só têm a `version`
+    incrementada.
+    """
+    clear_aggregates()
+    load_sus.cache_clear()
+    load_raw.cache_clear()
+    for dataset in datasets:
+        dataset.refresh()
+
+
+class StoreWatcher:
+    """
+    Acompanha a versão do armazenamento numa thread de fundo e, quando ela
+    muda (ingestão feita por qualquer processo), troca os datasets com
+    `refresh_datasets`. Os valores antigos continuam atendendo até a carga
+    nova terminar.
+
+    Args:
+        datasets: Datasets a trocar (ex.: `tools.DATASET`, `tools.SQL_ENGINE`)
+        interval: Intervalo entre verificações, em segundos
+        store: Diretório do armazenamento (padrão: `data/store/sus`)
+    """
+
+    def __init__(
+        self,
+        datasets: Iterable[LazyDataset],
+        interval: float = 5.0,
+        store: Optional[Path] = None,
+    ) -> None:
+        self.datasets = list(datasets)
+        self.interval = interval
+        self.store = store
+        self.version = store_version(store)
+        self.swaps = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def check(self) -> bool:
+        """Verifica a versão agora e troca os datasets se ela mudou."""
+        current = store_version(self.store)
+        if current == self.version:
+            return False
+        logger.info("Armazenamento do SUS: versão %s -> %s; trocando datasets", self.version, current)
+        started = time.perf_counter()
+        refresh_datasets(self.datasets)
+        self.version = current
+        self.swaps += 1
+        logger.info("Datasets trocados em %.2fs", time.perf_counter() - started)
+        return True
+
+    def start(self) -> "StoreWatcher":
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="store-watcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception:  # mantém os dados atuais e tenta de novo
+                logger.exception("Falha ao trocar para a nova versão do armazenamento")
+
+    def stats(self) -> Dict[str, Any]:
+        return {"store_version": self.version, "swaps": self.swaps}
+
+
+def format_status(store: Optional[Path] = None) -> str:
+    """Resumo do armazenamento para `--status`."""
+    manifest = read_manifest(store)
+    if manifest is None:
+        return "Armazenamento vazio (nenhuma ingestão ainda)."
+    partitions = sorted(manifest["partitions"])
+    lines = [
+        f"Versão {manifest['version']} (atualizado em {manifest.get('updated_at', '?')})",
+        f"{manifest.get('rows', 0)} linhas, {manifest.get('respiratory_rows', 0)} respiratórias",
+        f"{len(manifest['files'])} arquivos, {len(partitions)} partições"
+        + (f" ({partitions[0]} a {partitions[-1]})" if partitions else ""),
+    ]
+    for name, entry in sorted(manifest["files"].items()):
+        lines.append(f"  {name}: {entry['rows']} linhas, versão {entry['version']}, {entry['ingested_at']}")
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Ingestão incremental de arquivos mensais do SUS")
+    parser.add_argument("files", nargs="*", type=Path,
+                        help="CSVs mensais no formato de dados_sus3.csv")
+    parser.add_argument("--bootstrap", action="store_true",
+                        help="Ingere o CSV atual de data/raw (carga inicial do armazenamento)")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS,
+                        help="Linhas por bloco de leitura")
+    parser.add_argument("--status", action="store_true", help="Mostra a versão, os arquivos e as partições")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    files = list(args.files)
+    if args.bootstrap:
+        files.insert(0, get_raw_dir() / RAW_SOURCES["sus"][0])
+    if files:
+        result = ingest_files(files, chunk_rows=args.chunk_rows)
+        print(
+            f"Versão {result.version}: {len(result.ingested)} arquivos ingeridos, "
+            f"{len(result.skipped)} ignorados, {len(result.partitions)} partições regravadas"
+        )
+    elif not args.status:
+        parser.error("informe arquivos para ingerir, --bootstrap ou --status")
+    if args.status:
+        print(format_status())
+
+
+if __name__ == "__main__":
+    main()
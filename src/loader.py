@@ -1,14 +1,63 @@
 """
 Módulo para carregar e preparar dados do projeto.
 Contém funções para carregamento dos diversos datasets utilizados na análise.
+
+Os CSVs brutos são convertidos, no primeiro carregamento, em arquivos Feather
+(Arrow IPC) em `data/cache/`. Os carregamentos seguintes abrem esses arquivos
+via memory-map, desde que a impressão digital (tamanho, mtime e hash) do CSV
+de origem continue a mesma.
 """
+import hashlib
+import json
+import logging
 import os
 from pathlib import Path
-from typing import Tuple
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple, Union
 from functools import lru_cache
 
+import numpy as np
 import pandas as pd
 
+from shared import LAYOUT_VERSION as SHARED_LAYOUT_VERSION, attach_frame, publish_frame
+
+try:
+    import pyarrow
+    import pyarrow.feather as feather
+    _HAS_ARROW = True
+except ImportError:  # pragma: no cover - depende do ambiente
+    _HAS_ARROW = False
+
+logger = logging.getLogger(__name__)
+
+# Versão do formato do cache; incremente para invalidar caches antigos
+CACHE_FORMAT_VERSION = 1
+
+# Variável de ambiente que substitui o diretório `data/` (raw + cache)
+DATA_DIR_ENV = "CHATBOT_PYSUS_DATA_DIR"
+
+# Variável de ambiente: "0" desliga o compartilhamento via memory-map do SUS
+SHARED_ENV = "CHATBOT_PYSUS_SHARED"
+
+# Nome lógico -> (arquivo CSV, parâmetros de leitura)
+RAW_SOURCES: Dict[str, Tuple[str, Dict[str, Any]]] = {
+    "sus": (
+        "dados_sus3.csv",
+        {"parse_dates": ["DT_INTER", "DT_SAIDA"], "low_memory": False},
+    ),
+    "idh": (
+        "IDH_municipios_RS.csv",
+        {"sep": ",", "decimal": ","},
+    ),
+    "pol": (
+        "poluicao_do_ar_2014_2023.csv",
+        {},
+    ),
+    "ibge": (
+        "dados_IBGE_modificados.csv",
+        {"encoding": "latin1", "sep": ";"},
+    ),
+}
+
 
 def get_project_root() -> Path:
     """
@@ -20,6 +69,407 @@ def get_project_root() -> Path:
     # Considera que este arquivo está em src/
     return Path(__file__).parent.parent
 
+
+def get_data_dir() -> Path:
+    """
+    Retorna o diretório de dados (`data/`), ou o indicado na variável de
+    ambiente `DATA_DIR_ENV` (usada pelos benchmarks com dados sintéticos).
+    """
+    override = os.environ.get(DATA_DIR_ENV)
+    return Path(override) if override else get_project_root() / "data"
+
+
+def get_raw_dir() -> Path:
+    """
+    Retorna o diretório dos CSVs brutos (`data/raw`).
+    """
+    return get_data_dir() / "raw"
+
+
+def get_cache_dir() -> Path:
+    """
+    Retorna o diretório do cache colunar (`data/cache`).
+    """
+    return get_data_dir() / "cache"
+
+
+def get_store_dir() -> Path:
+    """
+    Retorna o diretório do armazenamento particionado (`data/store`),
+    alimentado pela ingestão incremental (`ingest.py`).
+    """
+    return get_data_dir() / "store"
+
+
+def _file_sha256(path: Path, chunk_size: int = 1 << 20) -> str:
+    """
+    Calcula o SHA-256 do arquivo lendo em blocos.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _read_options_key(read_kwargs: Dict[str, Any]) -> str:
+    """
+    Serializa os parâmetros de leitura, para que mudá-los invalide o cache.
+    """
+    return json.dumps(read_kwargs, sort_keys=True, default=str)
+
+
+def source_fingerprint(path: Path, read_kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Calcula a impressão digital de um CSV de origem.
+
+    Args:
+        path: Caminho do CSV
+        read_kwargs: Parâmetros usados em `pd.read_csv`
+
+    Returns:
+        Dict com tamanho, mtime, SHA-256 e parâmetros de leitura
+    """
+    stat = path.stat()
+    return {
+        "format_version": CACHE_FORMAT_VERSION,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": _file_sha256(path),
+        "read_options": _read_options_key(read_kwargs),
+    }
+
+
+def _cache_paths(name: str) -> Tuple[Path, Path]:
+    cache_dir = get_cache_dir()
+    return cache_dir / f"{name}.feather", cache_dir / f"{name}.meta.json"
+
+
+def _is_cache_valid(
+    name: str,
+    path: Path,
+    read_kwargs: Dict[str, Any],
+    data_path: Optional[Path] = None,
+) -> bool:
+    """
+    Verifica se o cache de `name` corresponde ao CSV atual.
+
+    Tamanho e mtime iguais bastam; se apenas o mtime mudou (ex.: `touch` ou
+    cópia), o hash do conteúdo decide. `data_path` substitui o arquivo
+    Feather padrão (ex.: diretório de `shared.publish_frame`).
+    """
+    default_data_path, meta_path = _cache_paths(name)
+    data_path = data_path or default_data_path
+    if not data_path.exists() or not meta_path.exists():
+        return False
+    try:
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError):
+        return False
+
+    stat = path.stat()
+    if (
+        meta.get("format_version") != CACHE_FORMAT_VERSION
+        or meta.get("read_options") != _read_options_key(read_kwargs)
+        or meta.get("size") != stat.st_size
+    ):
+        return False
+    if meta.get("mtime_ns") == stat.st_mtime_ns:
+        return True
+    if meta.get("sha256") != _file_sha256(path):
+        return False
+
+    # Conteúdo idêntico: atualiza o mtime para evitar rehash na próxima vez
+    meta["mtime_ns"] = stat.st_mtime_ns
+    meta_path.write_text(json.dumps(meta, indent=2), encoding="utf-8")
+    return True
+
+
+def _write_cache(name: str, df: pd.DataFrame, fingerprint: Dict[str, Any]) -> None:
+    """
+    Grava o DataFrame em Feather não comprimido (permite memory-map) e o
+    arquivo de metadados. A gravação é atômica via arquivo temporário.
+    """
+    data_path, meta_path = _cache_paths(name)
+    data_path.parent.mkdir(parents=True, exist_ok=True)
+
+    tmp_path = data_path.with_suffix(".feather.tmp")
+    try:
+        feather.write_feather(
+            df.reset_index(drop=True), tmp_path, compression="uncompressed"
+        )
+    except (TypeError, ValueError, pyarrow.ArrowException) as exc:
+        logger.warning("Não foi possível gravar cache de '%s': %s", name, exc)
+        tmp_path.unlink(missing_ok=True)
+        return
+    os.replace(tmp_path, data_path)
+    meta_path.write_text(json.dumps(fingerprint, indent=2), encoding="utf-8")
+
+
+def _read_cache(name: str) -> pd.DataFrame:
+    data_path, _ = _cache_paths(name)
+    logger.debug("Lendo '%s' do cache %s", name, data_path)
+    return feather.read_table(data_path, memory_map=True).to_pandas()
+
+
+def load_table(name: str, use_cache: bool = True, rebuild: bool = False) -> pd.DataFrame:
+    """
+    Carrega um dataset bruto pelo nome lógico, usando o cache colunar.
+
+    Args:
+        name: Um dos nomes em `RAW_SOURCES` ("sus", "idh", "pol", "ibge")
+        use_cache: Se False, sempre lê o CSV e não grava cache
+        rebuild: Se True, ignora o cache existente e o regrava
+
+    Returns:
+        pd.DataFrame: Dados do dataset
+
+    Raises:
+        KeyError: Se o nome não for conhecido
+        FileNotFoundError: Se o CSV de origem não for encontrado
+    """
+    filename, read_kwargs = RAW_SOURCES[name]
+    path = get_raw_dir() / filename
+    if not path.exists():
+        raise FileNotFoundError(path)
+
+    use_cache = use_cache and _HAS_ARROW
+    if use_cache and not rebuild and _is_cache_valid(name, path, read_kwargs):
+        return _read_cache(name)
+
+    df = pd.read_csv(path, **read_kwargs)
+    if use_cache:
+        _write_cache(name, df, source_fingerprint(path, read_kwargs))
+    return df
+
+
+def load_derived(
+    name: str,
+    source: str,
+    build: Callable[[], pd.DataFrame],
+    version: Union[int, str] = 1,
+    use_cache: bool = True,
+) -> pd.DataFrame:
+    """
+    Carrega uma tabela derivada de um dataset bruto (ex.: agregados),
+    persistida em `data/cache/<name>.feather`.
+
+    O cache é invalidado quando o CSV de origem muda ou quando `version`
+    é incrementada (mudança na lógica de `build`).
+
+    Args:
+        name: Nome do arquivo de cache derivado
+        source: Nome do dataset de origem em `RAW_SOURCES`
+        build: Função que calcula a tabela derivada
+        version: Versão da lógica de construção (pode incluir a de outra
+            origem dos dados, ex.: o armazenamento de `ingest.py`)
+        use_cache: Se False, apenas chama `build`
+
+    Returns:
+        pd.DataFrame: Tabela derivada
+    """
+    filename, read_kwargs = RAW_SOURCES[source]
+    path = get_raw_dir() / filename
+    derived_key = {**read_kwargs, "_derived": name, "_version": version}
+
+    use_cache = use_cache and _HAS_ARROW and path.exists()
+    if use_cache and _is_cache_valid(name, path, derived_key):
+        return _read_cache(name)
+
+    df = build()
+    if use_cache:
+        _write_cache(name, df, source_fingerprint(path, derived_key))
+    return df
+
+
+def shared_enabled() -> bool:
+    """
+    Indica se tabelas grandes são compartilhadas entre processos via
+    memory-map (`load_shared`); `SHARED_ENV=0` volta às cópias por processo.
+    """
+    return os.environ.get(SHARED_ENV, "1").strip().lower() not in ("0", "false", "no", "off")
+
+
+def load_shared(
+    name: str,
+    source: str,
+    build: Callable[[], pd.DataFrame],
+    version: Union[int, str] = 1,
+    use_cache: bool = True,
+) -> pd.DataFrame:
+    """
+    Como `load_derived`, mas persiste a tabela como colunas `.npy` em
+    `data/cache/<name>/` e a abre via memory-map (`shared.attach_frame`):
+    os processos que carregam a mesma tabela compartilham as páginas dos
+    arquivos, em vez de cada um manter a própria cópia. O DataFrame
+    devolvido é somente leitura.
+
+    Args:
+        name: Nome do diretório de cache
+        source: Nome do dataset de origem em `RAW_SOURCES`
+        build: Função que calcula a tabela
+        version: Versão da lógica de construção (como em `load_derived`)
+        use_cache: Se False, apenas chama `build`
+
+    Returns:
+        pd.DataFrame: Tabela (mapeada dos arquivos, se o cache estiver ativo)
+    """
+    filename, read_kwargs = RAW_SOURCES[source]
+    path = get_raw_dir() / filename
+    derived_key = {
+        **read_kwargs, "_derived": name, "_version": version, "_layout": SHARED_LAYOUT_VERSION,
+    }
+    directory = get_cache_dir() / name
+
+    use_cache = use_cache and path.exists()
+    if use_cache and _is_cache_valid(name, path, derived_key, data_path=directory):
+        try:
+            return attach_frame(directory)
+        except (OSError, ValueError, json.JSONDecodeError) as exc:
+            logger.warning("Cache compartilhado de '%s' ilegível (%s); reconstruindo", name, exc)
+
+    df = build()
+    if not use_cache:
+        return df
+    try:
+        publish_frame(df, directory)
+    except (OSError, TypeError) as exc:
+        logger.warning("Não foi possível publicar '%s' para compartilhamento: %s", name, exc)
+        return df
+    _cache_paths(name)[1].write_text(
+        json.dumps(source_fingerprint(path, derived_key), indent=2), encoding="utf-8"
+    )
+    return attach_frame(directory)
+
+
+# Versão da lógica de `prepare_sus`; incremente para invalidar o cache preparado
+PREPARE_VERSION = 1
+
+# Colunas obrigatórias do SUS usadas pelas ferramentas
+SUS_REQUIRED_COLUMNS = ["DIAG_PRINC", "IDADE", "CIDADE_RESIDENCIA_PACIENTE", "MORTE", "VAL_TOT", "ano"]
+
+# Colunas de texto convertidas sempre para `category`
+SUS_CATEGORICAL_COLUMNS = ["DIAG_PRINC", "CIDADE_RESIDENCIA_PACIENTE"]
+
+# Máscara pré-calculada de diagnósticos respiratórios (CID-10 J00–J99)
+RESPIRATORY_COLUMN = "RESPIRATORIO"
+
+
+class PrepareReport(NamedTuple):
+    """Uso de memória antes e depois de `prepare_sus`."""
+    bytes_before: int
+    bytes_after: int
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.bytes_before - self.bytes_after
+
+    def __str__(self) -> str:
+        ratio = self.bytes_after / self.bytes_before if self.bytes_before else 1.0
+        return (
+            f"{self.bytes_before / 2**20:.1f} MiB → {self.bytes_after / 2**20:.1f} MiB "
+            f"({self.bytes_saved / 2**20:.1f} MiB economizados, {ratio:.0%} do original)"
+        )
+
+
+def _smallest_unsigned(values: pd.Series) -> str:
+    """Menor dtype inteiro sem sinal (nullable) que comporta `values`."""
+    maximum = values.max()
+    for dtype, limit in (("UInt8", 2**8), ("UInt16", 2**16), ("UInt32", 2**32)):
+        if pd.isna(maximum) or maximum < limit:
+            return dtype
+    return "UInt64"
+
+
+def prepare_sus(df: pd.DataFrame) -> Tuple[pd.DataFrame, PrepareReport]:
+    """
+    Normaliza, valida e compacta o DataFrame do SUS uma única vez.
+
+    - `DIAG_PRINC` em maiúsculas e cidades sem espaços nas pontas;
+    - textos de alta repetição (CID, cidade) viram `category`;
+    - `IDADE` numérica sem sinal (uint8 na prática; negativos viram nulo),
+      `MORTE` booleana (ou int8), `VAL_TOT` float32, demais inteiros
+      reduzidos ao menor tipo;
+    - coluna booleana `RESPIRATORIO` com o filtro CID J.
+
+    Args:
+        df: DataFrame bruto do SUS
+
+    Returns:
+        Tuple (DataFrame preparado, relatório de memória)
+
+    Raises:
+        ValueError: Se faltar alguma coluna de `SUS_REQUIRED_COLUMNS`
+    """
+    missing = [col for col in SUS_REQUIRED_COLUMNS if col not in df.columns]
+    if missing:
+        raise ValueError(f"Colunas obrigatórias ausentes no SUS: {missing}")
+
+    before = int(df.memory_usage(deep=True).sum())
+    out = df.copy()
+
+    diag = out["DIAG_PRINC"].astype("string").str.strip().str.upper()
+    out["DIAG_PRINC"] = diag.astype("category")
+    out["CIDADE_RESIDENCIA_PACIENTE"] = (
+        out["CIDADE_RESIDENCIA_PACIENTE"].astype("string").str.strip().astype("category")
+    )
+    out[RESPIRATORY_COLUMN] = diag.str.startswith("J").fillna(False).astype(bool)
+
+    ages = pd.to_numeric(out["IDADE"], errors="coerce")
+    ages = ages.where(ages >= 0).round()
+    out["IDADE"] = ages.astype(_smallest_unsigned(ages))
+
+    morte = pd.to_numeric(out["MORTE"], errors="coerce")
+    if morte.notna().all() and morte.isin([0, 1]).all():
+        out["MORTE"] = morte.astype(bool)
+    elif morte.notna().all() and morte.between(-128, 127).all():
+        out["MORTE"] = morte.astype(np.int8)
+    else:
+        out["MORTE"] = morte.astype("Int8")
+
+    out["VAL_TOT"] = pd.to_numeric(out["VAL_TOT"], errors="coerce").astype(np.float32)
+
+    # Demais colunas (inclui `ano`): reduz inteiros/floats e categoriza textos repetitivos
+    handled = set(SUS_REQUIRED_COLUMNS) - {"ano"} | {RESPIRATORY_COLUMN}
+    for col in [c for c in out.columns if c not in handled]:
+        series = out[col]
+        if pd.api.types.is_integer_dtype(series) and not pd.api.types.is_extension_array_dtype(series):
+            out[col] = pd.to_numeric(series, downcast="integer")
+        elif pd.api.types.is_float_dtype(series):
+            out[col] = pd.to_numeric(series, downcast="float")
+        elif (
+            pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series)
+        ) and series.nunique(dropna=True) <= len(series) // 2:
+            out[col] = series.astype("category")
+
+    report = PrepareReport(before, int(out.memory_usage(deep=True).sum()))
+    logger.info("SUS preparado: %s", report)
+    return out, report
+
+
+def rebuild_cache() -> Dict[str, Optional[Path]]:
+    """
+    Reconstrói o cache colunar de todos os datasets cujo CSV existe.
+
+    Returns:
+        Dict nome -> caminho do cache gerado (None se o CSV não existir)
+    """
+    if not _HAS_ARROW:
+        raise RuntimeError("pyarrow não está instalado; o cache colunar está indisponível.")
+    built: Dict[str, Optional[Path]] = {}
+    for name in RAW_SOURCES:
+        try:
+            load_table(name, rebuild=True)
+        except FileNotFoundError as exc:
+            logger.warning("CSV não encontrado para '%s': %s", name, exc)
+            built[name] = None
+            continue
+        built[name] = _cache_paths(name)[0]
+    load_raw.cache_clear()
+    load_sus.cache_clear()
+    return built
+
+
 @lru_cache(maxsize=2)
 def load_raw() -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame]:
     """
@@ -35,42 +485,36 @@ def load_raw() -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame]:
     Raises:
         FileNotFoundError: Se algum arquivo não for encontrado
     """
-    # Obtém o caminho raiz do projeto
-    root_path = get_project_root()
-    data_dir = root_path / "data" / "raw"
+    sus = load_table("sus")
+    idh = load_table("idh")
+    pol = load_table("pol")
+    ibge = load_table("ibge")
+    return sus, idh, pol, ibge
 
-    # Carrega cada dataset com suas configurações específicas
-    sus = pd.read_csv(
-        data_dir / "dados_sus3.csv",
-        parse_dates=["DT_INTER", "DT_SAIDA"],
-        low_memory=False
-    )
-
-    idh = pd.read_csv(
-        data_dir / "IDH_municipios_RS.csv",
-        encoding="latin1",
-        sep=";"
-    )
-
-    pol = pd.read_csv(
-        data_dir / "poluicao_do_ar_2014_2023.csv"
-    )
-
-    ibge = pd.read_csv(
-        data_dir / "dados_IBGE_modificados.csv",
-        encoding="latin1",
-        sep=";"
-    )
-
-    return sus
 
 @lru_cache(maxsize=2)
 def load_sus() -> pd.DataFrame:
-    return load_raw()
-
-
-
+    """
+    Carrega apenas o dataset do SUS, já preparado por `prepare_sus`
+    (tipos compactos e coluna `RESPIRATORIO`), sem ler os demais CSVs.
 
+    Por padrão as colunas preparadas são compartilhadas entre processos via
+    memory-map (`load_shared`, somente leitura); com `SHARED_ENV=0`, cada
+    processo carrega sua cópia do cache Feather.
+    """
+    if shared_enabled():
+        return load_shared(
+            "sus_shared",
+            source="sus",
+            build=lambda: prepare_sus(load_table("sus"))[0],
+            version=PREPARE_VERSION,
+        )
+    return load_derived(
+        "sus_prepared",
+        source="sus",
+        build=lambda: prepare_sus(load_table("sus"))[0],
+        version=PREPARE_VERSION,
+    )
 
 
 
@@ -1,17 +1,61 @@
+import time
+_START = time.perf_counter()
+
 import argparse
-from agent import build_agent, get_response
+import sys
+
+from timing import PhaseTimer
+
+def _print_token(token):
+    print(token, end="", flush=True)
+
+
+def _stream_stats(historico):
+    """Métricas de streaming (TTFT, tokens/s) da última mensagem, se houver."""
+    metadata = getattr(historico[-1], "response_metadata", None) or {}
+    return metadata.get("stream_stats")
 
-def interactive_loop(agent):
-    print("Modo interativo (digite 'exit' ou 'quit' para sair)\n")
+
+def interactive_loop(agent, stream=True, show_stats=False, memory_tokens=1200):
+    from agent import get_response
+    from memory import ConversationMemory
+
+    # Memória da conversa (perguntas de seguimento); 0 desativa
+    memory = ConversationMemory(max_tokens=memory_tokens) if memory_tokens > 0 else None
+
+    print("Modo interativo (digite 'exit' ou 'quit' para sair, '/reset' para esquecer a conversa)\n")
     while True:
         try:
             prompt = input("Você: ").strip()
             if prompt.lower() in ("exit", "quit"):
                 print("Até mais!")
                 break
+            if prompt.lower() == "/reset":
+                if memory is not None:
+                    memory.clear()
+                print("Conversa reiniciada.\n")
+                continue
 
-            resposta, _ = get_response(agent, prompt, use_function_calling=True)
-            print(f"Assistente: {resposta}\n")
+            if stream:
+                print("Assistente: ", end="", flush=True)
+                _, historico = get_response(
+                    agent, prompt, use_function_calling=True, on_token=_print_token,
+                    memory=memory,
+                )
+                print("\n")
+            else:
+                resposta, historico = get_response(
+                    agent, prompt, use_function_calling=True, memory=memory
+                )
+                print(f"Assistente: {resposta}\n")
+            if show_stats and _stream_stats(historico):
+                print(f"[stream] {_stream_stats(historico)}\n")
+            if show_stats and memory is not None:
+                turn = memory.prompt_tokens[-1]
+                print(
+                    f"[memória] prompt ~{turn['estimated']} tokens "
+                    f"(modelo: {turn['reported']}), {len(memory.turns)} turnos no buffer\n"
+                )
         except KeyboardInterrupt:
             print("\nAté mais!")
             break
@@ -35,24 +79,241 @@ def main():
         action="store_true",
         help="Entra em modo interativo de terminal (REPL)"
     )
-    args = parser.parse_args()
+    parser.add_argument(
+        "--batch",
+        type=str,
+        metavar="PERGUNTAS.jsonl",
+        help="Responde todas as perguntas do JSONL (uma por linha) e grava os resultados em JSONL"
+    )
+    parser.add_argument(
+        "--output", "-o",
+        type=str,
+        help="Arquivo de resultados do --batch (padrão: <entrada>.results.jsonl); retoma se já existir"
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=4,
+        help="Perguntas simultâneas no modo --batch (padrão: 4)"
+    )
+    parser.add_argument(
+        "--rebuild-cache",
+        action="store_true",
+        help="Reconstrói o cache colunar (data/cache) a partir dos CSVs brutos e sai"
+    )
+    parser.add_argument(
+        "--no-answer-cache",
+        action="store_true",
+        help="Desativa o cache semântico de respostas (sempre consulta o LLM)"
+    )
+    parser.add_argument(
+        "--no-router",
+        action="store_true",
+        help="Desativa o roteador de intenções (o LLM sempre escolhe a ferramenta)"
+    )
+    parser.add_argument(
+        "--no-templates",
+        action="store_true",
+        help="Desativa as respostas por template (o LLM sempre redige a resposta final)"
+    )
+    parser.add_argument(
+        "--llm-timeout",
+        type=float,
+        default=None,
+        help="Timeout de cada chamada ao LLM, em segundos (padrão: 30)"
+    )
+    parser.add_argument(
+        "--request-timeout",
+        type=float,
+        default=None,
+        help="Prazo total de cada resposta, em segundos (padrão: 60)"
+    )
+    parser.add_argument(
+        "--no-tool-pruning",
+        action="store_true",
+        help="Vincula sempre todas as ferramentas ao LLM (sem poda por pergunta)"
+    )
+    parser.add_argument(
+        "--selection-model",
+        type=str,
+        default=None,
+        metavar="MODELO",
+        help="Modelo pequeno para escolher a ferramenta (ex.: llama3.2:1b); "
+             "o modelo principal redige a resposta e refaz seleções inválidas"
+    )
+    parser.add_argument(
+        "--keep-alive",
+        type=str,
+        default=None,
+        metavar="DURAÇÃO",
+        help="Quanto tempo o Ollama mantém o modelo carregado após cada pergunta "
+             "(ex.: 30m, 3600, -1 = sempre; padrão: 30m)"
+    )
+    parser.add_argument(
+        "--no-warmup",
+        action="store_true",
+        help="Não aquece o modelo ao iniciar os modos --interactive e --batch"
+    )
+    parser.add_argument(
+        "--memory-tokens",
+        type=int,
+        default=1200,
+        help="Orçamento de tokens do histórico no modo interativo (0 desativa a memória)"
+    )
+    parser.add_argument(
+        "--no-stream",
+        action="store_true",
+        help="Exibe a resposta só quando completa, em vez de token a token"
+    )
+    parser.add_argument(
+        "--timings",
+        action="store_true",
+        help="Exibe no stderr o tempo de cada fase da inicialização"
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="profile.prof",
+        metavar="ARQUIVO.prof",
+        help="Perfila (cProfile) a resposta do --prompt e grava o perfil (padrão: profile.prof); "
+             "abra com snakeviz, flameprof ou gprof2dot"
+    )
+    parser.add_argument(
+        "--log-json",
+        action="store_true",
+        help="Logs em JSON, uma linha por registro (inclui o trace de cada resposta)"
+    )
+    parser.add_argument(
+        "--metrics",
+        action="store_true",
+        help="Ao final, imprime no stderr as métricas no formato do Prometheus"
+    )
+    timer = PhaseTimer(start=_START)
+    with timer.phase("argparse"):
+        args = parser.parse_args()
+
+    if args.rebuild_cache:
+        from loader import rebuild_cache
+        for name, path in rebuild_cache().items():
+            print(f"{name}: {path if path else 'CSV não encontrado'}")
+        return
+
+    # Importa o agente só depois do argparse: `--help` não paga esse custo
+    with timer.phase("import_agent"):
+        from agent import build_agent, get_response
+        from tools import DATASET
+
+    if args.no_answer_cache:
+        from agent import ANSWER_CACHE
+        ANSWER_CACHE.enabled = False
+    if args.no_router:
+        from agent import ROUTER
+        ROUTER.enabled = False
+    if args.no_templates:
+        from agent import TEMPLATES
+        TEMPLATES.enabled = False
+    if args.llm_timeout is not None:
+        from agent import LLM_GUARD
+        LLM_GUARD.call_timeout = args.llm_timeout
+    if args.request_timeout is not None:
+        from agent import LLM_GUARD
+        LLM_GUARD.request_timeout = args.request_timeout
+    if args.log_json:
+        from tracing import configure_json_logging
+        configure_json_logging()
 
     # Instancia o agente com as ferramentas registradas
-    agent = build_agent()
+    with timer.phase("build_agent"):
+        from model_tiers import ModelConfig, parse_keep_alive
+        model = ModelConfig()
+        if args.keep_alive is not None:
+            model = model._replace(keep_alive=parse_keep_alive(args.keep_alive))
+        selection_model = model._replace(name=args.selection_model) if args.selection_model else None
+        agent = build_agent(model, prune_tools=not args.no_tool_pruning, selection_model=selection_model)
+
+    # Sessões longas: carrega o modelo no Ollama (e os dados, em paralelo)
+    # antes da primeira pergunta, e mostra a latência fria vs. em regime
+    if (args.interactive or args.batch) and not args.no_warmup:
+        from agent import SYSTEM_PROMPT
+        from warmup import format_warmup, warm_up
+
+        DATASET.warm_async()
+        with timer.phase("warmup"):
+            warmup = warm_up(agent, SYSTEM_PROMPT)
+        print(format_warmup(warmup), file=sys.stderr)
+
+    # Modo batch: um agente e um dataset para todas as perguntas
+    if args.batch:
+        import asyncio
+        from pathlib import Path
+        from agent import configure_tool_executor
+        from batch import format_stats, run_batch
+
+        configure_tool_executor(args.concurrency)
+        with timer.phase("dataset_load"):
+            DATASET.get()
+        input_path = Path(args.batch)
+        output_path = Path(args.output) if args.output else input_path.with_suffix(".results.jsonl")
+        stats = asyncio.run(run_batch(
+            agent, input_path, output_path,
+            concurrency=args.concurrency,
+            use_function_calling=True,
+        ))
+        print(format_stats(stats))
+        print(f"Resultados em {output_path}")
+        if args.timings:
+            timer.report()
+        return
 
     # Se modo interativo foi pedido, entra no loop
     if args.interactive:
-        interactive_loop(agent)
+        if args.timings:
+            timer.report()
+        interactive_loop(
+            agent, stream=not args.no_stream, show_stats=args.timings,
+            memory_tokens=args.memory_tokens,
+        )
         return
 
     # Modo “one-shot” tradicional
     if not args.prompt:
         parser.error("Você precisa passar --prompt ou usar --interactive para modo interativo.")
-    resposta, historico = get_response(agent, args.prompt, use_function_calling=args.function_calling)
-
-    # Exibe resposta final e histórico (opcional)
     print("\n=== Resposta do Assistente ===")
-    print(resposta)
+    profiler = None
+    if args.profile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    with timer.phase("first_response"):
+        if args.no_stream:
+            resposta, historico = get_response(agent, args.prompt, use_function_calling=args.function_calling)
+            print(resposta)
+        else:
+            resposta, historico = get_response(
+                agent, args.prompt, use_function_calling=args.function_calling,
+                on_token=_print_token,
+            )
+            print()
+    if profiler is not None:
+        import pstats
+        profiler.disable()
+        profiler.dump_stats(args.profile)
+        pstats.Stats(profiler, stream=sys.stderr).sort_stats("cumulative").print_stats(20)
+        print(f"[profile] perfil gravado em {args.profile}", file=sys.stderr)
+    if DATASET.load_seconds is not None:
+        timer.record("dataset_load", DATASET.load_seconds)
+    stats = _stream_stats(historico)
+    if stats and stats.get("ttft_s") is not None:
+        timer.record("time_to_first_token", stats["ttft_s"])
+    if args.timings:
+        timer.report()
+        if stats:
+            print(f"[stream] {stats}", file=sys.stderr)
+    if args.metrics:
+        from tracing import METRICS
+        print(METRICS.render(), file=sys.stderr)
+
+    # Exibe histórico (opcional)
     # Se quiser, descomente para ver histórico completo:
     # for msg in historico: print(msg)
 
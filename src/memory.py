@@ -0,0 +1,214 @@
+"""
+Memória de conversa com orçamento de tokens para sessões interativas.
+
+Os turnos recentes são mantidos quase literais (pergunta, chamada de
+ferramenta, resultado e resposta); resultados de ferramenta volumosos são
+encurtados. Quando o histórico passa do orçamento, os turnos mais antigos
+saem do buffer e viram uma linha de um resumo acumulado, que vai no prompt
+de sistema. Assim o tamanho do prompt por turno fica aproximadamente
+constante, mas perguntas de seguimento ("e para Canoas?") têm contexto.
+"""
+import json
+import logging
+import math
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+
+logger = logging.getLogger(__name__)
+
+# Caracteres por token usados na estimativa (tokenizadores BPE em português)
+CHARS_PER_TOKEN = 4
+
+# Resume os turnos removidos do buffer: (resumo atual, mensagens) -> novo resumo
+Summarizer = Callable[[str, List[BaseMessage]], str]
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimativa de tokens de `text` (sem tokenizador)."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN) if text else 0
+
+
+def message_tokens(message: BaseMessage) -> int:
+    """Estimativa de tokens de uma mensagem, incluindo chamadas de ferramenta."""
+    tokens = estimate_tokens(str(message.content)) + 4  # papel e separadores
+    for call in getattr(message, "tool_calls", None) or []:
+        tokens += estimate_tokens(call["name"] + json.dumps(call.get("args", {}), ensure_ascii=False))
+    return tokens
+
+
+def count_tokens(messages: List[BaseMessage]) -> int:
+    """Estimativa de tokens de uma lista de mensagens."""
+    return sum(message_tokens(m) for m in messages)
+
+
+def _shorten(text: str, limit: int) -> str:
+    return text if len(text) <= limit else text[:limit].rstrip() + " …"
+
+
+def extractive_summary(summary: str, messages: List[BaseMessage], line_chars: int = 240) -> str:
+    """
+    Resumidor padrão, sem LLM: uma linha por turno com a pergunta, as
+    ferramentas chamadas e o início da resposta.
+    """
+    question = next((str(m.content) for m in messages if isinstance(m, HumanMessage)), "")
+    calls = [
+        f"{c['name']}({json.dumps(c.get('args', {}), ensure_ascii=False)})"
+        for m in messages for c in (getattr(m, "tool_calls", None) or [])
+    ]
+    answer = next(
+        (str(m.content) for m in reversed(messages) if isinstance(m, AIMessage) and m.content),
+        "",
+    )
+    line = f"- Pergunta: {question}"
+    if calls:
+        line += f" | ferramentas: {', '.join(calls)}"
+    if answer:
+        line += f" | resposta: {answer}"
+    line = _shorten(" ".join(line.split()), line_chars)
+    return f"{summary}\n{line}".strip()
+
+
+def llm_summarizer(model: Any) -> Summarizer:
+    """
+    Resumidor que pede ao `model` (sem ferramentas) para atualizar o resumo.
+    Custa uma chamada ao LLM por turno removido do buffer; em caso de falha,
+    usa `extractive_summary`.
+    """
+    def summarize(summary: str, messages: List[BaseMessage]) -> str:
+        transcript = "\n".join(
+            f"{type(m).__name__}: {_shorten(str(m.content), 500)}"
+            for m in messages if m.content
+        )
+        prompt = [
+            SystemMessage(
+                "Atualize o resumo da conversa em no máximo 5 linhas, em português, "
+                "mantendo municípios, anos, ferramentas e números citados."
+            ),
+            HumanMessage(f"Resumo atual:\n{summary or '(vazio)'}\n\nNovo trecho:\n{transcript}"),
+        ]
+        try:
+            return str(model.invoke(prompt).content).strip()
+        except Exception:
+            logger.exception("Falha ao resumir com o LLM; usando resumo extrativo")
+            return extractive_summary(summary, messages)
+
+    return summarize
+
+
+class ConversationMemory:
+    """
+    Buffer de turnos com orçamento de tokens e resumo acumulado.
+
+    Args:
+        max_tokens: Orçamento (estimado) do histórico enviado por turno,
+            somando resumo e turnos recentes
+        min_turns: Turnos recentes mantidos mesmo acima do orçamento
+        tool_payload_chars: Tamanho máximo do conteúdo de uma ToolMessage
+            guardada no buffer
+        max_summary_tokens: Tamanho máximo do resumo; linhas mais antigas
+            são descartadas
+        summarizer: Função que incorpora um turno removido ao resumo
+            (padrão: `extractive_summary`)
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = 1200,
+        min_turns: int = 1,
+        tool_payload_chars: int = 600,
+        max_summary_tokens: int = 300,
+        summarizer: Optional[Summarizer] = None,
+    ) -> None:
+        self.max_tokens = max_tokens
+        self.min_turns = min_turns
+        self.tool_payload_chars = tool_payload_chars
+        self.max_summary_tokens = max_summary_tokens
+        self.summarizer = summarizer or extractive_summary
+        self.summary = ""
+        self.turns: List[List[BaseMessage]] = []
+        self.prompt_tokens: List[Dict[str, Optional[int]]] = []
+        self._lock = threading.Lock()
+
+    @property
+    def has_history(self) -> bool:
+        return bool(self.turns or self.summary)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.summary = ""
+            self.turns.clear()
+            self.prompt_tokens.clear()
+
+    def _compact_message(self, message: BaseMessage) -> BaseMessage:
+        if isinstance(message, ToolMessage) and len(str(message.content)) > self.tool_payload_chars:
+            content = _shorten(str(message.content), self.tool_payload_chars)
+            return message.model_copy(update={"content": content})
+        if isinstance(message, AIMessage) and message.response_metadata:
+            # Metadados (stream_stats, uso) não vão para o próximo prompt
+            return message.model_copy(update={"response_metadata": {}, "usage_metadata": None})
+        return message
+
+    def messages_for(self, system_prompt: str, prompt: str) -> List[BaseMessage]:
+        """
+        Mensagens do próximo turno: sistema (+ resumo), turnos recentes e a
+        pergunta nova.
+        """
+        with self._lock:
+            system = system_prompt
+            if self.summary:
+                system += f"\n\nResumo da conversa até aqui:\n{self.summary}\n"
+            history = [m for turn in self.turns for m in turn]
+        return [SystemMessage(system), *history, HumanMessage(prompt)]
+
+    def _history_tokens(self) -> int:
+        return estimate_tokens(self.summary) + sum(count_tokens(t) for t in self.turns)
+
+    def _trim_summary(self) -> None:
+        lines = self.summary.splitlines()
+        while len(lines) > 1 and estimate_tokens("\n".join(lines)) > self.max_summary_tokens:
+            lines.pop(0)
+        self.summary = "\n".join(lines)
+
+    def add_turn(self, messages: List[BaseMessage], prompt_tokens: Optional[int] = None) -> None:
+        """
+        Guarda um turno concluído (da HumanMessage à resposta final) e
+        resume os turnos antigos que passarem do orçamento.
+
+        Args:
+            messages: Mensagens do turno, sem a mensagem de sistema
+            prompt_tokens: Tokens de prompt estimados deste turno (para `stats`)
+        """
+        reported = [
+            (getattr(m, "usage_metadata", None) or {}).get("input_tokens")
+            for m in messages if isinstance(m, AIMessage)
+        ]
+        reported = [r for r in reported if r is not None]
+        with self._lock:
+            self.prompt_tokens.append({
+                "estimated": prompt_tokens,
+                "reported": max(reported) if reported else None,
+            })
+            self.turns.append([self._compact_message(m) for m in messages])
+            while len(self.turns) > self.min_turns and self._history_tokens() > self.max_tokens:
+                evicted = self.turns.pop(0)
+                self.summary = self.summarizer(self.summary, evicted)
+                self._trim_summary()
+            logger.debug(
+                "Memória: %d turnos no buffer, ~%d tokens de histórico",
+                len(self.turns), self._history_tokens(),
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        """Tokens de prompt por turno (estimados e, se houver, informados pelo modelo)."""
+        with self._lock:
+            estimated = [t["estimated"] for t in self.prompt_tokens if t["estimated"] is not None]
+            return {
+                "turns": len(self.prompt_tokens),
+                "buffered_turns": len(self.turns),
+                "summary_tokens": estimate_tokens(self.summary),
+                "history_tokens": self._history_tokens(),
+                "prompt_tokens": list(self.prompt_tokens),
+                "max_prompt_tokens": max(estimated) if estimated else None,
+            }
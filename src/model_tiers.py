@@ -0,0 +1,197 @@
+"""
+Um modelo por fase do agente: um modelo pequeno e rápido escolhe a
+ferramenta (classificação estreita, em modo JSON) e o modelo maior redige a
+resposta final.
+
+`TieredAgent` guarda os dois agentes (vinculados às ferramentas, ou
+`PrunedToolAgent`). Se o modelo de seleção não devolver uma chamada de
+ferramenta válida (`tool_call_problem`: nenhuma chamada, JSON inválido,
+ferramenta desconhecida ou argumentos fora do schema), o agente escala: a
+seleção é refeita pelo modelo maior.
+
+`PHASE_STATS` acumula, por fase e modelo, as chamadas, a latência e, na
+seleção, a fração aceita sem escalar (a precisão prática do modelo pequeno),
+para calibrar a divisão entre os modelos.
+"""
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, NamedTuple, Optional, Tuple, Union
+
+from pydantic import ValidationError
+
+from tool_selection import PrunedToolAgent, ToolSelection
+
+# Latências guardadas por fase e modelo (para o p95)
+LATENCY_WINDOW = 1000
+
+SELECTION, SYNTHESIS = "selection", "synthesis"
+
+# Tempo que o Ollama mantém o modelo carregado depois da última requisição
+# (o padrão do servidor, 5 min, descarrega o modelo entre perguntas esparsas)
+DEFAULT_KEEP_ALIVE = "30m"
+
+
+class ModelConfig(NamedTuple):
+    """
+    Configuração de um modelo no Ollama.
+
+    Attributes:
+        name: Modelo (ex.: "llama3.2", "llama3.2:1b", "qwen2.5:0.5b")
+        format: Formato de saída forçado ("json") ou None
+        temperature: Temperatura de amostragem
+        num_ctx: Janela de contexto (None = padrão do modelo)
+        keep_alive: Quanto tempo o modelo fica carregado após cada
+            requisição ("30m", segundos, -1 = sempre, None = padrão do servidor)
+    """
+    name: str = "llama3.2"
+    format: Optional[str] = "json"
+    temperature: float = 0.0
+    num_ctx: Optional[int] = None
+    keep_alive: Union[int, str, None] = DEFAULT_KEEP_ALIVE
+
+
+def parse_keep_alive(value: str) -> Union[int, str]:
+    """`keep_alive` da linha de comando: número (segundos, -1) ou duração ("30m")."""
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+
+def model_label(agent: Any) -> str:
+    """Nome do modelo por trás de `agent` (vínculo, `PrunedToolAgent` ou modelo)."""
+    if isinstance(agent, TieredAgent):
+        return agent.synthesis_name
+    if isinstance(agent, PrunedToolAgent):
+        agent = agent.model
+    agent = getattr(agent, "bound", agent)
+    return str(getattr(agent, "model", None) or type(agent).__name__)
+
+
+def tool_call_problem(message: Any, tools: Dict[str, Any]) -> Optional[str]:
+    """
+    Motivo para não aceitar as chamadas de ferramenta de `message`, ou None
+    se todas são válidas: "no_tool_call", "invalid_json" (o LangChain não
+    conseguiu decodificar), "unknown_tool" (fora de `tools`) ou
+    "invalid_args" (argumentos fora do schema da ferramenta).
+    """
+    if getattr(message, "invalid_tool_calls", None):
+        return "invalid_json"
+    calls = getattr(message, "tool_calls", None) or []
+    if not calls:
+        return "no_tool_call"
+    for call in calls:
+        tool = tools.get(call["name"])
+        if tool is None:
+            return "unknown_tool"
+        schema = getattr(tool, "args_schema", None)
+        if schema is not None and hasattr(schema, "model_validate"):
+            try:
+                schema.model_validate(call.get("args") or {})
+            except ValidationError:
+                return "invalid_args"
+    return None
+
+
+class TieredAgent:
+    """
+    Agente com um modelo para a seleção de ferramentas e outro para a
+    síntese (e para a seleção escalada).
+
+    Fora da seleção ele se comporta como o agente de síntese (`invoke`,
+    `stream`, ...), então pode ser usado onde se espera um agente comum.
+
+    Args:
+        selection: Agente do modelo de seleção
+        synthesis: Agente do modelo de síntese
+        tools: Ferramentas vinculadas (para validar as chamadas)
+        selection_name: Nome do modelo de seleção (métricas)
+        synthesis_name: Nome do modelo de síntese (métricas)
+    """
+
+    def __init__(
+        self,
+        selection: Any,
+        synthesis: Any,
+        tools: Iterable[Any],
+        selection_name: Optional[str] = None,
+        synthesis_name: Optional[str] = None,
+    ) -> None:
+        self.selection = selection
+        self.synthesis = synthesis
+        self.tools = {t.name: t for t in tools}
+        self.selection_name = selection_name or model_label(selection)
+        self.synthesis_name = synthesis_name or model_label(synthesis)
+
+    def for_prompt(self, prompt: str) -> Tuple["TieredAgent", Optional[ToolSelection]]:
+        """
+        Os dois agentes com as ferramentas relevantes para `prompt` (ver
+        `PrunedToolAgent`), escolhidas uma vez pelo agente de síntese.
+        """
+        if not isinstance(self.synthesis, PrunedToolAgent):
+            return self, None
+        synthesis, selection = self.synthesis.for_prompt(prompt)
+        chosen = self.selection
+        if isinstance(chosen, PrunedToolAgent):
+            chosen = chosen.bind(selection.tools)
+        tools = [self.tools[n] for n in selection.tools]
+        return TieredAgent(chosen, synthesis, tools, self.selection_name, self.synthesis_name), selection
+
+    def problem(self, message: Any) -> Optional[str]:
+        """Motivo para escalar a seleção feita em `message` (ver `tool_call_problem`)."""
+        return tool_call_problem(message, self.tools)
+
+    def __getattr__(self, name: str) -> Any:
+        if name == "synthesis" or name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.synthesis, name)
+
+
+def _p95(values: Iterable[float]) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))] if ordered else 0.0
+
+
+class PhaseStats:
+    """Chamadas, latência e escalonamentos por fase e modelo."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._latencies: Dict[Tuple[str, str], Deque[float]] = {}
+        self._calls: Dict[Tuple[str, str], int] = {}
+        self._totals: Dict[Tuple[str, str], float] = {}
+        self.outcomes: Dict[Tuple[str, str], int] = {}
+
+    def record(self, phase: str, model: str, seconds: float) -> None:
+        """Registra uma chamada ao LLM concluída."""
+        key = (phase, model)
+        with self._lock:
+            self._latencies.setdefault(key, deque(maxlen=LATENCY_WINDOW)).append(seconds)
+            self._calls[key] = self._calls.get(key, 0) + 1
+            self._totals[key] = self._totals.get(key, 0.0) + seconds
+
+    def record_selection(self, model: str, outcome: str) -> None:
+        """Resultado de uma seleção: "accepted" ou o motivo do escalonamento."""
+        key = (model, outcome)
+        with self._lock:
+            self.outcomes[key] = self.outcomes.get(key, 0) + 1
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            data: Dict[str, Any] = {}
+            for (phase, model), calls in self._calls.items():
+                data.setdefault(phase, {})[model] = {
+                    "calls": calls,
+                    "mean_ms": round(self._totals[(phase, model)] / calls * 1000, 1),
+                    "p95_ms": round(_p95(self._latencies[(phase, model)]) * 1000, 1),
+                }
+            for model in {m for m, _ in self.outcomes}:
+                counts = {o: n for (m, o), n in self.outcomes.items() if m == model}
+                total = sum(counts.values())
+                entry = data.setdefault(SELECTION, {}).setdefault(model, {})
+                entry["outcomes"] = counts
+                entry["accepted_rate"] = counts.get("accepted", 0) / total if total else 0.0
+            return data
+
+
+PHASE_STATS = PhaseStats()
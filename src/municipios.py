@@ -0,0 +1,192 @@
+"""
+Índice de municípios com busca sem acento/caixa e fallback aproximado.
+
+Mapeia nomes normalizados ("sao leopoldo") e códigos IBGE (6 ou 7 dígitos)
+para um id inteiro compacto, a partir do SUS, do IBGE e do IDH. Nomes com
+erros de digitação vindos do LLM são resolvidos por similaridade de trigramas.
+"""
+import logging
+import re
+import unicodedata
+from collections import defaultdict
+from difflib import SequenceMatcher
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set
+
+import pandas as pd
+
+from loader import load_table
+
+logger = logging.getLogger(__name__)
+
+# Código IBGE da UF do Rio Grande do Sul
+UF_RS = 43
+
+# Similaridade mínima para aceitar um candidato aproximado
+FUZZY_THRESHOLD = 0.75
+
+_SPACES = re.compile(r"\s+")
+_PUNCT = re.compile(r"[^\w\s]")
+_UF_SUFFIX = re.compile(r"\s*\([A-Za-z]{2}\)\s*$")
+
+
+def fold_name(name: str) -> str:
+    """
+    Normaliza um nome de município: remove acentos, sufixo de UF ("(RS)"),
+    pontuação e espaços repetidos, e converte para minúsculas.
+
+    Exemplo:
+        fold_name("São Leopoldo (RS)") → "sao leopoldo"
+    """
+    text = _UF_SUFFIX.sub("", str(name))
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = _PUNCT.sub(" ", text.casefold())
+    return _SPACES.sub(" ", text).strip()
+
+
+def _trigrams(folded: str) -> Set[str]:
+    padded = f"  {folded} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class CityMatch(NamedTuple):
+    """Resultado de uma busca no índice."""
+    city_id: int
+    name: str
+    score: float
+    exact: bool
+
+
+class MunicipalityIndex:
+    """
+    Índice nome normalizado / código IBGE → id inteiro do município.
+    """
+
+    def __init__(self) -> None:
+        self.names: List[str] = []
+        self.ids: Dict[str, int] = {}
+        self.codes: Dict[int, int] = {}
+        self._grams: Dict[str, Set[int]] = defaultdict(set)
+        self._folded: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def add(self, name: str, ibge_code: Optional[int] = None) -> int:
+        """
+        Registra um município (ou reaproveita o id de um nome equivalente).
+
+        Args:
+            name: Nome como aparece na fonte
+            ibge_code: Código IBGE de 7 dígitos, se conhecido
+
+        Returns:
+            int: Id do município
+        """
+        folded = fold_name(name)
+        city_id = self.ids.get(folded)
+        if city_id is None:
+            city_id = len(self.names)
+            self.ids[folded] = city_id
+            self.names.append(str(name).strip())
+            self._folded.append(folded)
+            for gram in _trigrams(folded):
+                self._grams[gram].add(city_id)
+        if ibge_code is not None:
+            code = int(ibge_code)
+            self.codes[code] = city_id
+            # O SIH usa o código de 6 dígitos (sem o dígito verificador)
+            self.codes[code // 10 if code >= 1_000_000 else code] = city_id
+        return city_id
+
+    def resolve_exact(self, query: str) -> Optional[int]:
+        """Id pelo nome normalizado ou código IBGE; None se não houver."""
+        text = str(query).strip()
+        if text.isdigit():
+            return self.codes.get(int(text))
+        return self.ids.get(fold_name(text))
+
+    def lookup(self, query: str, threshold: float = FUZZY_THRESHOLD) -> Optional[CityMatch]:
+        """
+        Busca o município: primeiro exata, depois aproximada por trigramas.
+
+        Args:
+            query: Nome (com ou sem acento) ou código IBGE
+            threshold: Similaridade mínima (0–1) para o fallback aproximado
+
+        Returns:
+            CityMatch ou None se nenhum candidato atingir o limiar
+        """
+        city_id = self.resolve_exact(query)
+        if city_id is not None:
+            return CityMatch(city_id, self.names[city_id], 1.0, True)
+
+        folded = fold_name(query)
+        if not folded:
+            return None
+        grams = _trigrams(folded)
+        shared: Dict[int, int] = defaultdict(int)
+        for gram in grams:
+            for candidate in self._grams.get(gram, ()):
+                shared[candidate] += 1
+
+        best: Optional[CityMatch] = None
+        # Avalia só os candidatos com mais trigramas em comum
+        for candidate, _ in sorted(shared.items(), key=lambda kv: -kv[1])[:20]:
+            score = SequenceMatcher(None, folded, self._folded[candidate]).ratio()
+            if score >= threshold and (best is None or score > best.score):
+                best = CityMatch(candidate, self.names[candidate], score, False)
+        if best is not None:
+            logger.info("Município '%s' resolvido como '%s' (%.2f)", query, best.name, best.score)
+        return best
+
+    def resolve(self, query: str) -> int:
+        """
+        Como `lookup`, mas retorna apenas o id.
+
+        Raises:
+            ValueError: Se o município não for encontrado
+        """
+        match = self.lookup(query)
+        if match is None:
+            raise ValueError(f"Município '{query}' não encontrado.")
+        return match.city_id
+
+    def encode(self, names: pd.Series) -> pd.Series:
+        """
+        Converte uma coluna de nomes em ids (Int32, nulo se desconhecido),
+        normalizando cada valor distinto uma única vez.
+        """
+        uniques = names.dropna().unique()
+        mapping = {value: self.ids.get(fold_name(value)) for value in uniques}
+        return names.map(mapping).astype("Int32")
+
+
+def build_index(extra_names: Iterable[str] = ()) -> MunicipalityIndex:
+    """
+    Constrói o índice a partir do IBGE (RS), do IDH e de nomes adicionais
+    (ex.: valores distintos de `CIDADE_RESIDENCIA_PACIENTE`).
+    """
+    index = MunicipalityIndex()
+
+    try:
+        ibge = load_table("ibge")
+        rs = ibge[ibge["UF"] == UF_RS].drop_duplicates("Codigo Municipio Completo")
+        for name, code in zip(rs["Nome_Municipio"], rs["Codigo Municipio Completo"]):
+            index.add(name, code)
+    except (FileNotFoundError, KeyError) as exc:
+        logger.warning("IBGE indisponível para o índice de municípios: %s", exc)
+
+    try:
+        idh = load_table("idh")
+        for name in idh["Territorialidade"].dropna():
+            index.add(_UF_SUFFIX.sub("", name))
+    except (FileNotFoundError, KeyError) as exc:
+        logger.warning("IDH indisponível para o índice de municípios: %s", exc)
+
+    for name in extra_names:
+        if isinstance(name, str) and name.strip():
+            index.add(name)
+
+    logger.info("Índice de municípios: %d municípios", len(index))
+    return index
@@ -0,0 +1,273 @@
+"""
+Limites de latência das chamadas ao LLM: timeout por chamada, prazo total da
+requisição e circuit breaker.
+
+`LLMGuard.call`/`acall` executam uma chamada ao modelo com timeout de
+`min(call_timeout, tempo restante do prazo)` e registram o resultado no
+`CircuitBreaker`. Quando a chamada não pode ser feita (circuito aberto,
+prazo esgotado) ou falha/estoura o timeout, levantam `LLMUnavailable`, e o
+agente responde em modo degradado, direto da saída das ferramentas (ver
+`agent.get_response`).
+
+O circuit breaker olha as últimas `window` chamadas: com pelo menos
+`min_calls`, abre quando a fração de falhas (erros e timeouts) ou de
+chamadas lentas (acima de `slow_call_seconds`) passa do limite. Aberto, ele
+rejeita chamadas por `cooldown` segundos e depois deixa passar uma chamada
+de teste (meio-aberto): sucesso fecha o circuito, falha o reabre.
+"""
+import asyncio
+import contextvars
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Timeout (segundos) de cada chamada ao LLM
+DEFAULT_LLM_TIMEOUT = 30.0
+
+# Prazo (segundos) da requisição inteira
+DEFAULT_REQUEST_TIMEOUT = 60.0
+
+# Chamadas síncronas ao LLM rodam aqui para poderem ser abandonadas no timeout
+LLM_EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix="llm")
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class LLMUnavailable(RuntimeError):
+    """
+    O LLM não respondeu a tempo, falhou ou está com o circuito aberto.
+
+    Attributes:
+        reason: "timeout", "deadline", "circuit_open" ou "error"
+    """
+
+    def __init__(self, reason: str, detail: str = "") -> None:
+        super().__init__(f"LLM indisponível ({reason}){': ' + detail if detail else ''}")
+        self.reason = reason
+
+
+class Deadline:
+    """Prazo absoluto de uma requisição (None = sem prazo)."""
+
+    def __init__(self, seconds: Optional[float]) -> None:
+        self.expires_at = None if seconds is None else time.monotonic() + seconds
+
+    def remaining(self) -> Optional[float]:
+        """Segundos restantes (pode ser negativo), ou None sem prazo."""
+        return None if self.expires_at is None else self.expires_at - time.monotonic()
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker por taxa de falhas e de chamadas lentas.
+
+    Args:
+        window: Chamadas recentes consideradas
+        min_calls: Mínimo de chamadas na janela para poder abrir
+        failure_rate: Fração de falhas que abre o circuito
+        slow_call_seconds: Duração a partir da qual a chamada conta como lenta
+        slow_rate: Fração de chamadas lentas que abre o circuito
+        cooldown: Segundos aberto antes da chamada de teste
+    """
+
+    def __init__(
+        self,
+        window: int = 20,
+        min_calls: int = 5,
+        failure_rate: float = 0.5,
+        slow_call_seconds: float = 10.0,
+        slow_rate: float = 0.8,
+        cooldown: float = 30.0,
+    ) -> None:
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_rate = slow_rate
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        # (falhou, lenta) das últimas chamadas
+        self._calls: Deque[Tuple[bool, bool]] = deque(maxlen=window)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+        self.trips = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.cooldown:
+            self._state = HALF_OPEN
+            self._probing = False
+        return self._state
+
+    def allow(self) -> bool:
+        """Se uma chamada pode ser feita agora (no meio-aberto, só uma de teste)."""
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED or (state == HALF_OPEN and not self._probing):
+                self._probing = state == HALF_OPEN
+                return True
+            self.rejected += 1
+            return False
+
+    def _open(self) -> None:
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._probing = False
+        self._calls.clear()
+        self.trips += 1
+
+    def record(self, duration: float, ok: bool) -> None:
+        """Registra uma chamada feita após `allow()`."""
+        slow = duration >= self.slow_call_seconds
+        with self._lock:
+            if self._state == HALF_OPEN:
+                if ok and not slow:
+                    self._state = CLOSED
+                    logger.info("Circuit breaker do LLM fechado após chamada de teste")
+                else:
+                    self._open()
+                    logger.warning("Circuit breaker do LLM reaberto: chamada de teste falhou")
+                self._probing = False
+                return
+            self._calls.append((not ok, slow))
+            if len(self._calls) < self.min_calls:
+                return
+            failures = sum(f for f, _ in self._calls) / len(self._calls)
+            slows = sum(s for _, s in self._calls) / len(self._calls)
+            if failures >= self.failure_rate or slows >= self.slow_rate:
+                self._open()
+                logger.warning(
+                    "Circuit breaker do LLM aberto: falhas %.0f%%, lentas %.0f%% nas últimas %d chamadas",
+                    failures * 100, slows * 100, self.window,
+                )
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "state": self._current_state(),
+                "recent_calls": len(self._calls),
+                "recent_failures": sum(f for f, _ in self._calls),
+                "recent_slow": sum(s for _, s in self._calls),
+                "trips": self.trips,
+                "rejected": self.rejected,
+            }
+
+
+class LLMGuard:
+    """
+    Timeouts e circuit breaker das chamadas ao LLM.
+
+    Args:
+        call_timeout: Timeout de cada chamada (None = sem limite)
+        request_timeout: Prazo da requisição inteira (None = sem limite)
+        breaker: Circuit breaker compartilhado pelas requisições
+    """
+
+    def __init__(
+        self,
+        call_timeout: Optional[float] = DEFAULT_LLM_TIMEOUT,
+        request_timeout: Optional[float] = DEFAULT_REQUEST_TIMEOUT,
+        breaker: Optional[CircuitBreaker] = None,
+    ) -> None:
+        self.call_timeout = call_timeout
+        self.request_timeout = request_timeout
+        self.breaker = breaker or CircuitBreaker()
+        self.enabled = True
+
+    def deadline(self) -> Deadline:
+        """Prazo de uma nova requisição."""
+        return Deadline(self.request_timeout)
+
+    def _timeout(self, deadline: Optional[Deadline]) -> Optional[float]:
+        remaining = deadline.remaining() if deadline is not None else None
+        if remaining is not None and remaining <= 0:
+            raise LLMUnavailable("deadline")
+        if not self.breaker.allow():
+            raise LLMUnavailable("circuit_open")
+        if remaining is None:
+            return self.call_timeout
+        return remaining if self.call_timeout is None else min(self.call_timeout, remaining)
+
+    def _failed(self, started: float, exc: BaseException, timeout: Optional[float]) -> LLMUnavailable:
+        self.breaker.record(time.perf_counter() - started, ok=False)
+        if isinstance(exc, (FutureTimeoutError, asyncio.TimeoutError)):
+            logger.error("Chamada ao LLM excedeu %.1fs", timeout)
+            return LLMUnavailable("timeout", f"{timeout:.1f}s")
+        logger.error("Chamada ao LLM falhou: %s: %s", type(exc).__name__, exc)
+        return LLMUnavailable("error", f"{type(exc).__name__}: {exc}")
+
+    def call(self, fn: Callable[[], Any], deadline: Optional[Deadline] = None) -> Any:
+        """
+        Executa `fn` (chamada síncrona ao LLM) dentro do timeout. No timeout
+        a thread é abandonada e termina sozinha (ou pelo timeout do cliente
+        HTTP, ver `agent.build_model`).
+
+        Raises:
+            LLMUnavailable: Circuito aberto, prazo esgotado, timeout ou erro
+        """
+        if not self.enabled:
+            return fn()
+        timeout = self._timeout(deadline)
+        started = time.perf_counter()
+        future = LLM_EXECUTOR.submit(contextvars.copy_context().run, fn)
+        try:
+            result = future.result(timeout=timeout)
+        except Exception as exc:
+            future.cancel()
+            raise self._failed(started, exc, timeout) from exc
+        self.breaker.record(time.perf_counter() - started, ok=True)
+        return result
+
+    async def acall(self, fn: Callable[[], Awaitable[Any]], deadline: Optional[Deadline] = None) -> Any:
+        """Versão assíncrona de `call`: o timeout cancela a corrotina de `fn()`."""
+        if not self.enabled:
+            return await fn()
+        timeout = self._timeout(deadline)
+        started = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(fn(), timeout)
+        except Exception as exc:
+            raise self._failed(started, exc, timeout) from exc
+        self.breaker.record(time.perf_counter() - started, ok=True)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "call_timeout": self.call_timeout,
+            "request_timeout": self.request_timeout,
+            "breaker": self.breaker.stats(),
+        }
+
+
+class GatedCallback:
+    """
+    Repassa tokens a `callback` até `close()`: uma chamada em streaming
+    abandonada no timeout não escreve mais na saída. Conta os tokens
+    repassados.
+    """
+
+    def __init__(self, callback: Callable[[str], Any]) -> None:
+        self.callback = callback
+        self.closed = False
+        self.emitted = 0
+
+    def __call__(self, token: str) -> Any:
+        if self.closed:
+            return None
+        self.emitted += 1
+        return self.callback(token)
+
+    def close(self) -> None:
+        self.closed = True
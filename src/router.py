@@ -0,0 +1,419 @@
+"""
+Roteador determinístico de intenções: mapeia perguntas em português
+diretamente para uma ferramenta e seus argumentos, sem a chamada ao LLM de
+seleção de ferramenta.
+
+Combina regras (palavras-chave/regex) com um classificador de centróides
+treinado sobre as docstrings das ferramentas e exemplos de perguntas. Só
+devolve uma rota quando a confiança passa do limiar e o vocabulário da
+ferramenta cobre a pergunta inteira (`covers`): uma palavra que a regra não
+conhece (um município, um mês, "exceto", "cardíacas") pode ser um filtro que
+a ferramenta não aplica, e a pergunta vai para a seleção pelo LLM.
+"""
+import argparse
+import json
+import logging
+import re
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional
+
+import numpy as np
+
+from answer_cache import HashingVectorizer, fold_text
+from entities import extract_entities
+from municipios import fold_name
+
+logger = logging.getLogger(__name__)
+
+# Confiança mínima para pular a seleção de ferramentas pelo LLM
+DEFAULT_THRESHOLD = 0.6
+
+# Número padrão de itens em perguntas de "top n" sem número explícito
+DEFAULT_TOP_N = 5
+
+# Ferramentas cujos argumentos só o LLM preenche: o classificador as
+# reconhece (para não desviar a pergunta para outra ferramenta), mas a
+# rota fica com o LLM
+LLM_ONLY_TOOLS = {"aggregate_hospitalizations", "query_data"}
+
+# Exemplos de perguntas por ferramenta (complementam as docstrings)
+EXAMPLES: Dict[str, List[str]] = {
+    "get_top_cities": [
+        "Quais as 5 cidades com o maior número de internações?",
+        "Quais municípios têm mais internações respiratórias?",
+        "Ranking das cidades com mais internações",
+    ],
+    "get_top_admission_age_group": [
+        "Qual faixa etária tem o maior número de internações?",
+        "Em qual faixa etária concentram-se a maioria das internações?",
+        "Qual a faixa de idade mais internada?",
+    ],
+    "get_admission_age_groups": [
+        "Qual é o número de internações por faixa etária?",
+        "Quantas internações em cada faixa etária?",
+        "Distribuição das internações por faixa de idade",
+    ],
+    "get_top_ages": [
+        "Quais as 5 menores idades registradas?",
+        "Quais as 3 maiores idades dos pacientes?",
+        "Mostre as idades mais altas e mais baixas",
+    ],
+    "aggregate_hospitalizations": [
+        "Qual o custo médio das internações por faixa etária?",
+        "Qual a permanência média das internações de mulheres?",
+        "Taxa de mortalidade por ano entre idosos com mais de 60 anos",
+        "Quais os CIDs mais frequentes entre crianças?",
+    ],
+    "query_data": [
+        "Quantas internações houve em Pelotas em 2020?",
+        "Qual a taxa de mortalidade por ano em Porto Alegre?",
+        "Qual o valor total gasto com internações por CID J45?",
+        "Compare o IDH com as internações das cidades",
+        "Qual a média de PM10 por mês?",
+    ],
+}
+
+_NUMBER_WORDS = {
+    "um": 1, "uma": 1, "dois": 2, "duas": 2, "tres": 3, "quatro": 4, "cinco": 5,
+    "seis": 6, "sete": 7, "oito": 8, "nove": 9, "dez": 10, "vinte": 20,
+}
+
+_RE_NUMBER = re.compile(r"\b(\d{1,4})\b")
+_RE_CITY = re.compile(r"\b(cidades?|municipios?)\b")
+_RE_AGE_GROUP = re.compile(r"\bfaixas?\s+(etarias?|de\s+idade)\b")
+_RE_AGES = re.compile(r"\bidades?\b")
+_RE_SUPERLATIVE = re.compile(r"\b(maior|maiores|mais|maioria|top|principais|ranking|concentra\w*|predomina\w*)\b")
+_RE_BREAKDOWN = re.compile(r"\b(por|cada|distribuicao|distribuidas?)\b\s+(faixa|idade)")
+_RE_LOW = re.compile(r"\b(menores|menor|mais\s+(novos|novas|jovens|baixas))\b")
+_RE_HIGH = re.compile(r"\b(maiores|mais\s+(velhos|velhas|idosos|altas))\b")
+# Lugar com inicial maiúscula ou "na cidade de": filtro mesmo fora do índice de municípios
+_RE_UNSUPPORTED = re.compile(r"\bem\s+[A-Z]|(?i:\b(na\s+cidade|no\s+munic[ií]pio)\s+de\b)")
+# Métricas que não são contagem de internações (as ferramentas roteáveis só contam)
+_RE_OTHER_METRIC = re.compile(
+    r"\b(mortes?|obitos?|mortalidade|morreram|custos?|valor(es)?|gastos?|"
+    r"permanencias?|dias|taxas?|medias?|medios?)\b"
+)
+_RE_ADMISSIONS = re.compile(r"\binterna\w*")
+_RE_FEWEST = re.compile(r"\b(menos|menor|menores)\b")
+_RE_ONE_CITY = re.compile(r"\b(cidade|municipio)\b")
+
+# Palavras aceitas em qualquer pergunta roteável (interrogativos, artigos, verbos)
+_COMMON_WORDS = frozenset(
+    "qual quais quantas quantos e eh sao o a os as um uma de do da dos das em no na nos nas "
+    "com por para pelo pela que tem teve tiveram possui possuem houve ha existem existe "
+    "foram foi se me mostre mostra mostrar liste listar lista diga informe apresente "
+    "quero saber gostaria ver voce pode poderia sabe favor registradas registrados "
+    "registrada registrado pacientes paciente".split()
+)
+_ADMISSION_WORDS = "internacoes internacao internados internadas hospitalizacoes respiratorias respiratorios"
+# Vocabulário de cada ferramenta roteável, além de `_COMMON_WORDS`
+_TOOL_WORDS: Dict[str, frozenset] = {
+    "get_top_cities": frozenset(
+        f"{_ADMISSION_WORDS} cidades cidade municipios municipio maior maiores mais numero "
+        "quantidade ranking top principais lideram dois duas tres quatro cinco seis sete oito "
+        "nove dez vinte".split()
+    ),
+    "get_top_admission_age_group": frozenset(
+        f"{_ADMISSION_WORDS} faixa faixas etaria etarias idade maior mais maioria numero "
+        "quantidade concentram concentra predomina predominam frequente comum lidera".split()
+    ),
+    "get_admission_age_groups": frozenset(
+        f"{_ADMISSION_WORDS} faixa faixas etaria etarias idade numero quantidade total cada "
+        "distribuicao distribuidas distribuidos separadas".split()
+    ),
+    "get_top_ages": frozenset(
+        "idades idade menores maiores menor maior mais novos novas jovens velhos velhas altas "
+        "baixas dois duas tres quatro cinco seis sete oito nove dez vinte".split()
+    ),
+}
+# Ferramentas com o argumento `n`, que aceitam um número pequeno na pergunta
+_COUNT_TOOLS = {"get_top_cities", "get_top_ages"}
+
+
+class Route(NamedTuple):
+    """Ferramenta escolhida pelo roteador."""
+    tool: str
+    args: Dict[str, Any]
+    confidence: float
+    source: str
+
+
+def extract_n(text: str, default: Optional[int] = DEFAULT_TOP_N) -> Optional[int]:
+    """Extrai o "n" de perguntas de top-n (dígitos ou por extenso)."""
+    match = _RE_NUMBER.search(text)
+    if match:
+        return int(match.group(1))
+    for word in text.split():
+        if word in _NUMBER_WORDS:
+            return _NUMBER_WORDS[word]
+    return default
+
+
+def unsupported_query(prompt: str) -> bool:
+    """
+    Se a pergunta pede um filtro (município, ano, mês, período, região,
+    exclusão, idade, sexo, CID; ver `entities`) ou uma métrica (óbitos,
+    custo, permanência, taxa) que as ferramentas roteáveis não têm: essas
+    vão para o LLM, que pode usar as ferramentas genéricas.
+    """
+    if _RE_UNSUPPORTED.search(prompt) or _RE_OTHER_METRIC.search(fold_text(prompt)):
+        return True
+    return extract_entities(prompt).has_filters
+
+
+def covers(tool: str, prompt: str) -> bool:
+    """
+    Se o vocabulário de `tool` cobre a pergunta inteira (cobertura
+    positiva): toda palavra é conhecida da regra e não há filtro nem outra
+    métrica. Só então a rota (ou o template da resposta) pode dispensar o
+    LLM; uma palavra desconhecida pode mudar o que a pergunta pede.
+    """
+    vocabulary = _TOOL_WORDS.get(tool)
+    if vocabulary is None:
+        return False
+    for word in fold_name(prompt).split():
+        if word in _COMMON_WORDS or word in vocabulary:
+            continue
+        if tool in _COUNT_TOOLS and word.isdigit() and len(word) <= 3:
+            continue
+        return False
+    return not unsupported_query(prompt)
+
+
+def _city_args(text: str) -> Optional[Dict[str, Any]]:
+    """
+    Argumentos de `get_top_cities` (ranking das cidades com mais
+    internações), ou None se a pergunta não é essa: outra contagem que não
+    internações, ou as cidades com menos. "A cidade" (singular) sem número
+    pede só a primeira.
+    """
+    if not _RE_ADMISSIONS.search(text) or _RE_FEWEST.search(text):
+        return None
+    n = extract_n(text, default=None)
+    if n is None:
+        n = 1 if _RE_ONE_CITY.search(text) else DEFAULT_TOP_N
+    return {"n": n}
+
+
+def _rule_route(prompt: str) -> Optional[Route]:
+    """
+    Regras de palavras-chave. Retorna a rota com confiança alta quando uma
+    regra casa, todos os argumentos obrigatórios são extraídos e a regra
+    cobre a pergunta inteira (`covers`).
+    """
+    route = _match_rule(fold_text(prompt))
+    return route if route is not None and covers(route.tool, prompt) else None
+
+
+def _match_rule(text: str) -> Optional[Route]:
+    """A regra que casa com `text` (já normalizado), sem checar a cobertura."""
+
+    if _RE_AGE_GROUP.search(text):
+        if _RE_BREAKDOWN.search(text) and not _RE_SUPERLATIVE.search(text):
+            return Route("get_admission_age_groups", {}, 0.95, "rule")
+        if _RE_SUPERLATIVE.search(text):
+            return Route("get_top_admission_age_group", {}, 0.95, "rule")
+        return None
+
+    if _RE_CITY.search(text):
+        args = _city_args(text) if _RE_SUPERLATIVE.search(text) else None
+        return Route("get_top_cities", args, 0.9, "rule") if args is not None else None
+
+    if _RE_AGES.search(text):
+        low, high = bool(_RE_LOW.search(text)), bool(_RE_HIGH.search(text))
+        if low or high:
+            option = "ambos" if low and high else ("menores" if low else "maiores")
+            return Route("get_top_ages", {"n": extract_n(text), "range": option}, 0.9, "rule")
+    return None
+
+
+class CentroidClassifier:
+    """
+    Classificador de centróides sobre vetores de hashing: cada ferramenta é
+    representada pela média dos vetores da sua docstring e dos exemplos.
+    """
+
+    def __init__(self, vectorizer: Optional[HashingVectorizer] = None) -> None:
+        self.vectorizer = vectorizer or HashingVectorizer()
+        self.labels: List[str] = []
+        self.centroids = np.zeros((0, self.vectorizer.dim), dtype=np.float32)
+
+    def fit(self, corpus: Dict[str, Iterable[str]]) -> "CentroidClassifier":
+        """Treina com textos por rótulo (ferramenta)."""
+        self.labels = list(corpus)
+        rows = []
+        for label in self.labels:
+            vectors = np.stack([self.vectorizer.transform(t) for t in corpus[label]])
+            centroid = vectors.mean(axis=0)
+            norm = float(np.linalg.norm(centroid))
+            rows.append(centroid / norm if norm else centroid)
+        self.centroids = np.stack(rows).astype(np.float32)
+        return self
+
+    def predict(self, prompt: str) -> List[tuple]:
+        """Rótulos ordenados por similaridade: [(rótulo, similaridade), ...]."""
+        scores = self.centroids @ self.vectorizer.transform(prompt)
+        order = np.argsort(-scores)
+        return [(self.labels[i], float(scores[i])) for i in order]
+
+
+class RouterMetrics:
+    """Contadores de uso do caminho rápido vs. fallback para o LLM."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.fast_path: Counter = Counter()
+        self.fallback = 0
+
+    def record(self, route: Optional[Route]) -> None:
+        with self._lock:
+            if route is None:
+                self.fallback += 1
+            else:
+                self.fast_path[route.tool] += 1
+
+    def as_dict(self) -> Dict[str, Any]:
+        total = sum(self.fast_path.values()) + self.fallback
+        return {
+            "requests": total,
+            "fast_path": sum(self.fast_path.values()),
+            "fallback": self.fallback,
+            "fast_path_rate": sum(self.fast_path.values()) / total if total else 0.0,
+            "by_tool": dict(self.fast_path),
+        }
+
+
+class IntentRouter:
+    """
+    Roteador regras + classificador.
+
+    Args:
+        tools: Ferramentas LangChain (usa `.name` e `.description`)
+        threshold: Confiança mínima para rotear sem o LLM
+        examples: Exemplos de perguntas por ferramenta
+    """
+
+    def __init__(
+        self,
+        tools: Iterable[Any],
+        threshold: float = DEFAULT_THRESHOLD,
+        examples: Optional[Dict[str, List[str]]] = None,
+    ) -> None:
+        examples = EXAMPLES if examples is None else examples
+        tools = list(tools)
+        self.tool_names = [t.name for t in tools]
+        self.threshold = threshold
+        self.enabled = True
+        self.metrics = RouterMetrics()
+        corpus = {
+            t.name: [t.description or t.name] + examples.get(t.name, [])
+            for t in tools
+        }
+        self.classifier = CentroidClassifier().fit(corpus)
+
+    def _classifier_route(self, prompt: str) -> Optional[Route]:
+        """
+        Rota pelo classificador; a confiança é a similaridade do melhor
+        rótulo penalizada pela proximidade do segundo.
+        """
+        ranked = self.classifier.predict(prompt)
+        best, score = ranked[0]
+        runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+        confidence = score * min(1.0, (score - runner_up) / 0.15)
+        if not covers(best, prompt):
+            return None
+        text = fold_text(prompt)
+        if best == "get_top_cities":
+            city_args = _city_args(text)
+            if city_args is None:
+                return None
+            args: Dict[str, Any] = city_args
+        elif best == "get_top_ages":
+            # Sem direção explícita (menores/maiores) não há como preencher `range`
+            return None
+        elif best in LLM_ONLY_TOOLS:
+            return None
+        else:
+            args = {}
+        return Route(best, args, confidence, "classifier")
+
+    def route(self, prompt: str, threshold: Optional[float] = None) -> Optional[Route]:
+        """
+        Escolhe a ferramenta para `prompt`, ou None para usar o LLM.
+
+        `threshold` substitui o limiar do roteador (ex.: no modo degradado,
+        sem o LLM); essas consultas não entram em `metrics`.
+        """
+        if not self.enabled:
+            return None
+        route = _rule_route(prompt)
+        if route is not None:
+            # Regras e classificador precisam concordar
+            best = self.classifier.predict(prompt)[0][0]
+            if best != route.tool:
+                route = route._replace(confidence=route.confidence * 0.8)
+        else:
+            route = self._classifier_route(prompt)
+
+        limit = self.threshold if threshold is None else threshold
+        if route is None or route.tool not in self.tool_names or route.confidence < limit:
+            route = None
+        if threshold is None:
+            self.metrics.record(route)
+        logger.debug("Roteador: %r → %s", prompt, route)
+        return route
+
+
+def load_eval_set(path: Optional[Path] = None) -> List[Dict[str, Any]]:
+    """
+    Carrega o conjunto de avaliação (JSONL com `prompt`, `tool` e `args`;
+    `tool` nulo significa que a pergunta deve ir para o LLM). O campo
+    opcional `bind` lista as ferramentas que a poda (`tool_selection`) deve
+    vincular para o LLM responder.
+    """
+    if path is None:
+        path = Path(__file__).parent.parent / "data" / "eval" / "router_eval.jsonl"
+    with open(path, encoding="utf-8") as fh:
+        return [json.loads(line) for line in fh if line.strip()]
+
+
+def evaluate(router: IntentRouter, cases: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Avalia o roteador: cobertura (fração roteada sem LLM) e precisão das
+    rotas tomadas (ferramenta e argumentos corretos).
+    """
+    routed = correct = 0
+    errors = []
+    for case in cases:
+        route = router.route(case["prompt"])
+        if route is None:
+            continue
+        routed += 1
+        if route.tool == case.get("tool") and route.args == case.get("args", {}):
+            correct += 1
+        else:
+            errors.append({"prompt": case["prompt"], "expected": case.get("tool"), "got": route._asdict()})
+    return {
+        "cases": len(cases),
+        "routed": routed,
+        "coverage": routed / len(cases) if cases else 0.0,
+        "precision": correct / routed if routed else 0.0,
+        "errors": errors,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Avaliação offline do roteador de intenções")
+    parser.add_argument("--eval-set", type=Path, help="JSONL de avaliação (padrão: data/eval/router_eval.jsonl)")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args()
+
+    from agent import TOOL_REGISTRY
+    router = IntentRouter(TOOL_REGISTRY.values(), threshold=args.threshold)
+    print(json.dumps(evaluate(router, load_eval_set(args.eval_set)), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
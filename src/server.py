@@ -0,0 +1,364 @@
+"""
+Serviço HTTP local e assíncrono para o chatbot.
+
+Todas as requisições compartilham um único dataset carregado e um único
+agente (portanto um único cliente HTTP com pool de conexões para o Ollama).
+Um limitador de concorrência protege o servidor de modelo: acima de
+`max_concurrency` chamadas simultâneas as requisições esperam numa fila de
+tamanho `max_queue`; com a fila cheia, a resposta é 503 com `Retry-After`.
+
+Uso:
+    python src/server.py --port 8080 --max-concurrency 4
+    python src/server.py --fake-llm --fake-latency 0.5   # teste de carga
+
+Endpoints:
+    POST /chat         {"prompt": "...", "function_calling": true}
+    POST /chat/stream  mesmo corpo; resposta em text/plain, token a token
+    GET  /health       inclui a versão do dataset e do armazenamento
+    GET  /metrics
+    GET  /metrics/prometheus   exposição em texto do Prometheus
+
+Com o armazenamento particionado (`ingest.py`), o servidor verifica a versão
+a cada `--watch-interval` segundos e troca o dataset sem reiniciar.
+
+As chamadas ao modelo têm timeout (`--llm-timeout`) e cada resposta um prazo
+(`--request-timeout`); com o modelo lento ou falhando, o circuit breaker
+corta as chamadas e as respostas saem em modo degradado, direto das
+ferramentas (ver `resilience`). O estado do circuito fica em `/metrics`.
+"""
+import argparse
+import asyncio
+import logging
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+
+try:
+    from aiohttp import web
+except ImportError:  # pragma: no cover - depende do ambiente
+    web = None
+
+from agent import (
+    ANSWER_CACHE,
+    LLM_GUARD,
+    ROUTER,
+    SYSTEM_PROMPT,
+    TEMPLATES,
+    TOOL_CACHE,
+    aget_response,
+    build_agent,
+    collect_tool_calls,
+    configure_tool_executor,
+    tool_executor_stats,
+)
+from ingest import StoreWatcher
+from model_tiers import PHASE_STATS, ModelConfig, parse_keep_alive
+from tools import DATASET, SQL_ENGINE
+from tracing import METRICS
+from warmup import warm_up
+
+LOGGER = logging.getLogger(__name__)
+
+
+class Overloaded(Exception):
+    """O limite de concorrência e a fila de espera estão cheios."""
+
+
+class ConcurrencyLimiter:
+    """
+    Semáforo com fila limitada (backpressure).
+
+    Args:
+        max_concurrency: Requisições atendidas simultaneamente
+        max_queue: Requisições que podem esperar por uma vaga
+        queue_timeout: Espera máxima na fila, em segundos (None = sem limite)
+    """
+
+    def __init__(self, max_concurrency: int, max_queue: int, queue_timeout: Optional[float] = None) -> None:
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Ocupa uma vaga; levanta `Overloaded` se a fila estiver cheia."""
+        if self._semaphore.locked() and self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise Overloaded()
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise Overloaded() from None
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._semaphore.release()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "active": self.active,
+            "waiting": self.waiting,
+            "rejected": self.rejected,
+        }
+
+
+async def _read_prompt(request: "web.Request") -> Any:
+    """Lê o corpo JSON; retorna (prompt, corpo) ou uma resposta 400."""
+    try:
+        body = await request.json()
+        prompt = str(body["prompt"]).strip()
+    except (ValueError, KeyError, TypeError):
+        return web.json_response({"error": "Envie JSON com o campo 'prompt'."}, status=400)
+    if not prompt:
+        return web.json_response({"error": "O campo 'prompt' está vazio."}, status=400)
+    return prompt, body
+
+
+def _overloaded() -> "web.Response":
+    return web.json_response(
+        {"error": "Servidor ocupado, tente novamente."},
+        status=503,
+        headers={"Retry-After": "1"},
+    )
+
+
+def _trace_id() -> str:
+    """Identificador curto que liga a resposta de erro à entrada no log."""
+    return uuid.uuid4().hex[:12]
+
+
+async def handle_chat(request: "web.Request") -> "web.Response":
+    parsed = await _read_prompt(request)
+    if isinstance(parsed, web.Response):
+        return parsed
+    prompt, body = parsed
+
+    app = request.app
+    limiter: ConcurrencyLimiter = app["limiter"]
+    started = time.perf_counter()
+    try:
+        async with limiter.slot():
+            answer, messages = await aget_response(
+                app["agent"], prompt,
+                use_function_calling=bool(body.get("function_calling", True)),
+            )
+    except Overloaded:
+        return _overloaded()
+    except Exception:
+        # Detalhes da exceção (caminhos, Ollama/httpx) ficam só no log
+        trace_id = _trace_id()
+        LOGGER.exception("Falha ao responder [%s]: %s", trace_id, prompt)
+        return web.json_response(
+            {"error": "Erro interno ao gerar a resposta.", "trace_id": trace_id}, status=500,
+        )
+
+    return web.json_response({
+        "answer": answer,
+        "tool_calls": collect_tool_calls(messages),
+        "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+    })
+
+
+async def handle_chat_stream(request: "web.Request") -> "web.StreamResponse":
+    """Como `/chat`, mas transmite a resposta final token a token."""
+    parsed = await _read_prompt(request)
+    if isinstance(parsed, web.Response):
+        return parsed
+    prompt, body = parsed
+
+    app = request.app
+    limiter: ConcurrencyLimiter = app["limiter"]
+    try:
+        async with limiter.slot():
+            response = web.StreamResponse(headers={"Content-Type": "text/plain; charset=utf-8"})
+            await response.prepare(request)
+
+            async def send(token: str) -> None:
+                await response.write(token.encode("utf-8"))
+
+            try:
+                await aget_response(
+                    app["agent"], prompt,
+                    use_function_calling=bool(body.get("function_calling", True)),
+                    on_token=send,
+                )
+            except Exception:
+                trace_id = _trace_id()
+                LOGGER.exception("Falha ao responder [%s]: %s", trace_id, prompt)
+                await response.write(f"\n[erro ao gerar a resposta; trace_id {trace_id}]".encode("utf-8"))
+            await response.write_eof()
+            return response
+    except Overloaded:
+        return _overloaded()
+
+
+async def handle_health(request: "web.Request") -> "web.Response":
+    watcher = request.app.get("watcher")
+    return web.json_response({
+        "status": "ok",
+        "dataset_loaded": DATASET.loaded,
+        "dataset_version": DATASET.version,
+        "store_version": watcher.version if watcher is not None else None,
+    })
+
+
+async def handle_metrics(request: "web.Request") -> "web.Response":
+    return web.json_response({
+        "limiter": request.app["limiter"].stats(),
+        "tool_cache": TOOL_CACHE.stats(),
+        "answer_cache": ANSWER_CACHE.stats(),
+        "router": ROUTER.metrics.as_dict(),
+        "templates": TEMPLATES.metrics.as_dict(),
+        "llm": LLM_GUARD.stats(),
+        "tools": tool_executor_stats(),
+        "models": PHASE_STATS.as_dict(),
+        "warmup": [r._asdict() for r in request.app.get("warmup", [])],
+    })
+
+
+async def handle_prometheus(request: "web.Request") -> "web.Response":
+    return web.Response(
+        text=METRICS.render(),
+        headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+    )
+
+
+def create_app(
+    agent: Any,
+    max_concurrency: int = 4,
+    max_queue: int = 32,
+    queue_timeout: Optional[float] = 30.0,
+    watch_interval: float = 5.0,
+    warmup: bool = True,
+) -> "web.Application":
+    """
+    Cria a aplicação aiohttp com um agente compartilhado.
+
+    `watch_interval` é o intervalo (segundos) entre verificações de nova
+    versão do armazenamento do SUS; 0 desliga a troca automática. Com
+    `warmup`, o modelo é aquecido (ver `warmup`) junto com a carga do
+    dataset, antes da primeira requisição.
+
+    Raises:
+        RuntimeError: Se o aiohttp não estiver instalado
+    """
+    if web is None:
+        raise RuntimeError("aiohttp não está instalado: pip install chatbot-pysus[server]")
+
+    # Cada requisição atendida pode ter chamadas de ferramenta em andamento
+    configure_tool_executor(max_concurrency)
+    app = web.Application()
+    app["agent"] = agent
+
+    async def on_startup(app: "web.Application") -> None:
+        app["limiter"] = ConcurrencyLimiter(max_concurrency, max_queue, queue_timeout)
+        # A versão de referência é lida antes da carga: uma ingestão
+        # concluída no meio dela só provoca uma troca a mais
+        if watch_interval > 0:
+            app["watcher"] = StoreWatcher([DATASET, SQL_ENGINE], interval=watch_interval)
+        # Carrega o dataset e aquece o modelo uma vez, antes da primeira requisição
+        loads = [asyncio.to_thread(DATASET.get)]
+        if warmup:
+            loads.append(asyncio.to_thread(warm_up, app["agent"], SYSTEM_PROMPT))
+        results = await asyncio.gather(*loads)
+        if warmup:
+            app["warmup"] = results[1]
+        if "watcher" in app:
+            app["watcher"].start()
+
+    async def on_cleanup(app: "web.Application") -> None:
+        if "watcher" in app:
+            await asyncio.to_thread(app["watcher"].stop)
+
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    app.router.add_post("/chat", handle_chat)
+    app.router.add_post("/chat/stream", handle_chat_stream)
+    app.router.add_get("/health", handle_health)
+    app.router.add_get("/metrics", handle_metrics)
+    app.router.add_get("/metrics/prometheus", handle_prometheus)
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serviço HTTP do chatbot de saúde pública")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--model", default="llama3.2", help="Modelo no Ollama")
+    parser.add_argument("--max-concurrency", type=int, default=4,
+                        help="Chamadas simultâneas ao modelo")
+    parser.add_argument("--max-queue", type=int, default=32,
+                        help="Requisições em espera antes de responder 503")
+    parser.add_argument("--watch-interval", type=float, default=5.0,
+                        help="Segundos entre verificações de nova versão dos dados (0 desliga)")
+    parser.add_argument("--fake-llm", action="store_true",
+                        help="Usa o FakeChatModel local em vez do Ollama (teste de carga)")
+    parser.add_argument("--fake-latency", type=float, default=0.5,
+                        help="Latência simulada por chamada do FakeChatModel, em segundos")
+    parser.add_argument("--fake-failure-rate", type=float, default=0.0,
+                        help="Fração de chamadas do FakeChatModel que falham")
+    parser.add_argument("--fake-stall-rate", type=float, default=0.0,
+                        help="Fração de chamadas do FakeChatModel que travam (servidor sobrecarregado)")
+    parser.add_argument("--llm-timeout", type=float, default=LLM_GUARD.call_timeout,
+                        help="Timeout de cada chamada ao modelo, em segundos")
+    parser.add_argument("--request-timeout", type=float, default=LLM_GUARD.request_timeout,
+                        help="Prazo total de cada resposta, em segundos")
+    parser.add_argument("--no-tool-pruning", action="store_true",
+                        help="Vincula sempre todas as ferramentas ao LLM (sem poda por pergunta)")
+    parser.add_argument("--selection-model", default=None,
+                        help="Modelo pequeno no Ollama para escolher a ferramenta (ex.: llama3.2:1b)")
+    parser.add_argument("--keep-alive", default=None,
+                        help="Quanto tempo o Ollama mantém o modelo carregado (ex.: 30m, -1 = sempre)")
+    parser.add_argument("--no-warmup", action="store_true",
+                        help="Não aquece o modelo na inicialização")
+    args = parser.parse_args()
+    LLM_GUARD.call_timeout = args.llm_timeout
+    LLM_GUARD.request_timeout = args.request_timeout
+
+    if args.fake_llm:
+        from agent import TOOL_REGISTRY
+        from fake_llm import FakeChatModel
+        from tool_selection import PrunedToolAgent
+        model = FakeChatModel(
+            latency=args.fake_latency,
+            failure_rate=args.fake_failure_rate,
+            stall_rate=args.fake_stall_rate,
+        )
+        tools = list(TOOL_REGISTRY.values())
+        agent = model.bind_tools(tools) if args.no_tool_pruning else PrunedToolAgent(model, tools)
+    else:
+        model = ModelConfig(args.model)
+        if args.keep_alive is not None:
+            model = model._replace(keep_alive=parse_keep_alive(args.keep_alive))
+        agent = build_agent(
+            model,
+            max_connections=args.max_concurrency,
+            prune_tools=not args.no_tool_pruning,
+            selection_model=model._replace(name=args.selection_model) if args.selection_model else None,
+        )
+
+    app = create_app(
+        agent,
+        max_concurrency=args.max_concurrency,
+        max_queue=args.max_queue,
+        watch_interval=args.watch_interval,
+        warmup=not args.no_warmup,
+    )
+    web.run_app(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+DataFrames publicados como arquivos `.npy` e abertos via memory-map, para
+que vários processos (workers do servidor, batch) compartilhem uma única
+cópia dos dados preparados.
+
+Cada coluna vira um ou mais arrays contíguos:
+
+- numéricas, booleanas e datas (numpy): o próprio array;
+- `category`: os códigos (`.npy`) e o dicionário de categorias;
+- inteiros/floats/booleanos anuláveis: valores e máscara de nulos;
+- textos não categorizados: codificados como categoria e convertidos de
+  volta ao abrir (estes são copiados em cada processo).
+
+`attach_frame` abre os arrays com `np.load(mmap_mode="r")` e monta o
+DataFrame sem cópia: as páginas ficam no page cache do sistema operacional
+e são compartilhadas por todos os processos que abrem o mesmo diretório.
+Os arrays são somente leitura: filtros, agregações e novas colunas
+funcionam normalmente, mas escrita in-place (`df.loc[i, col] = v`) levanta
+`ValueError`.
+"""
+import json
+import logging
+import os
+import shutil
+from pathlib import Path
+from typing import Any, Dict
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Incremente ao mudar o layout dos arquivos
+LAYOUT_VERSION = 1
+
+COLUMNS_FILE = "columns.json"
+
+_MASKED_ARRAYS = (pd.arrays.IntegerArray, pd.arrays.FloatingArray, pd.arrays.BooleanArray)
+
+
+def _save(directory: Path, key: str, values: np.ndarray) -> None:
+    np.save(directory / f"{key}.npy", np.ascontiguousarray(values), allow_pickle=False)
+
+
+def _load(directory: Path, key: str) -> np.ndarray:
+    # `view(np.ndarray)`: o pandas trata `np.memmap` como um array comum
+    return np.load(directory / f"{key}.npy", mmap_mode="r", allow_pickle=False).view(np.ndarray)
+
+
+def _is_text(values: Any) -> bool:
+    return pd.api.types.is_object_dtype(values) or pd.api.types.is_string_dtype(values)
+
+
+def _write_categories(directory: Path, key: str, categories: pd.Index, spec: Dict[str, Any]) -> None:
+    spec["categories_dtype"] = str(categories.dtype)
+    if _is_text(categories):
+        spec["categories"] = [str(value) for value in categories]
+    else:
+        _save(directory, f"{key}.categories", categories.to_numpy())
+
+
+def _read_categories(directory: Path, key: str, spec: Dict[str, Any]) -> pd.Index:
+    if "categories" in spec:
+        return pd.Index(spec["categories"], dtype=spec["categories_dtype"])
+    return pd.Index(np.load(directory / f"{key}.categories.npy", allow_pickle=False))
+
+
+def _write_column(directory: Path, key: str, name: str, series: pd.Series) -> Dict[str, Any]:
+    dtype = series.dtype
+    spec: Dict[str, Any] = {"name": name, "dtype": str(dtype)}
+    if isinstance(dtype, pd.CategoricalDtype):
+        spec.update(kind="category", ordered=bool(dtype.ordered))
+        _save(directory, f"{key}.codes", series.cat.codes.to_numpy())
+        _write_categories(directory, key, dtype.categories, spec)
+    elif isinstance(series.array, _MASKED_ARRAYS):
+        spec["kind"] = "masked"
+        numpy_dtype = dtype.numpy_dtype
+        _save(directory, f"{key}.values", series.to_numpy(dtype=numpy_dtype, na_value=numpy_dtype.type(0)))
+        _save(directory, f"{key}.mask", series.isna().to_numpy())
+    elif isinstance(dtype, np.dtype) and dtype.kind in "biufmM":
+        spec["kind"] = "numpy"
+        _save(directory, key, series.to_numpy())
+    elif _is_text(series):
+        spec["kind"] = "text"
+        codes, uniques = pd.factorize(series, use_na_sentinel=True)
+        _save(directory, f"{key}.codes", codes)
+        _write_categories(directory, key, pd.Index(uniques), spec)
+    else:
+        raise TypeError(f"Coluna '{name}' com dtype não suportado para compartilhamento: {dtype}")
+    return spec
+
+
+def _read_column(directory: Path, key: str, spec: Dict[str, Any]) -> Any:
+    kind = spec["kind"]
+    if kind == "numpy":
+        values = _load(directory, key)
+        return pd.array(values, copy=False) if values.dtype.kind in "mM" else values
+    if kind == "masked":
+        array_type = pd.api.types.pandas_dtype(spec["dtype"]).construct_array_type()
+        return array_type(_load(directory, f"{key}.values"), _load(directory, f"{key}.mask"), copy=False)
+    dtype = pd.CategoricalDtype(_read_categories(directory, key, spec), ordered=spec.get("ordered", False))
+    categorical = pd.Categorical.from_codes(_load(directory, f"{key}.codes"), dtype=dtype, validate=False)
+    if kind == "category":
+        return categorical
+    return pd.Series(categorical).astype(spec["dtype"]).array
+
+
+def publish_frame(df: pd.DataFrame, directory: Path) -> None:
+    """
+    Grava `df` (sem o índice) como arquivos `.npy` em `directory`.
+
+    A gravação acontece num diretório temporário que depois substitui o
+    anterior; processos que ainda mapeiam os arquivos antigos continuam
+    lendo-os até soltá-los.
+
+    Raises:
+        TypeError: Se algum nome de coluna não for texto ou algum dtype não
+            for suportado
+    """
+    directory = Path(directory)
+    tmp_dir = directory.with_name(f"{directory.name}.tmp-{os.getpid()}")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+    try:
+        columns = []
+        for i, (name, series) in enumerate(df.items()):
+            if not isinstance(name, str):
+                raise TypeError(f"Nome de coluna não textual: {name!r}")
+            columns.append(_write_column(tmp_dir, f"c{i}", name, series))
+        meta = {"layout_version": LAYOUT_VERSION, "rows": len(df), "columns": columns}
+        (tmp_dir / COLUMNS_FILE).write_text(json.dumps(meta, indent=2, ensure_ascii=False), encoding="utf-8")
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    old_dir = directory.with_name(f"{directory.name}.old-{os.getpid()}")
+    if directory.exists():
+        os.replace(directory, old_dir)
+    os.replace(tmp_dir, directory)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    logger.debug("DataFrame publicado em %s (%d linhas)", directory, len(df))
+
+
+def attach_frame(directory: Path) -> pd.DataFrame:
+    """
+    Abre o DataFrame publicado em `directory` via memory-map, sem copiar os
+    dados (exceto colunas de texto não categorizadas).
+
+    Raises:
+        FileNotFoundError: Se o diretório não tiver um frame publicado
+        ValueError: Se o layout for de outra versão
+    """
+    directory = Path(directory)
+    meta = json.loads((directory / COLUMNS_FILE).read_text(encoding="utf-8"))
+    if meta.get("layout_version") != LAYOUT_VERSION:
+        raise ValueError(f"Layout {meta.get('layout_version')} em {directory} (esperado {LAYOUT_VERSION})")
+    data = {
+        spec["name"]: pd.Series(_read_column(directory, f"c{i}", spec), name=spec["name"], copy=False)
+        for i, spec in enumerate(meta["columns"])
+    }
+    if not data:
+        return pd.DataFrame(index=pd.RangeIndex(meta["rows"]))
+    return pd.DataFrame(data, copy=False)
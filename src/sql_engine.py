@@ -0,0 +1,658 @@
+"""
+Camada SQL embarcada (SQLite) sobre as tabelas preparadas do projeto.
+
+O banco `data/cache/sus.sqlite` é gerado a partir do SUS preparado (do
+armazenamento particionado de `ingest.py`, se houver, ou de `load_sus`), do
+IDH, do IBGE (municípios do RS) e da poluição do ar, com índices em cidade,
+ano, mês, CID e data de internação. As linhas do SUS são gravadas em ordem
+de data de internação, então filtros por período leem páginas contíguas.
+O banco é refeito quando alguma fonte muda; quando só o armazenamento mudou
+(ingestão de um mês), apenas as partições novas ou alteradas são
+regravadas (`update_database`).
+
+Consultas chegam de duas formas, ambas somente leitura:
+
+- `spec`: especificação restrita (tabela, colunas, métricas, filtros,
+  agrupamento, ordenação), validada contra `SCHEMA` e compilada para SQL
+  parametrizado;
+- SQL livre: um único SELECT/WITH, executado numa conexão aberta em modo
+  somente leitura e com um autorizador que nega escrita, PRAGMA, ATTACH e
+  as tabelas internas do SQLite.
+
+Toda consulta tem limite de linhas e de tempo. Specs compiladas ficam em
+cache (e as sentenças preparadas no cache do `sqlite3`); resultados ficam
+num `ToolResultCache` indexado pela versão do banco.
+"""
+import json
+import logging
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import pandas as pd
+
+from loader import RAW_SOURCES, get_cache_dir, get_raw_dir, load_sus, load_table
+from municipios import UF_RS, fold_name
+from tool_cache import ToolResultCache
+
+logger = logging.getLogger(__name__)
+
+# Incremente ao mudar o esquema ou a carga para refazer o banco
+SQL_SCHEMA_VERSION = 1
+
+DB_NAME = "sus.sqlite"
+
+# Limites padrão por consulta
+DEFAULT_MAX_ROWS = 200
+DEFAULT_TIMEOUT = 5.0
+
+# Linhas por lote de inserção na carga do SUS
+INSERT_BATCH_ROWS = 200_000
+
+# Tabela -> coluna -> tipo SQLite
+SCHEMA: Dict[str, Dict[str, str]] = {
+    "sus": {
+        "cid": "TEXT",
+        "idade": "INTEGER",
+        "cidade": "TEXT",
+        "city_key": "TEXT",
+        "ano": "INTEGER",
+        "mes": "INTEGER",
+        "dt_inter": "TEXT",
+        "dt_saida": "TEXT",
+        "val_tot": "REAL",
+        "morte": "INTEGER",
+        "sexo": "INTEGER",
+        "respiratorio": "INTEGER",
+    },
+    "idh": {
+        "municipio": "TEXT",
+        "city_key": "TEXT",
+        "idhm": "REAL",
+        "idhm_renda": "REAL",
+        "idhm_educacao": "REAL",
+        "idhm_longevidade": "REAL",
+        "posicao_idhm": "INTEGER",
+    },
+    "ibge": {
+        "codigo_municipio": "INTEGER",
+        "municipio": "TEXT",
+        "city_key": "TEXT",
+        "regiao_imediata": "TEXT",
+        "regiao_intermediaria": "TEXT",
+    },
+    "poluicao": {
+        "data": "TEXT",
+        "ano": "INTEGER",
+        "mes": "INTEGER",
+        "pm10": "REAL",
+        "so2": "REAL",
+        "no2": "REAL",
+        "o3": "REAL",
+        "co": "REAL",
+    },
+}
+
+INDEXES = {
+    "sus": [("city_key", "ano"), ("ano", "mes"), ("cid",), ("dt_inter",)],
+    "idh": [("city_key",)],
+    "ibge": [("city_key",)],
+    "poluicao": [("ano", "mes"), ("data",)],
+}
+
+# Tabelas com a coluna `cidade`/`municipio` comparada pelo nome normalizado
+_CITY_COLUMNS = {"cidade", "municipio"}
+
+_AGGREGATES = {
+    "sum": "SUM({})",
+    "avg": "AVG({})",
+    "min": "MIN({})",
+    "max": "MAX({})",
+    "count_distinct": "COUNT(DISTINCT {})",
+    # Fração de linhas com a coluna verdadeira (ex.: `rate:morte`)
+    "rate": "AVG({})",
+}
+
+_OPERATORS = {"=", "!=", "<", "<=", ">", ">=", "in", "between", "like"}
+
+_ALLOWED_ACTIONS = {
+    sqlite3.SQLITE_SELECT,
+    sqlite3.SQLITE_READ,
+    sqlite3.SQLITE_FUNCTION,
+    sqlite3.SQLITE_RECURSIVE,
+}
+_DENIED_FUNCTIONS = {"load_extension", "randomblob", "zeroblob", "readfile", "writefile"}
+_RE_READ_ONLY = re.compile(r"^\s*(select|with)\b", re.IGNORECASE)
+
+
+class QueryError(ValueError):
+    """Spec ou SQL inválido, consulta negada ou limite de tempo excedido."""
+
+
+class QueryResult(NamedTuple):
+    """Resultado de uma consulta."""
+    columns: List[str]
+    rows: List[Tuple[Any, ...]]
+    truncated: bool
+    elapsed_ms: float
+
+    def as_records(self) -> Dict[str, Any]:
+        """Formato devolvido ao LLM: linhas como dicionários."""
+        return {
+            "columns": self.columns,
+            "rows": [dict(zip(self.columns, row)) for row in self.rows],
+            "truncated": self.truncated,
+        }
+
+
+# ---------------------------------------------------------------------------
+# Construção do banco
+# ---------------------------------------------------------------------------
+
+def get_db_path() -> Path:
+    return get_cache_dir() / DB_NAME
+
+
+# Chaves do estado das fontes que mudam a cada ingestão
+_STORE_STATE_KEYS = ("store_version", "store_parts")
+
+
+def _source_state() -> Dict[str, Any]:
+    """
+    Estado das fontes (tamanho e mtime dos CSVs, versão e arquivos de cada
+    partição do armazenamento).
+    """
+    # Import tardio: `ingest` depende da camada de agregados
+    from ingest import store_partitions, store_version
+
+    state: Dict[str, Any] = {
+        "schema_version": SQL_SCHEMA_VERSION,
+        "store_version": store_version(),
+        "store_parts": store_partitions(),
+    }
+    for name, (filename, _) in RAW_SOURCES.items():
+        path = get_raw_dir() / filename
+        if path.exists():
+            stat = path.stat()
+            state[name] = [stat.st_size, stat.st_mtime_ns]
+    return state
+
+
+def _sus_frames(partitions: Optional[Iterable[str]] = None) -> Iterator[pd.DataFrame]:
+    """
+    SUS preparado em blocos: partes do armazenamento (só de `partitions`, se
+    dado) ou `load_sus` fatiado.
+    """
+    from ingest import iter_store_frames, store_version
+
+    if store_version():
+        # Partições em ordem de ano/mês; cada uma ordenada por data
+        for part in iter_store_frames(partitions=partitions):
+            yield _sorted_by_date(part)
+        return
+    df = _sorted_by_date(load_sus())
+    for start in range(0, len(df), INSERT_BATCH_ROWS):
+        yield df.iloc[start:start + INSERT_BATCH_ROWS]
+
+
+def _sorted_by_date(df: pd.DataFrame) -> pd.DataFrame:
+    if "DT_INTER" not in df.columns:
+        return df
+    return df.iloc[df["DT_INTER"].argsort(kind="stable")]
+
+
+def _dates(series: pd.Series) -> pd.Series:
+    return pd.to_datetime(series, errors="coerce").dt.strftime("%Y-%m-%d")
+
+
+def _sus_rows(df: pd.DataFrame) -> pd.DataFrame:
+    """Converte o SUS preparado para as colunas de `SCHEMA["sus"]`."""
+    cities = df["CIDADE_RESIDENCIA_PACIENTE"].astype("string")
+    folded = {name: fold_name(name) for name in cities.dropna().unique()}
+    dt_inter = pd.to_datetime(df["DT_INTER"], errors="coerce") if "DT_INTER" in df.columns else None
+    return pd.DataFrame({
+        "cid": df["DIAG_PRINC"].astype("string"),
+        "idade": df["IDADE"],
+        "cidade": cities,
+        "city_key": cities.map(folded),
+        "ano": df["ano"],
+        "mes": dt_inter.dt.month if dt_inter is not None else None,
+        "dt_inter": dt_inter.dt.strftime("%Y-%m-%d") if dt_inter is not None else None,
+        "dt_saida": _dates(df["DT_SAIDA"]) if "DT_SAIDA" in df.columns else None,
+        "val_tot": df["VAL_TOT"].astype("float64").round(2),
+        "morte": df["MORTE"].astype("Int64"),
+        "sexo": df["SEXO"] if "SEXO" in df.columns else None,
+        "respiratorio": df["RESPIRATORIO"].astype("int64"),
+    })
+
+
+def _idh_rows() -> pd.DataFrame:
+    idh = load_table("idh")
+    names = idh["Territorialidade"].astype(str).str.replace(r"\s*\([A-Za-z]{2}\)\s*$", "", regex=True)
+    return pd.DataFrame({
+        "municipio": names,
+        "city_key": names.map(fold_name),
+        "idhm": idh["IDHM"],
+        "idhm_renda": idh["IDHM Renda"],
+        "idhm_educacao": idh["IDHM Educação"],
+        "idhm_longevidade": idh["IDHM Longevidade"],
+        "posicao_idhm": idh["Posição IDHM"],
+    })
+
+
+def _ibge_rows() -> pd.DataFrame:
+    ibge = load_table("ibge")
+    rs = ibge[ibge["UF"] == UF_RS].drop_duplicates("Codigo Municipio Completo")
+    return pd.DataFrame({
+        "codigo_municipio": rs["Codigo Municipio Completo"],
+        "municipio": rs["Nome_Municipio"],
+        "city_key": rs["Nome_Municipio"].map(fold_name),
+        "regiao_imediata": rs["Nome Região Geográfica Imediata"],
+        "regiao_intermediaria": rs["Nome Região Geográfica Intermediária"],
+    })
+
+
+def _poluicao_rows() -> pd.DataFrame:
+    pol = load_table("pol").rename(columns=lambda col: str(col).strip())
+    when = pd.to_datetime(pol["data"], errors="coerce")
+    return pd.DataFrame({
+        "data": when.dt.strftime("%Y-%m-%d %H:%M:%S"),
+        "ano": when.dt.year,
+        "mes": when.dt.month,
+        **{col: pd.to_numeric(pol[col], errors="coerce") for col in ("pm10", "so2", "no2", "o3", "co")},
+    })
+
+
+def _insert(conn: sqlite3.Connection, table: str, frame: pd.DataFrame) -> int:
+    columns = list(SCHEMA[table])
+    frame = frame.reindex(columns=columns).astype(object)
+    frame = frame.where(frame.notna(), None)
+    placeholders = ", ".join("?" for _ in columns)
+    conn.executemany(
+        f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})",
+        frame.itertuples(index=False, name=None),
+    )
+    return len(frame)
+
+
+def build_database(path: Optional[Path] = None) -> Path:
+    """
+    Gera o banco SQLite com as tabelas de `SCHEMA` e seus índices.
+
+    A gravação é feita num arquivo temporário que substitui o anterior;
+    conexões abertas no banco antigo continuam válidas. Tabelas cujo CSV não
+    existe ficam vazias.
+    """
+    path = path or get_db_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.tmp-{os.getpid()}")
+    tmp_path.unlink(missing_ok=True)
+    started = time.perf_counter()
+
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        for table, columns in SCHEMA.items():
+            body = ", ".join(f"{name} {kind}" for name, kind in columns.items())
+            conn.execute(f"CREATE TABLE {table} ({body})")
+
+        rows = sum(_insert(conn, "sus", _sus_rows(frame)) for frame in _sus_frames())
+        for table, loader in (("idh", _idh_rows), ("ibge", _ibge_rows), ("poluicao", _poluicao_rows)):
+            try:
+                _insert(conn, table, loader())
+            except (FileNotFoundError, KeyError) as exc:
+                logger.warning("Tabela SQL '%s' vazia: fonte indisponível (%s)", table, exc)
+
+        for table, indexes in INDEXES.items():
+            for columns in indexes:
+                conn.execute(
+                    f"CREATE INDEX idx_{table}_{'_'.join(columns)} ON {table} ({', '.join(columns)})"
+                )
+        conn.execute("ANALYZE")
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp_path, path)
+    logger.info("Banco SQL gerado em %.1fs: %d internações em %s", time.perf_counter() - started, rows, path)
+    return path
+
+
+def update_database(path: Path, previous: Dict[str, List[str]], current: Dict[str, List[str]]) -> Path:
+    """
+    Aplica ao banco a diferença entre duas versões do armazenamento: as
+    linhas das partições alteradas ou removidas saem e as das partições
+    novas ou alteradas entram; as demais não são lidas.
+
+    Como em `build_database`, a alteração é feita numa cópia que substitui
+    o banco ao final.
+
+    Args:
+        path: Banco gerado a partir do armazenamento
+        previous: Arquivos por partição na geração do banco (`store_partitions`)
+        current: Arquivos por partição da versão atual
+    """
+    changed = sorted(p for p in set(previous) | set(current) if previous.get(p) != current.get(p))
+    tmp_path = path.with_name(f"{path.name}.tmp-{os.getpid()}")
+    shutil.copyfile(path, tmp_path)
+    started = time.perf_counter()
+
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        deleted = 0
+        for partition in changed:
+            if partition not in previous:
+                continue
+            # Mesma chave de `ingest.partition_codes`: 0 quando o ano ou o mês falta
+            year, month = (int(value) or None for value in partition.split("-"))
+            deleted += conn.execute("DELETE FROM sus WHERE ano IS ? AND mes IS ?", (year, month)).rowcount
+        added = [p for p in changed if p in current]
+        rows = sum(_insert(conn, "sus", _sus_rows(frame)) for frame in _sus_frames(added)) if added else 0
+        conn.execute("ANALYZE")
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp_path, path)
+    logger.info(
+        "Banco SQL atualizado em %.1fs: %d partições, -%d/+%d internações",
+        time.perf_counter() - started, len(changed), deleted, rows,
+    )
+    return path
+
+
+# ---------------------------------------------------------------------------
+# Compilação de specs
+# ---------------------------------------------------------------------------
+
+def _column(table: str, name: Any) -> str:
+    if not isinstance(name, str) or name not in SCHEMA[table]:
+        raise QueryError(f"Coluna desconhecida em '{table}': {name!r}. Disponíveis: {sorted(SCHEMA[table])}")
+    return name
+
+
+def _metric(table: str, item: str) -> Tuple[str, str]:
+    """`count` ou `<agregação>:<coluna>` → (expressão SQL, alias)."""
+    if item == "count":
+        return "COUNT(*)", "count"
+    agg, _, column = item.partition(":")
+    if agg not in _AGGREGATES or not column:
+        raise QueryError(f"Métrica inválida: {item!r} (use 'count' ou <{'|'.join(_AGGREGATES)}>:<coluna>)")
+    return _AGGREGATES[agg].format(_column(table, column)), f"{agg}_{column}"
+
+
+def _condition(table: str, column: str, value: Any, params: List[Any]) -> str:
+    _column(table, column)
+    if isinstance(value, dict):
+        if len(value) != 1:
+            raise QueryError(f"Filtro de '{column}' deve ter um único operador: {value!r}")
+        op, operand = next(iter(value.items()))
+    else:
+        op, operand = "=", value
+    if op not in _OPERATORS:
+        raise QueryError(f"Operador inválido: {op!r} (use {sorted(_OPERATORS)})")
+
+    # Cidades são comparadas pelo nome normalizado (sem acento e caixa)
+    if column in _CITY_COLUMNS and op in ("=", "!=", "in"):
+        column = "city_key"
+        operand = [fold_name(v) for v in operand] if isinstance(operand, list) else fold_name(operand)
+
+    if op == "in":
+        if not isinstance(operand, list) or not operand:
+            raise QueryError(f"'in' de '{column}' exige uma lista não vazia")
+        params.extend(operand)
+        return f"{column} IN ({', '.join('?' for _ in operand)})"
+    if op == "between":
+        if not isinstance(operand, list) or len(operand) != 2:
+            raise QueryError(f"'between' de '{column}' exige [início, fim]")
+        params.extend(operand)
+        return f"{column} BETWEEN ? AND ?"
+    if isinstance(operand, (list, dict)):
+        raise QueryError(f"Valor inválido para '{column} {op}': {operand!r}")
+    params.append(operand)
+    return f"{column} {op.upper()} ?"
+
+
+@lru_cache(maxsize=512)
+def _compile_canonical(canonical: str) -> Tuple[str, Tuple[Any, ...]]:
+    spec = json.loads(canonical)
+    table = spec.get("table", "sus")
+    if table not in SCHEMA:
+        raise QueryError(f"Tabela desconhecida: {table!r}. Disponíveis: {sorted(SCHEMA)}")
+    unknown = set(spec) - {"table", "select", "where", "group_by", "order_by", "limit"}
+    if unknown:
+        raise QueryError(f"Campos desconhecidos na spec: {sorted(unknown)}")
+
+    group_by = [_column(table, c) for c in spec.get("group_by") or []]
+    select: List[str] = []
+    aliases: List[str] = []
+    plain: List[str] = []
+    for item in spec.get("select") or (group_by + ["count"]):
+        if isinstance(item, str) and item in SCHEMA[table]:
+            select.append(item)
+            aliases.append(item)
+            plain.append(item)
+        else:
+            expr, alias = _metric(table, str(item))
+            select.append(f"{expr} AS {alias}")
+            aliases.append(alias)
+    # Colunas simples junto de métricas só fazem sentido agrupadas
+    if (group_by or len(plain) < len(select)) and set(plain) - set(group_by):
+        raise QueryError(f"Colunas {sorted(set(plain) - set(group_by))} precisam estar em group_by")
+
+    params: List[Any] = []
+    where = spec.get("where") or {}
+    if not isinstance(where, dict):
+        raise QueryError("'where' deve ser um objeto {coluna: valor ou {operador: valor}}")
+    conditions = [_condition(table, column, value, params) for column, value in where.items()]
+
+    sql = f"SELECT {', '.join(select)} FROM {table}"
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    if group_by:
+        sql += " GROUP BY " + ", ".join(group_by)
+
+    order = []
+    for item in spec.get("order_by") or []:
+        name = str(item).lstrip("-")
+        if name not in aliases:
+            raise QueryError(f"order_by deve usar uma coluna ou métrica selecionada: {item!r}")
+        order.append(f"{name} {'DESC' if str(item).startswith('-') else 'ASC'}")
+    if order:
+        sql += " ORDER BY " + ", ".join(order)
+
+    limit = spec.get("limit")
+    if limit is not None:
+        if not isinstance(limit, int) or limit < 1:
+            raise QueryError("'limit' deve ser um inteiro >= 1")
+        sql += f" LIMIT {limit}"
+    return sql, tuple(params)
+
+
+def compile_spec(spec: Dict[str, Any]) -> Tuple[str, Tuple[Any, ...]]:
+    """
+    Compila uma spec validada para (SQL, parâmetros).
+
+    Exemplo:
+        {"table": "sus", "select": ["ano", "count", "rate:morte"],
+         "where": {"cidade": "Porto Alegre", "ano": {"between": [2019, 2021]}},
+         "group_by": ["ano"], "order_by": ["ano"]}
+
+    Raises:
+        QueryError: Se a spec referenciar tabelas, colunas ou operadores
+            desconhecidos
+    """
+    if not isinstance(spec, dict):
+        raise QueryError("A spec deve ser um objeto JSON")
+    return _compile_canonical(json.dumps(spec, sort_keys=True, ensure_ascii=False))
+
+
+# ---------------------------------------------------------------------------
+# Execução
+# ---------------------------------------------------------------------------
+
+def _authorizer(action: int, arg1: Optional[str], arg2: Optional[str], *_: Any) -> int:
+    """
+    Permite só SELECT, leitura de tabelas/CTEs e funções inofensivas.
+
+    O banco só contém as tabelas de `SCHEMA`; as internas (`sqlite_*`) são
+    negadas. Nomes de CTEs também chegam como leitura e são permitidos.
+    """
+    if action not in _ALLOWED_ACTIONS:
+        return sqlite3.SQLITE_DENY
+    if action == sqlite3.SQLITE_READ and (arg1 or "").lower().startswith("sqlite_"):
+        return sqlite3.SQLITE_DENY
+    if action == sqlite3.SQLITE_FUNCTION and (arg2 or "").lower() in _DENIED_FUNCTIONS:
+        return sqlite3.SQLITE_DENY
+    return sqlite3.SQLITE_OK
+
+
+def validate_sql(sql: str) -> str:
+    """
+    Aceita um único comando SELECT/WITH (sem `;` intermediário).
+
+    Raises:
+        QueryError: Se o SQL não for uma única consulta de leitura
+    """
+    text = str(sql).strip().rstrip(";").strip()
+    if not _RE_READ_ONLY.match(text):
+        raise QueryError("Apenas consultas SELECT/WITH são permitidas")
+    if ";" in text:
+        raise QueryError("Apenas um comando por consulta")
+    return text
+
+
+class SqlEngine:
+    """
+    Executor de consultas somente leitura sobre o banco de `build_database`.
+
+    Cada thread usa sua própria conexão (modo `ro`, autorizador e cache de
+    sentenças preparadas).
+
+    Args:
+        path: Caminho do banco SQLite
+        build_id: Identificador da geração do banco (invalida o cache de
+            resultados)
+        max_rows: Máximo de linhas devolvidas por consulta
+        timeout: Tempo máximo por consulta, em segundos
+        cache_size: Resultados mantidos em cache
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        build_id: str,
+        max_rows: int = DEFAULT_MAX_ROWS,
+        timeout: float = DEFAULT_TIMEOUT,
+        cache_size: int = 256,
+    ) -> None:
+        self.path = path
+        self.build_id = build_id
+        self.max_rows = max_rows
+        self.timeout = timeout
+        self.cache = ToolResultCache(maxsize=cache_size)
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                f"{self.path.resolve().as_uri()}?mode=ro",
+                uri=True,
+                check_same_thread=False,
+                cached_statements=256,
+            )
+            conn.execute("PRAGMA query_only = ON")
+            conn.set_authorizer(_authorizer)
+            self._local.conn = conn
+        return conn
+
+    def _execute(self, sql: str, params: Tuple[Any, ...], max_rows: int, timeout: float) -> QueryResult:
+        conn = self._connection()
+        started = time.perf_counter()
+        deadline = started + timeout
+        # Interrompe a consulta (OperationalError "interrupted") após o prazo
+        conn.set_progress_handler(lambda: int(time.perf_counter() > deadline), 10_000)
+        try:
+            cursor = conn.execute(sql, params)
+            rows = cursor.fetchmany(max_rows + 1)
+        except sqlite3.DatabaseError as exc:
+            if time.perf_counter() > deadline:
+                raise QueryError(f"Consulta excedeu o limite de {timeout:g}s") from exc
+            raise QueryError(f"Erro no SQL: {exc}") from exc
+        finally:
+            conn.set_progress_handler(None, 0)
+        columns = [d[0] for d in cursor.description or []]
+        return QueryResult(
+            columns=columns,
+            rows=rows[:max_rows],
+            truncated=len(rows) > max_rows,
+            elapsed_ms=(time.perf_counter() - started) * 1000,
+        )
+
+    def query(
+        self,
+        sql: str,
+        params: Tuple[Any, ...] = (),
+        max_rows: Optional[int] = None,
+        timeout: Optional[float] = None,
+    ) -> QueryResult:
+        """
+        Executa uma consulta somente leitura (com cache de resultados).
+
+        Raises:
+            QueryError: SQL inválido, acesso negado ou tempo excedido
+        """
+        text = validate_sql(sql)
+        max_rows = min(max_rows or self.max_rows, self.max_rows)
+        timeout = timeout or self.timeout
+        return self.cache.get_or_compute(
+            "sql",
+            {"sql": text, "params": json.dumps(list(params), default=str), "max_rows": max_rows},
+            self.build_id,
+            lambda: self._execute(text, tuple(params), max_rows, timeout),
+        )
+
+    def run_spec(self, spec: Dict[str, Any], max_rows: Optional[int] = None) -> QueryResult:
+        """Compila e executa uma spec (ver `compile_spec`)."""
+        sql, params = compile_spec(spec)
+        return self.query(sql, params, max_rows=max_rows)
+
+
+def _store_only_change(previous: Optional[Dict[str, Any]], state: Dict[str, Any]) -> bool:
+    """Se, desde a geração do banco a partir do armazenamento, só o armazenamento mudou."""
+    if previous is None or previous == state or "store_parts" not in previous:
+        return False
+    if not (previous.get("store_version") and state["store_version"]):
+        return False
+    return all(previous.get(key) == value for key, value in state.items() if key not in _STORE_STATE_KEYS)
+
+
+def load_engine(use_cache: bool = True) -> SqlEngine:
+    """
+    Abre o banco SQL, refazendo-o se alguma fonte mudou desde a geração.
+    Se só o armazenamento mudou, o banco é atualizado partição a partição
+    (`update_database`).
+    """
+    path = get_db_path()
+    meta_path = path.with_name(path.name + ".meta.json")
+    state = _source_state()
+    try:
+        current = json.loads(meta_path.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError):
+        current = None
+    if use_cache and path.exists() and _store_only_change(current, state):
+        update_database(path, current["store_parts"], state["store_parts"])
+        meta_path.write_text(json.dumps(state, indent=2), encoding="utf-8")
+    elif not use_cache or current != state or not path.exists():
+        build_database(path)
+        meta_path.write_text(json.dumps(state, indent=2), encoding="utf-8")
+    build_id = f"{path.stat().st_mtime_ns}"
+    return SqlEngine(path, build_id)
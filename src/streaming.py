@@ -0,0 +1,119 @@
+"""
+Streaming de tokens da resposta final do LLM.
+
+Entrega cada pedaço gerado a um callback (terminal, resposta HTTP) assim que
+chega e mede o tempo até o primeiro token (TTFT) e a taxa de tokens/s.
+"""
+import inspect
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+
+from langchain_core.messages import AIMessage, message_chunk_to_message
+
+logger = logging.getLogger(__name__)
+
+TokenCallback = Callable[[str], Union[None, Awaitable[None]]]
+
+
+class StreamStats:
+    """Métricas de uma resposta transmitida em streaming."""
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.first_token_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.chunks = 0
+        self.output_tokens: Optional[int] = None
+
+    def on_chunk(self, text: str) -> None:
+        if text and self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+        self.chunks += 1
+
+    def finish(self, usage: Optional[Dict[str, Any]] = None) -> None:
+        self.finished_at = time.perf_counter()
+        if usage and usage.get("output_tokens"):
+            self.output_tokens = int(usage["output_tokens"])
+
+    @property
+    def ttft(self) -> Optional[float]:
+        """Segundos até o primeiro token não vazio."""
+        return None if self.first_token_at is None else self.first_token_at - self.started
+
+    @property
+    def tokens(self) -> int:
+        """Tokens gerados (do modelo, se informado; senão, pedaços recebidos)."""
+        return self.output_tokens if self.output_tokens is not None else self.chunks
+
+    @property
+    def tokens_per_sec(self) -> Optional[float]:
+        """Taxa de geração após o primeiro token."""
+        if self.first_token_at is None or self.finished_at is None:
+            return None
+        elapsed = self.finished_at - self.first_token_at
+        return self.tokens / elapsed if elapsed > 0 else None
+
+    def as_dict(self) -> Dict[str, Any]:
+        total = None if self.finished_at is None else self.finished_at - self.started
+        return {
+            "ttft_s": self.ttft,
+            "total_s": total,
+            "tokens": self.tokens,
+            "tokens_per_sec": self.tokens_per_sec,
+        }
+
+
+def _finalize(chunks: List[Any], stats: StreamStats) -> AIMessage:
+    if not chunks:
+        stats.finish()
+        return AIMessage(content="")
+    merged = chunks[0]
+    for chunk in chunks[1:]:
+        merged = merged + chunk
+    stats.finish(getattr(merged, "usage_metadata", None))
+    message = message_chunk_to_message(merged)
+    message.response_metadata = {**message.response_metadata, "stream_stats": stats.as_dict()}
+    logger.info("Streaming: %s", stats.as_dict())
+    return message
+
+
+def stream_final(agent: Any, messages: List[Any], on_token: TokenCallback) -> Tuple[AIMessage, StreamStats]:
+    """
+    Gera a resposta com `agent.stream`, chamando `on_token` a cada pedaço.
+
+    Returns:
+        Tuple (mensagem completa, métricas); as métricas também ficam em
+        `message.response_metadata["stream_stats"]`.
+    """
+    stats = StreamStats()
+    chunks = []
+    for chunk in agent.stream(messages):
+        text = chunk.content if isinstance(chunk.content, str) else ""
+        stats.on_chunk(text)
+        if text:
+            on_token(text)
+        chunks.append(chunk)
+    return _finalize(chunks, stats), stats
+
+
+async def astream_final(
+    agent: Any,
+    messages: List[Any],
+    on_token: TokenCallback,
+) -> Tuple[AIMessage, StreamStats]:
+    """
+    Versão assíncrona de `stream_final` (`agent.astream`); `on_token` pode
+    ser uma função comum ou uma corrotina.
+    """
+    stats = StreamStats()
+    chunks = []
+    async for chunk in agent.astream(messages):
+        text = chunk.content if isinstance(chunk.content, str) else ""
+        stats.on_chunk(text)
+        if text:
+            result = on_token(text)
+            if inspect.isawaitable(result):
+                await result
+        chunks.append(chunk)
+    return _finalize(chunks, stats), stats
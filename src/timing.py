@@ -0,0 +1,48 @@
+"""
+Medição simples de fases da inicialização (cold start) da CLI.
+"""
+import sys
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, TextIO, Tuple
+
+
+class PhaseTimer:
+    """
+    Registra a duração de fases nomeadas desde a criação do timer.
+
+    Exemplo:
+        timer = PhaseTimer()
+        with timer.phase("build_agent"):
+            agent = build_agent()
+        timer.report()
+    """
+
+    def __init__(self, start: Optional[float] = None) -> None:
+        self.start = start if start is not None else time.perf_counter()
+        self.phases: List[Tuple[str, float]] = []
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Mede o bloco `with` como a fase `name`."""
+        began = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - began))
+
+    def record(self, name: str, seconds: float) -> None:
+        """Registra uma fase medida externamente."""
+        self.phases.append((name, seconds))
+
+    def as_dict(self) -> Dict[str, float]:
+        """Retorna fase -> segundos, mais o total decorrido."""
+        result = dict(self.phases)
+        result["total"] = time.perf_counter() - self.start
+        return result
+
+    def report(self, stream: TextIO = sys.stderr) -> None:
+        """Imprime as fases e o total em `stream`."""
+        print("[timings] fases de inicialização:", file=stream)
+        for name, seconds in self.as_dict().items():
+            print(f"[timings]   {name:<20} {seconds * 1000:9.1f} ms", file=stream)
@@ -0,0 +1,154 @@
+"""
+Cache de resultados de ferramentas (memoização) para `dispatch_tool_calls`.
+
+As ferramentas registradas são funções puras do dataset carregado, então o
+resultado pode ser reaproveitado para os mesmos argumentos. A chave combina
+nome da ferramenta, argumentos canonicalizados e a versão do dataset:
+quando o dataset muda, as entradas antigas deixam de ser encontradas e saem
+pelo LRU, sem limpar o cache inteiro (nem afetar quem ainda usa a versão
+anterior).
+"""
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def canonicalize_args(args: Any) -> str:
+    """
+    Serializa os argumentos de forma estável: chaves ordenadas, textos sem
+    espaços nas pontas e strings numéricas como inteiros ("5" == 5).
+    """
+    def norm(value: Any) -> Any:
+        if isinstance(value, dict):
+            return {str(k): norm(v) for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [norm(v) for v in value]
+        if isinstance(value, str):
+            text = value.strip()
+            return int(text) if text.isdigit() else text
+        return value
+
+    return json.dumps(norm(args or {}), sort_keys=True, ensure_ascii=False, default=str)
+
+
+class _Entry(NamedTuple):
+    value: Any
+    expires_at: Optional[float]
+
+
+class ToolResultCache:
+    """
+    Cache LRU com TTL opcional, contadores de acerto e coalescência de
+    chamadas idênticas concorrentes (single-flight).
+
+    Args:
+        maxsize: Número máximo de resultados mantidos
+        ttl: Tempo de vida em segundos (None = sem expiração)
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: Optional[float] = None) -> None:
+        if maxsize < 1:
+            raise ValueError("maxsize deve ser >= 1.")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._inflight: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def make_key(name: str, args: Any, version: Any) -> Tuple[str, str, Any]:
+        """Chave do cache para a ferramenta `name` com `args`."""
+        return name, canonicalize_args(args), version
+
+    def clear(self) -> None:
+        """Remove todos os resultados (chamadas em andamento não são afetadas)."""
+        with self._lock:
+            self._entries.clear()
+
+    def get_or_compute(
+        self,
+        name: str,
+        args: Any,
+        version: Any,
+        compute: Callable[[], Any],
+    ) -> Any:
+        """
+        Retorna o resultado em cache ou executa `compute`.
+
+        Se outra thread já está calculando a mesma chave, espera por ela em
+        vez de executar de novo.
+
+        Args:
+            name: Nome da ferramenta
+            args: Argumentos da chamada
+            version: Versão do dataset usado pela ferramenta
+            compute: Função que produz o resultado em caso de falta
+
+        Returns:
+            O resultado (em cache ou recém-calculado)
+        """
+        key = self.make_key(name, args, version)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry.expires_at is None or entry.expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry.value
+                del self._entries[key]
+
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            value = compute()
+        except BaseException as exc:
+            with self._lock:
+                self._inflight.pop(key, None)
+            future.set_exception(exc)
+            raise
+
+        with self._lock:
+            expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+            self._entries[key] = _Entry(value, expires_at)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            self._inflight.pop(key, None)
+        future.set_result(value)
+        return value
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores do cache e taxa de acerto."""
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,230 @@
+"""
+Poda dinâmica das ferramentas vinculadas ao LLM, por requisição.
+
+Cada ferramenta vinculada entra no prompt de todas as chamadas ao LLM como
+schema JSON (nome, docstring e parâmetros). Em vez de vincular a registry
+inteira, `ToolSelector` ordena as ferramentas pela similaridade entre a
+pergunta e as docstrings/exemplos (o mesmo classificador de centróides do
+`router`) e escolhe só as mais relevantes:
+
+- no máximo `top_k` ferramentas;
+- só as com similaridade de pelo menos `ratio` × a da melhor;
+- o conjunto completo quando nem a melhor passa de `min_score` (pergunta
+  fora do domínio das ferramentas);
+- mais as ferramentas genéricas (`GENERIC_TOOLS`) quando nenhuma das de
+  formato fixo escolhidas cobre a pergunta inteira (`router.covers`): um
+  filtro, outra métrica ou uma direção ("menor número") que elas não têm.
+
+`PrunedToolAgent` guarda o modelo sem ferramentas e um vínculo por
+subconjunto escolhido; fora de `for_prompt` ele se comporta como o agente
+com todas as ferramentas.
+
+O custo de cada schema é estimado com `memory.estimate_tokens`; a economia
+de latência usa a taxa de processamento do prompt informada pelo modelo
+(`prompt_eval_count`/`prompt_eval_duration` do Ollama).
+"""
+import argparse
+import json
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from memory import estimate_tokens
+from router import EXAMPLES, LLM_ONLY_TOOLS, CentroidClassifier, covers
+
+logger = logging.getLogger(__name__)
+
+# Máximo de ferramentas vinculadas por requisição
+DEFAULT_TOP_K = 3
+
+# Similaridade mínima, relativa à da melhor ferramenta, para entrar no corte
+DEFAULT_RATIO = 0.75
+
+# Abaixo desta similaridade da melhor ferramenta, vincula todas
+DEFAULT_MIN_SCORE = 0.15
+
+# Ferramentas com filtros e métricas livres, vinculadas sempre que a
+# pergunta pede algo que as de formato fixo não respondem
+GENERIC_TOOLS = LLM_ONLY_TOOLS
+
+
+def schema_tokens(tool: Any) -> int:
+    """Tokens estimados do schema JSON de `tool`, como enviado ao LLM."""
+    return estimate_tokens(json.dumps(convert_to_openai_tool(tool), ensure_ascii=False))
+
+
+def prefill_seconds_per_token(message: Any) -> Optional[float]:
+    """
+    Segundos por token de prompt da chamada que gerou `message`, pelos
+    campos `prompt_eval_count` e `prompt_eval_duration` (ns) do Ollama; None
+    se o modelo não os informar.
+    """
+    metadata = getattr(message, "response_metadata", None) or {}
+    count = metadata.get("prompt_eval_count")
+    duration = metadata.get("prompt_eval_duration")
+    if not count or not duration:
+        return None
+    return duration / 1e9 / count
+
+
+class ToolSelection(NamedTuple):
+    """
+    Ferramentas escolhidas para uma pergunta.
+
+    Attributes:
+        tools: Nomes das ferramentas vinculadas, na ordem da registry
+        pruned: False quando o conjunto completo foi usado (fallback)
+        score: Similaridade da melhor ferramenta
+        schema_tokens: Tokens estimados dos schemas vinculados
+        saved_tokens: Tokens de schema poupados por chamada ao LLM
+    """
+    tools: Tuple[str, ...]
+    pruned: bool
+    score: float
+    schema_tokens: int
+    saved_tokens: int
+
+
+class ToolSelector:
+    """
+    Escolhe as ferramentas relevantes para cada pergunta.
+
+    Args:
+        tools: Ferramentas LangChain (usa `.name` e `.description`)
+        top_k: Máximo de ferramentas escolhidas
+        ratio: Similaridade mínima relativa à da melhor ferramenta
+        min_score: Similaridade mínima da melhor; abaixo dela, todas
+        examples: Exemplos de perguntas por ferramenta (padrão: os do `router`)
+    """
+
+    def __init__(
+        self,
+        tools: Iterable[Any],
+        top_k: int = DEFAULT_TOP_K,
+        ratio: float = DEFAULT_RATIO,
+        min_score: float = DEFAULT_MIN_SCORE,
+        examples: Optional[Dict[str, List[str]]] = None,
+    ) -> None:
+        if top_k < 1:
+            raise ValueError("top_k deve ser >= 1.")
+        examples = EXAMPLES if examples is None else examples
+        tools = list(tools)
+        self.tool_names = [t.name for t in tools]
+        self.top_k = top_k
+        self.ratio = ratio
+        self.min_score = min_score
+        self.tokens = {t.name: schema_tokens(t) for t in tools}
+        self.full_tokens = sum(self.tokens.values())
+        self.classifier = CentroidClassifier().fit({
+            t.name: [t.description or t.name] + examples.get(t.name, [])
+            for t in tools
+        })
+
+    def full(self, score: float = 0.0) -> ToolSelection:
+        """Seleção com todas as ferramentas (sem poda)."""
+        return ToolSelection(tuple(self.tool_names), False, score, self.full_tokens, 0)
+
+    def select(self, prompt: str) -> ToolSelection:
+        """Ferramentas para `prompt`, ou o conjunto completo como fallback."""
+        ranked = self.classifier.predict(prompt)
+        best = ranked[0][1] if ranked else 0.0
+        if best < self.min_score:
+            return self.full(best)
+        chosen = {name for name, score in ranked[:self.top_k] if score >= best * self.ratio}
+        if not any(covers(name, prompt) for name in chosen):
+            chosen |= GENERIC_TOOLS
+        names = tuple(n for n in self.tool_names if n in chosen)
+        tokens = sum(self.tokens[n] for n in names)
+        return ToolSelection(names, len(names) < len(self.tool_names), best, tokens, self.full_tokens - tokens)
+
+
+class PrunedToolAgent:
+    """
+    Agente que vincula ao modelo só as ferramentas escolhidas por
+    `ToolSelector` para cada pergunta.
+
+    Os vínculos ficam em cache por subconjunto. Os demais atributos (e
+    `invoke`, `stream`, ...) são os do vínculo com todas as ferramentas, então
+    o agente pode ser usado onde se espera o resultado de `bind_tools`.
+    """
+
+    def __init__(self, model: Any, tools: Iterable[Any], selector: Optional[ToolSelector] = None) -> None:
+        self.model = model
+        self.tools = {t.name: t for t in tools}
+        self.selector = selector or ToolSelector(self.tools.values())
+        self._bindings: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+        self.full = self.bind(tuple(self.tools))
+
+    def bind(self, names: Tuple[str, ...]) -> Any:
+        """Modelo com as ferramentas `names` vinculadas (em cache)."""
+        with self._lock:
+            bound = self._bindings.get(names)
+            if bound is None:
+                bound = self.model.bind_tools([self.tools[n] for n in names])
+                self._bindings[names] = bound
+            return bound
+
+    def for_prompt(self, prompt: str) -> Tuple[Any, ToolSelection]:
+        """Vínculo com as ferramentas relevantes para `prompt` e a seleção feita."""
+        selection = self.selector.select(prompt)
+        logger.debug("Ferramentas para %r: %s", prompt, selection)
+        return self.bind(selection.tools), selection
+
+    def __getattr__(self, name: str) -> Any:
+        # Só chamado para atributos ausentes; `full` ausente é agente incompleto
+        if name == "full" or name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.full, name)
+
+
+def evaluate(selector: ToolSelector, cases: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Avalia a poda: recall (as ferramentas esperadas, `bind` ou `tool`,
+    estão entre as vinculadas), fração de perguntas podadas e tokens de
+    schema poupados por chamada.
+    """
+    expected = hits = pruned = saved = 0
+    misses = []
+    for case in cases:
+        selection = selector.select(case["prompt"])
+        pruned += selection.pruned
+        saved += selection.saved_tokens
+        wanted = case.get("bind") or ([case["tool"]] if case.get("tool") else [])
+        if not wanted:
+            continue
+        expected += 1
+        if set(wanted) <= set(selection.tools):
+            hits += 1
+        else:
+            misses.append({"prompt": case["prompt"], "expected": wanted, "got": list(selection.tools)})
+    return {
+        "cases": len(cases),
+        "recall": hits / expected if expected else 0.0,
+        "pruned_rate": pruned / len(cases) if cases else 0.0,
+        "full_schema_tokens": selector.full_tokens,
+        "mean_saved_tokens": saved / len(cases) if cases else 0.0,
+        "misses": misses,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Avaliação offline da poda de ferramentas")
+    parser.add_argument("--eval-set", type=Path, help="JSONL de avaliação (padrão: data/eval/router_eval.jsonl)")
+    parser.add_argument("--top-k", type=int, default=DEFAULT_TOP_K)
+    parser.add_argument("--ratio", type=float, default=DEFAULT_RATIO)
+    parser.add_argument("--min-score", type=float, default=DEFAULT_MIN_SCORE)
+    args = parser.parse_args()
+
+    from agent import TOOL_REGISTRY
+    from router import load_eval_set
+    selector = ToolSelector(TOOL_REGISTRY.values(), top_k=args.top_k, ratio=args.ratio, min_score=args.min_score)
+    cases = load_eval_set(args.eval_set)
+    print(json.dumps(evaluate(selector, cases), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
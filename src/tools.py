@@ -1,33 +1,40 @@
 from langchain_core.tools import tool
-from loader import load_raw, load_sus
-from typing import Union, Dict, List, Any
-import pandas as pd
-import numpy as np
+from columnar import AGE_GROUPS, AggregationResult, AggregationSpec, SusColumns, load_columns
+from dataset import LazyDataset
+from sql_engine import QueryError, SqlEngine, load_engine
+from typing import Union, Dict, List, Any, Optional
 import logging
 
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Carregar e verificar dados
-_df = load_sus()
-logger.info(f"DataFrame carregado: {len(_df)} registros")
 
-# Filtrar apenas diagnósticos que começam com J
-_df_filtered = _df[_df.DIAG_PRINC.str.startswith("J")]
-logger.info(f"Após filtro de diagnóstico J: {len(_df_filtered)} registros")
+# Colunas codificadas do SUS (ver `columnar`), carregadas sob demanda, na
+# primeira ferramenta que precisar delas
+DATASET: LazyDataset[SusColumns] = LazyDataset(load_columns, name="sus_colunas")
 
-# Se o DataFrame filtrado não estiver vazio, use-o; caso contrário, use o original
-_df = _df_filtered if not _df_filtered.empty else _df
-logger.info(f"DataFrame final: {len(_df)} registros")
-# logger.info(f"Colunas disponíveis: {_df.columns.tolist()}")
+# Banco SQL indexado (ver `sql_engine`), gerado/aberto na primeira consulta
+SQL_ENGINE: LazyDataset[SqlEngine] = LazyDataset(load_engine, name="sus_sql")
 
-if 'IDADE' in _df.columns:
-    logger.info(f"Valores não-nulos na coluna IDADE: {_df['IDADE'].notna().sum()}")
-else:
-    logger.error("Coluna IDADE não encontrada no DataFrame!")
 
-_df = _df[_df.DIAG_PRINC.str.startswith("J")]
+def aggregate(spec: AggregationSpec) -> AggregationResult:
+    """Executa `spec` sobre as colunas do SUS (uma passada vetorizada)."""
+    return DATASET.get().aggregate(spec)
+
+
+def _age_spec(**kwargs: Any) -> AggregationSpec:
+    """
+    Consulta das ferramentas de idade: internações respiratórias (CID J), ou
+    todas se não houver nenhuma respiratória.
+    """
+    prefix = "J" if DATASET.get().respiratory_rows else None
+    return AggregationSpec(cid_prefix=prefix, **kwargs)
+
+
+def _unique_ages() -> List[int]:
+    """Idades únicas (ordenadas) das internações."""
+    return aggregate(_age_spec(group_by="idade", order="chave")).keys
 
 
 @tool
@@ -35,11 +42,10 @@ def get_max_age() -> int:
     """
     Retorna a maior idade registrada no conjunto de dados (`IDADE`).
     """
-    # Remove valores nulos e converte para inteiro
-    ages = _df["IDADE"].dropna().astype(int)
-    if ages.empty:
+    ages = _unique_ages()
+    if not ages:
         raise ValueError("Não há dados de idade disponíveis.")
-    return int(ages.max())
+    return ages[-1]
 
 
 @tool
@@ -60,9 +66,9 @@ def get_top_ages(
     Exemplo:
         get_top_ages(n=5, range='menores') → [0, 1, 2, 3, 4]
     """
-    # Carrega e limpa
-    ages = pd.to_numeric(_df["IDADE"], errors="coerce").dropna().astype(int)
-    if ages.empty:
+    # Idades únicas ordenadas, do histograma pré-calculado
+    unique_ages = _unique_ages()
+    if not unique_ages:
         return {"error": "Não há dados de idade disponíveis."}
 
     # Converte n para inteiro, se vier como string
@@ -78,9 +84,6 @@ def get_top_ages(
     if opt not in ("menores", "maiores", "ambos"):
         return {"error": "Parâmetro 'range' inválido. Use 'menores', 'maiores' ou 'ambos'."}
 
-    # Extrai apenas valores únicos, ordenados
-    unique_ages = sorted(set(ages.tolist()))
-
     # Função auxiliar para fatiar
     def slice_ages(desc: bool):
         lst = unique_ages[::-1] if desc else unique_ages
@@ -97,36 +100,26 @@ def get_top_ages(
             "maiores": slice_ages(desc=True)
         }
 
-# 2) Parâmetros fixos de bins e labels
-_BINS   = [0,10,20,30,40,50,60,70,80,90,float("inf")]
-_LABELS = ['0-9','10-19','20-29','30-39','40-49',
-           '50-59','60-69','70-79','80-89','90+']
-
-def _compute_age_group_counts(df: pd.DataFrame) -> Dict[str,int]:
-    """
-    Binning das idades nas faixas fixas e contagem de internações.
-    """
-    ages = pd.to_numeric(df["IDADE"], errors="coerce").dropna().astype(int)
-    ages = ages[(ages >= 0) & (ages <= 120)]
-    faixa = pd.cut(ages, bins=_BINS, right=False, labels=_LABELS)
-    counts = faixa.value_counts().reindex(_LABELS, fill_value=0)
-
-    # **RETORNE** o dict de faixa -> contagem
-    return { label: int(counts[label]) for label in _LABELS }
+def _age_group_counts() -> Dict[str, int]:
+    """Internações por faixa etária fixa (todas as faixas, mesmo vazias)."""
+    result = aggregate(_age_spec(group_by="faixa_etaria", order="chave"))
+    counts = dict.fromkeys(AGE_GROUPS, 0)
+    counts.update(zip(result.keys, result.counts))
+    return counts
 
 @tool
 def get_admission_age_groups() -> Dict[str, int]:
     """
     Retorna o número de internações por faixa etária (0-9, 10-19, ..., 90+).
     """
-    return _compute_age_group_counts(_df)
+    return _age_group_counts()
 
 @tool
 def get_top_admission_age_group() -> Dict[str, Union[str,int]]:
     """
     Retorna a faixa etária com o maior número de internações e seu total.
     """
-    counts = _compute_age_group_counts(_df)
+    counts = _age_group_counts()
     top_range = max(counts, key=counts.get)
     return {"age_group": top_range, "count": counts[top_range]}
 
@@ -150,24 +143,129 @@ def get_top_cities(n: Union[int, str]) -> List[Dict[str, Any]]:
     if n_int < 1:
         raise ValueError("Parâmetro 'n' deve ser maior ou igual a 1.")
 
-    # 2) Carrega e filtra SUS por CID J
-    df = load_sus()
-    df = df[df["DIAG_PRINC"].astype(str).str.upper().str.startswith("J")]
-
-    # 3) Conta internações por cidade
-    city_counts = (
-        df["CIDADE_RESIDENCIA_PACIENTE"]
-        .dropna()
-        .astype(str)
-        .str.strip()
-        .value_counts()
+    # 2) Internações CID J por cidade, da maior contagem para a menor
+    #    (empates pelo nome), limitadas às top n
+    result = aggregate(AggregationSpec(group_by="cidade", cid_prefix="J", top_n=n_int))
+
+    # 3) Formata resultado
+    return [
+        {"cidade": cidade, "internacoes": internacoes}
+        for cidade, internacoes in zip(result.keys, result.counts)
+    ]
+
+
+@tool
+def aggregate_hospitalizations(
+    metric: str = "internacoes",
+    group_by: Optional[str] = None,
+    city: Optional[str] = None,
+    year_from: Optional[int] = None,
+    year_to: Optional[int] = None,
+    cid_prefix: Optional[str] = "J",
+    age_min: Optional[int] = None,
+    age_max: Optional[int] = None,
+    sex: Optional[str] = None,
+    top_n: Optional[int] = None,
+    order: str = "desc",
+) -> Union[Dict[str, Any], List[Dict[str, Any]]]:
+    """
+    Agrega as internações do SUS com filtros, agrupamento e métrica.
+
+    Parâmetros:
+    - metric: 'internacoes', 'custo_total', 'custo_medio' (VAL_TOT),
+      'taxa_mortalidade' (0.0–1.0) ou 'permanencia_media' (dias).
+    - group_by: 'cidade', 'ano', 'mes', 'cid', 'idade', 'faixa_etaria',
+      'sexo' ou vazio para um único total.
+    - city: município (ex.: "Santa Maria").
+    - year_from, year_to: intervalo de anos (inclusivo; o mesmo ano nos dois
+      para um ano só).
+    - cid_prefix: prefixo do CID-10 (padrão 'J', doenças respiratórias;
+      ex.: 'J45'; vazio para todas as internações).
+    - age_min, age_max: faixa de idade (inclusiva).
+    - sex: 'masculino' ou 'feminino'.
+    - top_n: número máximo de grupos.
+    - order: 'desc' ou 'asc' pelo valor da métrica, ou 'chave'.
+
+    Exemplo:
+        aggregate_hospitalizations(metric='taxa_mortalidade', group_by='ano',
+                                   city='Pelotas', order='chave')
+
+    Retorno:
+    - Sem group_by: {<metric>: valor, "internacoes": int}.
+    - Com group_by: lista de {<group_by>: chave, <metric>: valor,
+      "internacoes": int}.
+    - {"error": str} se algum parâmetro for inválido.
+    """
+    spec = AggregationSpec(
+        metric=metric,
+        group_by=group_by or None,
+        city=city,
+        year_from=year_from,
+        year_to=year_to,
+        cid_prefix=cid_prefix,
+        age_min=age_min,
+        age_max=age_max,
+        sex=sex,
+        top_n=top_n,
+        order=order,
     )
+    try:
+        result = aggregate(spec)
+    except ValueError as exc:
+        return {"error": str(exc)}
 
-    # 4) Pega as top n cidades
-    top_n = city_counts.head(n_int)
+    def value(v: float) -> Union[int, float]:
+        return int(v) if metric == "internacoes" else v
 
-    # 5) Formata resultado
+    if spec.group_by is None:
+        return {metric: value(result.values[0]), "internacoes": result.counts[0]}
     return [
-        {"cidade": cidade, "internacoes": int(internacoes)}
-        for cidade, internacoes in top_n.items()
-    ]
\ No newline at end of file
+        {spec.group_by: key, metric: value(v), "internacoes": n}
+        for key, v, n in zip(result.keys, result.values, result.counts)
+    ]
+
+
+@tool
+def query_data(
+    sql: Optional[str] = None,
+    spec: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Consulta analítica somente leitura sobre as tabelas do projeto. Use quando
+    nenhuma outra ferramenta responde à pergunta (filtros por cidade, ano,
+    CID, período, cruzamentos com IDH ou poluição).
+
+    Tabelas:
+    - sus: cid, idade, cidade, city_key, ano, mes, dt_inter, dt_saida
+      ('AAAA-MM-DD'), val_tot, morte (0/1), sexo, respiratorio (0/1, CID J)
+    - idh: municipio, city_key, idhm, idhm_renda, idhm_educacao,
+      idhm_longevidade, posicao_idhm
+    - ibge: codigo_municipio, municipio, city_key, regiao_imediata,
+      regiao_intermediaria (municípios do RS)
+    - poluicao: data, ano, mes, pm10, so2, no2, o3, co
+    `city_key` é o nome da cidade sem acentos e em minúsculas (junções).
+
+    Parâmetros (informe um dos dois):
+    - spec (dict, preferível): {"table", "select", "where", "group_by",
+      "order_by", "limit"}. `select` aceita colunas, "count" e
+      "<sum|avg|min|max|count_distinct|rate>:<coluna>"; `where` mapeia coluna
+      → valor ou {operador: valor} (=, !=, <, <=, >, >=, in, between, like);
+      "-coluna" em `order_by` ordena de forma decrescente.
+    - sql (str): um único SELECT/WITH.
+
+    Exemplo:
+        query_data(spec={"select": ["ano", "count", "rate:morte"],
+                         "where": {"cidade": "Pelotas"}, "group_by": ["ano"]})
+
+    Retorno:
+    - {"columns": [...], "rows": [{coluna: valor}, ...], "truncated": bool}
+      (no máximo 200 linhas) ou {"error": str}.
+    """
+    if (sql is None) == (spec is None):
+        return {"error": "Informe exatamente um dos parâmetros 'sql' ou 'spec'."}
+    engine = SQL_ENGINE.get()
+    try:
+        result = engine.run_spec(spec) if spec is not None else engine.query(sql)
+    except QueryError as exc:
+        return {"error": str(exc)}
+    return result.as_records()
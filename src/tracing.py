@@ -0,0 +1,340 @@
+"""
+Rastreamento por etapa do pipeline do agente e métricas no formato do
+Prometheus.
+
+Cada resposta abre um `Trace` com spans para as etapas (cache de respostas,
+carga de dados, seleção de ferramenta, parsing de argumentos, cada
+ferramenta, síntese final). Ao terminar, o trace é emitido como uma linha de
+JSON no logger `tracing` e alimenta as métricas de `METRICS`:
+
+- `chatbot_stage_seconds` (histograma por etapa);
+- `chatbot_request_seconds` (histograma da resposta completa);
+- `chatbot_tool_calls_total` (contador por ferramenta e status);
+- `chatbot_errors_total` (contador por etapa);
+- `chatbot_llm_tokens_total` (contador por etapa e tipo, quando o modelo
+  informa `usage_metadata`);
+- `chatbot_tool_schema_tokens_total` (tokens estimados de schemas de
+  ferramentas enviados e poupados pela poda, ver `tool_selection`);
+- `chatbot_synthesis_total` (respostas finais por origem: template, LLM
+  ou modo degradado, ver `answer_templates`);
+- `chatbot_degraded_total` (etapas sem o LLM, por etapa e motivo: timeout,
+  prazo, circuito aberto, erro; ver `resilience`).
+
+`METRICS.render()` gera a exposição em texto do Prometheus.
+"""
+import contextvars
+import json
+import logging
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger("tracing")
+
+# Limites (segundos) dos buckets dos histogramas de latência
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    body = ",".join(
+        '{}="{}"'.format(k, v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in pairs
+    )
+    return "{" + body + "}"
+
+
+class Counter:
+    """Contador monotônico com labels."""
+
+    def __init__(self, name: str, help: str) -> None:
+        self.name = name
+        self.help = help
+        self._lock = threading.Lock()
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(_label_key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {value:g}")
+        return lines
+
+
+class Histogram:
+    """Histograma cumulativo com labels (buckets fixos)."""
+
+    def __init__(self, name: str, help: str, buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # labels -> (contagem por bucket, soma, contagem total)
+        self._values: Dict[LabelKey, Tuple[List[int], float, int]] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            counts, total, count = self._values.get(key) or ([0] * len(self.buckets), 0.0, 0)
+            index = bisect_left(self.buckets, value)
+            if index < len(counts):
+                counts[index] += 1
+            self._values[key] = (counts, total + value, count + 1)
+
+    def count(self, **labels: Any) -> int:
+        entry = self._values.get(_label_key(labels))
+        return entry[2] if entry else 0
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(f"{self.name}_bucket{_format_labels(key, ('le', f'{bound:g}'))} {cumulative}")
+                lines.append(f"{self.name}_bucket{_format_labels(key, ('le', '+Inf'))} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {total:g}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Métricas do pipeline do agente."""
+
+    def __init__(self) -> None:
+        self.stage_seconds = Histogram(
+            "chatbot_stage_seconds", "Duração de cada etapa do pipeline do agente."
+        )
+        self.request_seconds = Histogram(
+            "chatbot_request_seconds", "Duração total de cada resposta do agente."
+        )
+        self.tool_calls = Counter(
+            "chatbot_tool_calls_total", "Chamadas de ferramenta por ferramenta e status."
+        )
+        self.errors = Counter(
+            "chatbot_errors_total", "Erros por etapa do pipeline."
+        )
+        self.llm_tokens = Counter(
+            "chatbot_llm_tokens_total", "Tokens informados pelo modelo, por etapa e tipo."
+        )
+        self.tool_schema_tokens = Counter(
+            "chatbot_tool_schema_tokens_total",
+            "Tokens estimados de schemas de ferramentas nas chamadas ao LLM (enviados/poupados).",
+        )
+        self.synthesis = Counter(
+            "chatbot_synthesis_total", "Respostas finais por origem (template, llm ou degraded)."
+        )
+        self.degraded = Counter(
+            "chatbot_degraded_total", "Etapas respondidas sem o LLM, por etapa e motivo."
+        )
+        self.llm_call_seconds = Histogram(
+            "chatbot_llm_call_seconds", "Duração de cada chamada ao LLM, por fase e modelo."
+        )
+        self.tool_selection = Counter(
+            "chatbot_tool_selection_total",
+            "Seleções de ferramenta por modelo e resultado (accepted ou motivo do escalonamento).",
+        )
+
+    def render(self) -> str:
+        """Exposição em texto do Prometheus (`text/plain; version=0.0.4`)."""
+        lines: List[str] = []
+        for metric in (
+            self.request_seconds, self.stage_seconds, self.tool_calls, self.errors,
+            self.llm_tokens, self.tool_schema_tokens, self.synthesis, self.degraded,
+            self.llm_call_seconds, self.tool_selection,
+        ):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+METRICS = MetricsRegistry()
+
+
+class Span:
+    """Uma etapa medida de um trace."""
+
+    def __init__(self, name: str, parent: Optional[str] = None, **attributes: Any) -> None:
+        self.name = name
+        self.parent = parent
+        self.attributes: Dict[str, Any] = dict(attributes)
+        self.status = "ok"
+        self.start = time.perf_counter()
+        self.duration: Optional[float] = None
+
+    def set(self, **attributes: Any) -> None:
+        """Adiciona atributos ao span."""
+        self.attributes.update(attributes)
+
+    def record_usage(self, message: Any) -> None:
+        """
+        Soma aos atributos os tokens de `message.usage_metadata`, se o modelo
+        os informou (uma etapa pode fazer mais de uma chamada).
+        """
+        usage = getattr(message, "usage_metadata", None) or {}
+        for kind in ("input_tokens", "output_tokens"):
+            if usage.get(kind) is not None:
+                self.attributes[kind] = self.attributes.get(kind, 0) + int(usage[kind])
+
+    def as_dict(self, origin: float) -> Dict[str, Any]:
+        data: Dict[str, Any] = {
+            "name": self.name,
+            "start_ms": round((self.start - origin) * 1000, 3),
+            "duration_ms": None if self.duration is None else round(self.duration * 1000, 3),
+            "status": self.status,
+        }
+        if self.parent:
+            data["parent"] = self.parent
+        if self.attributes:
+            data["attributes"] = self.attributes
+        return data
+
+
+class Trace:
+    """
+    Spans de uma resposta. Thread-safe: ferramentas executadas em paralelo
+    registram seus spans no mesmo trace.
+    """
+
+    def __init__(self, name: str, metrics: Optional[MetricsRegistry] = METRICS, **attributes: Any) -> None:
+        self.name = name
+        self.trace_id = uuid.uuid4().hex
+        self.metrics = metrics
+        self.attributes: Dict[str, Any] = dict(attributes)
+        self.start = time.perf_counter()
+        self.duration: Optional[float] = None
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str, parent: Optional[str] = None, **attributes: Any) -> Iterator[Span]:
+        """Mede o bloco `with` como o span `name`; exceções marcam status "error"."""
+        span = Span(name, parent=parent, **attributes)
+        try:
+            yield span
+        except BaseException as exc:
+            span.status = "error"
+            span.set(error=f"{type(exc).__name__}: {exc}")
+            raise
+        finally:
+            self.finish_span(span)
+
+    def finish_span(self, span: Span) -> None:
+        """Fecha `span` (se ainda aberto), anexa ao trace e atualiza as métricas."""
+        if span.duration is None:
+            span.duration = time.perf_counter() - span.start
+        with self._lock:
+            self.spans.append(span)
+        if self.metrics is None:
+            return
+        self.metrics.stage_seconds.observe(span.duration, stage=span.name)
+        if span.status == "error":
+            self.metrics.errors.inc(stage=span.name)
+        for kind in ("input_tokens", "output_tokens"):
+            if kind in span.attributes:
+                self.metrics.llm_tokens.inc(span.attributes[kind], stage=span.name, type=kind)
+
+    def durations(self) -> Dict[str, float]:
+        """Segundos por etapa de primeiro nível (spans sem `parent`)."""
+        with self._lock:
+            return {s.name: s.duration for s in self.spans if s.parent is None and s.duration is not None}
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s.start)
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "duration_ms": None if self.duration is None else round(self.duration * 1000, 3),
+            **({"attributes": self.attributes} if self.attributes else {}),
+            "spans": [s.as_dict(self.start) for s in spans],
+        }
+
+
+_CURRENT: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("trace", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    """Trace ativo no contexto atual (propagado por `asyncio.to_thread`)."""
+    return _CURRENT.get()
+
+
+@contextmanager
+def maybe_span(name: str, parent: Optional[str] = None, **attributes: Any) -> Iterator[Optional[Span]]:
+    """Span no trace ativo, ou nada se não houver trace."""
+    trace = current_trace()
+    if trace is None:
+        yield None
+        return
+    with trace.span(name, parent=parent, **attributes) as span:
+        yield span
+
+
+@contextmanager
+def start_trace(name: str, metrics: Optional[MetricsRegistry] = METRICS, **attributes: Any) -> Iterator[Trace]:
+    """
+    Abre um trace e o torna o ativo no contexto. Ao sair, registra a duração
+    total nas métricas e emite o trace como JSON no logger `tracing`.
+    """
+    trace = Trace(name, metrics=metrics, **attributes)
+    token = _CURRENT.set(trace)
+    try:
+        yield trace
+    finally:
+        _CURRENT.reset(token)
+        trace.duration = time.perf_counter() - trace.start
+        if metrics is not None:
+            metrics.request_seconds.observe(trace.duration, name=name)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps(trace.as_dict(), ensure_ascii=False, default=str))
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formata registros de log como JSON (uma linha por registro). Mensagens que
+    já são JSON (os traces) entram como objeto em `trace`.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        message = record.getMessage()
+        data: Dict[str, Any] = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+        }
+        if record.name == logger.name and message.startswith("{"):
+            data["trace"] = json.loads(message)
+        else:
+            data["message"] = message
+        if record.exc_info:
+            data["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+def configure_json_logging(level: int = logging.INFO) -> None:
+    """Troca o formato de todos os handlers da raiz por `JsonFormatter`."""
+    root = logging.getLogger()
+    if not root.handlers:
+        root.addHandler(logging.StreamHandler())
+    for handler in root.handlers:
+        handler.setFormatter(JsonFormatter())
+    root.setLevel(level)
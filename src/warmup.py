@@ -0,0 +1,101 @@
+"""
+Aquecimento do modelo na inicialização.
+
+O Ollama só carrega o modelo na memória na primeira requisição, e o
+descarrega depois de `keep_alive` ocioso; a primeira pergunta do usuário
+pagava esse carregamento e o processamento do prompt inteiro. `warm_up`
+faz essa requisição antes, com o prompt de sistema real e os schemas das
+ferramentas vinculadas, para que o servidor já tenha o modelo carregado (e
+fixado por `ModelConfig.keep_alive`) e o início do prompt do agente no cache
+de prefixo. Requisições iguais em seguida medem a latência em regime, para
+comparar com a primeira.
+
+O aquecimento usa os mesmos vínculos do agente, e portanto o mesmo cliente
+HTTP (e suas conexões) que as perguntas vão usar.
+"""
+import logging
+import time
+from typing import Any, List, NamedTuple, Optional, Tuple
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from model_tiers import TieredAgent, model_label
+from tool_selection import PrunedToolAgent
+
+logger = logging.getLogger(__name__)
+
+# Pergunta do aquecimento: curta e respondida com uma chamada de ferramenta
+WARMUP_PROMPT = "Qual faixa etária tem o maior número de internações?"
+
+
+class WarmupResult(NamedTuple):
+    """
+    Aquecimento de um modelo.
+
+    Attributes:
+        model: Nome do modelo
+        first_seconds: Primeira requisição (carga do modelo + prompt inteiro)
+        steady_seconds: Mediana das requisições seguintes (regime), ou None
+        error: Falha da requisição (o aquecimento é só uma otimização)
+    """
+    model: str
+    first_seconds: Optional[float]
+    steady_seconds: Optional[float]
+    error: Optional[str] = None
+
+
+def _bindings(agent: Any) -> List[Tuple[str, Any]]:
+    """(modelo, vínculo com todas as ferramentas) de cada modelo do agente."""
+    if isinstance(agent, TieredAgent):
+        return _bindings(agent.selection) + _bindings(agent.synthesis)
+    full = agent.full if isinstance(agent, PrunedToolAgent) else agent
+    return [(model_label(agent), full)]
+
+
+def _median(values: List[float]) -> float:
+    ordered = sorted(values)
+    return ordered[len(ordered) // 2]
+
+
+def warm_up(agent: Any, system_prompt: str, prompt: str = WARMUP_PROMPT, steady_runs: int = 2) -> List[WarmupResult]:
+    """
+    Aquece cada modelo de `agent` (os dois de um `TieredAgent`): uma
+    requisição fria e `steady_runs` em regime, todas com `system_prompt` e a
+    mesma pergunta. Falhas são registradas no log e no resultado, sem
+    interromper a inicialização.
+    """
+    messages = [SystemMessage(system_prompt), HumanMessage(prompt)]
+    results = []
+    for model, binding in _bindings(agent):
+        timings: List[float] = []
+        try:
+            for _ in range(1 + steady_runs):
+                started = time.perf_counter()
+                binding.invoke(messages)
+                timings.append(time.perf_counter() - started)
+        except Exception as exc:
+            logger.warning("Aquecimento do modelo '%s' falhou: %s: %s", model, type(exc).__name__, exc)
+            results.append(WarmupResult(
+                model, timings[0] if timings else None, None, f"{type(exc).__name__}: {exc}"
+            ))
+            continue
+        result = WarmupResult(model, timings[0], _median(timings[1:]) if timings[1:] else None)
+        logger.info(
+            "Modelo '%s' aquecido: primeira requisição %.2fs, em regime %s",
+            model, result.first_seconds,
+            "-" if result.steady_seconds is None else f"{result.steady_seconds:.2f}s",
+        )
+        results.append(result)
+    return results
+
+
+def format_warmup(results: List[WarmupResult]) -> str:
+    """Uma linha por modelo: primeira requisição vs. regime."""
+    lines = []
+    for r in results:
+        if r.error is not None:
+            lines.append(f"[warmup] {r.model}: falhou ({r.error})")
+            continue
+        steady = "-" if r.steady_seconds is None else f"{r.steady_seconds * 1000:.0f} ms"
+        lines.append(f"[warmup] {r.model}: primeira {r.first_seconds * 1000:.0f} ms, em regime {steady}")
+    return "\n".join(lines)
@@ -0,0 +1,46 @@
+"""
+Configuração comum dos testes: módulos de `src/` e `benchmarks/` no path e
+um diretório de dados sintéticos (`synthetic_sus.py`) no lugar de `data/`.
+"""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT / "src"), str(ROOT / "benchmarks")]
+
+from loader import DATA_DIR_ENV  # noqa: E402
+
+# CSVs auxiliares (índice de municípios), ligados do `data/raw` real
+AUX_SOURCES = ["IDH_municipios_RS.csv", "dados_IBGE_modificados.csv"]
+
+# Colunas com ~1% de valores ausentes, como no SUS real
+NULLABLE_COLUMNS = ["IDADE", "SEXO", "DT_INTER", "DT_SAIDA", "VAL_TOT", "CIDADE_RESIDENCIA_PACIENTE", "DIAG_PRINC"]
+
+
+@pytest.fixture(scope="session")
+def sus_data_dir(tmp_path_factory: pytest.TempPathFactory) -> Path:
+    """
+    Diretório de dados com um `dados_sus3.csv` sintético (com nulos) e os
+    CSVs auxiliares; `DATA_DIR_ENV` aponta para ele durante a sessão.
+    """
+    from synthetic_sus import generate_sus
+
+    data_dir = tmp_path_factory.mktemp("data")
+    raw_dir = data_dir / "raw"
+    raw_dir.mkdir()
+    for name in AUX_SOURCES:
+        (raw_dir / name).symlink_to(ROOT / "data" / "raw" / name)
+
+    df = generate_sus(20_000, seed=7)
+    rng = np.random.default_rng(1)
+    for col in NULLABLE_COLUMNS:
+        df[col] = df[col].astype(object)
+        df.loc[rng.random(len(df)) < 0.01, col] = None
+    df.to_csv(raw_dir / "dados_sus3.csv", index=False, date_format="%Y-%m-%d")
+
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv(DATA_DIR_ENV, str(data_dir))
+        yield data_dir
@@ -0,0 +1,59 @@
+"""
+Conjunto de avaliação do cache de respostas (`data/eval/answer_cache_eval.jsonl`)
+como asserções: paráfrases são servidas do cache e perguntas com entidades
+diferentes (falsos acertos) não.
+"""
+import pytest
+
+from answer_cache import AnswerCache, evaluate, load_eval_set
+
+THRESHOLD = 0.8
+
+CASES = load_eval_set()
+
+
+def _lookup(cached: str, prompt: str):
+    cache = AnswerCache(threshold=THRESHOLD, maxsize=4)
+    cache.store(cached, "resposta")
+    return cache.lookup(prompt)
+
+
+@pytest.mark.parametrize("case", [c for c in CASES if c["hit"]], ids=lambda c: c["prompt"])
+def test_paraphrase_hits(case):
+    found = _lookup(case["cached"], case["prompt"])
+
+    assert found is not None
+    assert found.answer == "resposta"
+
+
+@pytest.mark.parametrize("case", [c for c in CASES if not c["hit"]], ids=lambda c: c["prompt"])
+def test_different_entities_miss(case):
+    assert _lookup(case["cached"], case["prompt"]) is None
+
+
+@pytest.mark.parametrize(
+    "cached,prompt",
+    [
+        ("Qual o custo médio das internações em Santa Maria?", "Qual o custo médio das internações em Santa Rosa?"),
+        ("Quantas internações de homens em 2019?", "Quantas internações de mulheres em 2019?"),
+        ("Qual a cidade com mais internações?", "Quais as cidades com mais internações?"),
+        ("Quais as 5 cidades com mais internações?", "Quais as 10 cidades com mais internações?"),
+    ],
+)
+def test_entity_changes_never_hit(cached, prompt):
+    assert _lookup(cached, prompt) is None
+
+
+def test_new_version_misses():
+    cache = AnswerCache(threshold=THRESHOLD, maxsize=4)
+    cache.store("Qual a cidade com mais internações?", "resposta", version=1)
+
+    assert cache.lookup("Qual a cidade com mais internações?", version=1) is not None
+    assert cache.lookup("Qual a cidade com mais internações?", version=2) is None
+
+
+def test_eval_set_has_no_wrong_hits():
+    result = evaluate(THRESHOLD, CASES)
+
+    assert result["wrong_hits"] == 0, result["errors"]
+    assert result["hit_rate"] == 1.0, result["errors"]
@@ -0,0 +1,86 @@
+"""
+Retomada do modo batch: registros já gravados são pulados e uma última
+linha truncada por uma queda é descartada e refeita.
+"""
+import asyncio
+import json
+
+import pytest
+
+import agent
+from batch import completed_ids, drop_partial_line, run_batch
+
+
+@pytest.fixture
+def answered(monkeypatch):
+    """Substitui `aget_response` por uma resposta fixa e registra as perguntas feitas."""
+    prompts = []
+
+    async def fake_aget_response(agent_, prompt, **kwargs):
+        prompts.append(prompt)
+        return f"resposta: {prompt}", []
+
+    monkeypatch.setattr(agent, "aget_response", fake_aget_response)
+    return prompts
+
+
+def _write_questions(path, n):
+    path.write_text("".join(json.dumps({"id": str(i), "prompt": f"pergunta {i}"}) + "\n" for i in range(1, n + 1)))
+
+
+def test_resume_after_truncated_last_line(tmp_path, answered):
+    questions, output = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    _write_questions(questions, 4)
+    done = json.dumps({"id": "1", "prompt": "pergunta 1", "answer": "ok"})
+    failed = json.dumps({"id": "2", "prompt": "pergunta 2", "error": "LLMUnavailable: timeout"})
+    output.write_text(done + "\n" + failed + "\n" + '{"id": "3", "prompt": "perg')
+
+    stats = asyncio.run(run_batch(object(), questions, output, concurrency=2))
+
+    records = [json.loads(line) for line in output.read_text().splitlines()]
+    assert sorted(answered) == ["pergunta 2", "pergunta 3", "pergunta 4"]
+    assert stats["skipped"] == 1 and stats["answered"] == 3
+    assert [r["id"] for r in records[:2]] == ["1", "2"]
+    assert sorted(r["id"] for r in records[2:]) == ["2", "3", "4"]
+    assert completed_ids(output) == {"1", "2", "3", "4"}
+
+
+def test_rerun_after_complete_output_skips_everything(tmp_path, answered):
+    questions, output = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    _write_questions(questions, 3)
+    asyncio.run(run_batch(object(), questions, output))
+    answered.clear()
+
+    stats = asyncio.run(run_batch(object(), questions, output))
+
+    assert answered == []
+    assert stats["skipped"] == 3
+    assert len(output.read_text().splitlines()) == 3
+
+
+@pytest.mark.parametrize("block_size", [4, 1 << 16])
+def test_drop_partial_line(tmp_path, block_size):
+    path = tmp_path / "out.jsonl"
+    path.write_text('{"id": "1"}\n{"id": "2"}\n{"id": "3", "pro')
+
+    drop_partial_line(path, block_size=block_size)
+
+    assert path.read_text() == '{"id": "1"}\n{"id": "2"}\n'
+
+
+def test_drop_partial_line_keeps_complete_file(tmp_path):
+    path = tmp_path / "out.jsonl"
+    path.write_text('{"id": "1"}\n')
+
+    drop_partial_line(path)
+
+    assert path.read_text() == '{"id": "1"}\n'
+
+
+def test_drop_partial_line_without_any_newline(tmp_path):
+    path = tmp_path / "out.jsonl"
+    path.write_text('{"id": "1", "pro')
+
+    drop_partial_line(path)
+
+    assert path.read_text() == ""
@@ -0,0 +1,138 @@
+"""
+Paridade de `SusColumns.aggregate` (cubo em memória e em blocos) com uma
+varredura direta do CSV em pandas.
+"""
+import itertools
+from typing import Any, Dict, Tuple
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from aggregates import aggregate_csv
+from columnar import AGE_GROUPS, DIMENSIONS, MAX_AGE, METRICS, SEX_CODES, AggregationSpec, SusColumns, build_columns_frame
+from cube import build_cube_frame
+from loader import load_table, prepare_sus
+from municipios import build_index, fold_name
+
+FILTERS = [
+    {},
+    {"cid_prefix": "J"},
+    {"city": "Porto Alegre"},
+    {"city": "pelotas", "age_max": 10},
+    {"year_from": 2019, "year_to": 2021},
+    {"age_min": 60},
+    {"sex": "feminino", "cid_prefix": "J4"},
+]
+
+_SEX_LABELS = {code: label for label, code in SEX_CODES.items()}
+
+
+@pytest.fixture(scope="module")
+def raw(sus_data_dir) -> pd.DataFrame:
+    """O CSV sintético com as normalizações de `prepare_sus`, sem passar pelo cubo."""
+    df = pd.read_csv(sus_data_dir / "raw" / "dados_sus3.csv")
+    ages = pd.to_numeric(df["IDADE"], errors="coerce")
+    dt_inter = pd.to_datetime(df["DT_INTER"], errors="coerce")
+    stay = (pd.to_datetime(df["DT_SAIDA"], errors="coerce") - dt_inter).dt.days
+    age = ages.where(ages >= 0).round()
+    return pd.DataFrame({
+        "cidade": df["CIDADE_RESIDENCIA_PACIENTE"].astype("string").str.strip(),
+        "cid": df["DIAG_PRINC"].astype("string").str.strip().str.upper(),
+        "ano": pd.to_numeric(df["ano"], errors="coerce"),
+        "mes": dt_inter.dt.month,
+        "idade": age,
+        "faixa_etaria": age.where(age <= MAX_AGE).map(
+            lambda a: AGE_GROUPS[min(int(a) // 10, len(AGE_GROUPS) - 1)], na_action="ignore"
+        ),
+        "sexo": pd.to_numeric(df["SEXO"], errors="coerce").map(lambda s: _SEX_LABELS.get(s, s), na_action="ignore"),
+        "val": pd.to_numeric(df["VAL_TOT"], errors="coerce").astype("float32").astype("float64"),
+        "morte": pd.to_numeric(df["MORTE"], errors="coerce").fillna(0),
+        "stay": stay.where(stay >= 0),
+    })
+
+
+@pytest.fixture(scope="module", params=["memory", "chunked"])
+def columns(request, sus_data_dir) -> SusColumns:
+    if request.param == "chunked":
+        cube = aggregate_csv(chunk_rows=3_000).cube
+    else:
+        cube = build_cube_frame(prepare_sus(load_table("sus"))[0])
+    return SusColumns(build_columns_frame(cube), build_index())
+
+
+def _scan(raw: pd.DataFrame, spec: AggregationSpec) -> Dict[Any, Tuple[float, int]]:
+    """Valor da métrica e internações por grupo, filtrando as linhas do CSV."""
+    mask = pd.Series(True, index=raw.index)
+    if spec.cid_prefix:
+        mask &= raw["cid"].str.startswith(spec.cid_prefix).fillna(False).astype(bool)
+    if spec.city:
+        mask &= raw["cidade"].map(fold_name, na_action="ignore") == fold_name(spec.city)
+    if spec.year_from is not None:
+        mask &= raw["ano"] >= spec.year_from
+    if spec.year_to is not None:
+        mask &= raw["ano"] <= spec.year_to
+    if spec.age_min is not None:
+        mask &= raw["idade"] >= spec.age_min
+    if spec.age_max is not None:
+        mask &= raw["idade"] <= spec.age_max
+    if spec.sex is not None:
+        mask &= raw["sexo"] == spec.sex
+    rows = raw[mask.fillna(False).astype(bool)]
+
+    def metric(group: pd.DataFrame) -> float:
+        if spec.metric == "internacoes":
+            return float(len(group))
+        if spec.metric == "custo_total":
+            return float(group["val"].sum())
+        if spec.metric == "custo_medio":
+            return float(group["val"].mean()) if group["val"].notna().any() else 0.0
+        if spec.metric == "taxa_mortalidade":
+            return float(group["morte"].sum() / len(group))
+        return float(group["stay"].mean()) if group["stay"].notna().any() else 0.0
+
+    if spec.group_by is None:
+        return {None: (metric(rows), len(rows))}
+    return {
+        key.item() if isinstance(key, np.generic) else key: (metric(group), len(group))
+        for key, group in rows.groupby(spec.group_by, dropna=True)
+        if len(group)
+    }
+
+
+def _normalized(key: Any) -> Any:
+    # Chaves numéricas do pandas (float por causa dos nulos) como inteiros
+    return int(key) if isinstance(key, float) else key
+
+
+def test_totals_match_scan(columns, raw):
+    assert columns.rows == len(raw)
+    assert columns.respiratory_rows == int(raw["cid"].str.startswith("J").fillna(False).sum())
+
+
+@pytest.mark.parametrize(
+    "filters,group_by,metric", list(itertools.product(FILTERS, (None,) + DIMENSIONS, METRICS))
+)
+def test_aggregate_matches_scan(columns, raw, filters, group_by, metric):
+    spec = AggregationSpec(metric=metric, group_by=group_by, order="chave", **filters)
+    expected = {_normalized(k): v for k, v in _scan(raw, spec).items()}
+
+    result = columns.aggregate(spec)
+
+    keys = result.keys if group_by is not None else [None]
+    got = dict(zip(keys, zip(result.values, result.counts)))
+    assert set(got) == set(expected)
+    for key, (value, count) in expected.items():
+        assert got[key][1] == count, key
+        assert got[key][0] == pytest.approx(value, rel=1e-6, abs=1e-6), key
+
+
+@pytest.mark.parametrize("group_by", DIMENSIONS)
+@pytest.mark.parametrize("order", ["desc", "asc"])
+def test_top_n_follows_metric_order(columns, raw, group_by, order):
+    spec = AggregationSpec(metric="custo_medio", group_by=group_by, cid_prefix="J", order=order, top_n=5)
+    expected = sorted((value for value, _ in _scan(raw, spec).values()), reverse=order == "desc")[:5]
+
+    result = columns.aggregate(spec)
+
+    assert result.values == pytest.approx(expected, rel=1e-6, abs=1e-6)
@@ -0,0 +1,147 @@
+"""
+Transições de estado do `CircuitBreaker` (fechado → aberto → meio-aberto →
+fechado/aberto) e a integração com `LLMGuard`.
+"""
+import time
+
+import pytest
+
+import resilience
+from resilience import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, LLMGuard, LLMUnavailable
+
+
+class FakeClock:
+    """`time` do módulo com `monotonic` controlado pelo teste."""
+
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def perf_counter(self) -> float:
+        return time.perf_counter()
+
+
+@pytest.fixture
+def clock(monkeypatch) -> FakeClock:
+    fake = FakeClock()
+    monkeypatch.setattr(resilience, "time", fake)
+    return fake
+
+
+def _breaker(**kwargs) -> CircuitBreaker:
+    params = {"window": 4, "min_calls": 4, "failure_rate": 0.5, "slow_call_seconds": 1.0, "slow_rate": 0.75, "cooldown": 30.0}
+    return CircuitBreaker(**{**params, **kwargs})
+
+
+def _trip(breaker: CircuitBreaker) -> None:
+    for _ in range(breaker.min_calls):
+        assert breaker.allow()
+        breaker.record(0.1, ok=False)
+
+
+def test_stays_closed_below_min_calls(clock):
+    breaker = _breaker()
+    for _ in range(3):
+        breaker.record(0.1, ok=False)
+
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+
+
+def test_stays_closed_below_failure_rate(clock):
+    breaker = _breaker()
+    for ok in (True, True, True, False, True, True, True, False):
+        breaker.record(0.1, ok=ok)
+
+    assert breaker.state == CLOSED
+    assert breaker.trips == 0
+
+
+def test_opens_on_failure_rate(clock):
+    breaker = _breaker()
+    for ok in (True, False, True, False):
+        breaker.record(0.1, ok=ok)
+
+    assert breaker.state == OPEN
+    assert breaker.trips == 1
+
+
+def test_opens_on_slow_rate(clock):
+    breaker = _breaker()
+    for duration in (2.0, 2.0, 0.1, 2.0):
+        breaker.record(duration, ok=True)
+
+    assert breaker.state == OPEN
+
+
+def test_open_rejects_until_cooldown(clock):
+    breaker = _breaker()
+    _trip(breaker)
+
+    clock.now += 29.0
+    assert not breaker.allow()
+    assert not breaker.allow()
+    assert breaker.stats()["rejected"] == 2
+
+    clock.now += 1.0
+    assert breaker.state == HALF_OPEN
+
+
+def test_half_open_allows_single_probe(clock):
+    breaker = _breaker()
+    _trip(breaker)
+    clock.now += 30.0
+
+    assert breaker.allow()
+    assert not breaker.allow()
+
+
+def test_successful_probe_closes(clock):
+    breaker = _breaker()
+    _trip(breaker)
+    clock.now += 30.0
+
+    assert breaker.allow()
+    breaker.record(0.1, ok=True)
+
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+    assert breaker.stats()["recent_calls"] == 0
+
+
+@pytest.mark.parametrize("duration,ok", [(0.1, False), (2.0, True)])
+def test_failed_or_slow_probe_reopens(clock, duration, ok):
+    breaker = _breaker()
+    _trip(breaker)
+    clock.now += 30.0
+
+    assert breaker.allow()
+    breaker.record(duration, ok=ok)
+
+    assert breaker.state == OPEN
+    assert breaker.trips == 2
+    assert not breaker.allow()
+    clock.now += 30.0
+    assert breaker.state == HALF_OPEN
+
+
+def test_guard_raises_circuit_open(clock):
+    guard = LLMGuard(call_timeout=None, request_timeout=None, breaker=_breaker())
+
+    def fail():
+        raise RuntimeError("modelo fora do ar")
+
+    for _ in range(4):
+        with pytest.raises(LLMUnavailable) as info:
+            guard.call(fail)
+        assert info.value.reason == "error"
+
+    with pytest.raises(LLMUnavailable) as info:
+        guard.call(lambda: "ok")
+    assert info.value.reason == "circuit_open"
+
+    clock.now += 30.0
+    assert guard.call(lambda: "ok") == "ok"
+    assert guard.breaker.state == CLOSED
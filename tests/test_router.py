@@ -0,0 +1,53 @@
+"""
+Conjunto de avaliação do roteador (`data/eval/router_eval.jsonl`) como
+asserções: perguntas com ferramenta esperada são roteadas com os argumentos
+certos e as demais (filtros que a ferramenta não aceita, conversa) vão para
+o LLM.
+"""
+import pytest
+
+from agent import TOOL_REGISTRY
+from router import IntentRouter, covers, evaluate, load_eval_set
+
+CASES = load_eval_set()
+
+
+@pytest.fixture(scope="module")
+def router() -> IntentRouter:
+    return IntentRouter(TOOL_REGISTRY.values())
+
+
+@pytest.mark.parametrize("case", [c for c in CASES if c.get("tool")], ids=lambda c: c["prompt"])
+def test_routes_to_expected_tool(router, case):
+    route = router.route(case["prompt"])
+
+    assert route is not None
+    assert (route.tool, route.args) == (case["tool"], case.get("args", {}))
+
+
+@pytest.mark.parametrize("case", [c for c in CASES if not c.get("tool")], ids=lambda c: c["prompt"])
+def test_misroute_candidates_go_to_llm(router, case):
+    assert router.route(case["prompt"]) is None
+
+
+@pytest.mark.parametrize(
+    "tool,prompt",
+    [
+        ("get_top_cities", "Quais as 5 cidades com mais internações em 2020?"),
+        ("get_top_cities", "Quais as 5 cidades com mais internações de mulheres?"),
+        ("get_top_cities", "Quais as 5 cidades com mais internações exceto Porto Alegre?"),
+        ("get_top_cities", "Quais as 5 cidades da serra gaúcha com mais internações?"),
+        ("get_top_admission_age_group", "Qual faixa etária tem mais internações em pelotas?"),
+        ("get_top_admission_age_group", "Qual faixa etária tem mais internações em julho?"),
+        ("get_top_admission_age_group", "Qual faixa etária tem mais internações no ano passado?"),
+    ],
+)
+def test_filtered_prompts_are_not_covered(tool, prompt):
+    assert not covers(tool, prompt)
+
+
+def test_eval_set_precision(router):
+    result = evaluate(router, CASES)
+
+    assert result["precision"] == 1.0, result["errors"]
+    assert result["routed"] == sum(1 for c in CASES if c.get("tool"))
@@ -0,0 +1,107 @@
+"""
+Proteções do `SqlEngine`: só leitura (validação e autorizador do SQLite),
+limite de linhas e interrupção de consultas que passam do tempo.
+"""
+import sqlite3
+
+import pytest
+
+from sql_engine import QueryError, SqlEngine, _authorizer, validate_sql
+
+_INFINITE = "WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n) SELECT count(*) FROM n"
+
+
+@pytest.fixture
+def engine(tmp_path) -> SqlEngine:
+    path = tmp_path / "sus.sqlite"
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE sus (cidade TEXT, ano INTEGER, internacoes INTEGER)")
+        conn.executemany(
+            "INSERT INTO sus VALUES (?, ?, ?)",
+            [(f"Cidade {i}", 2014 + i % 10, i) for i in range(50)],
+        )
+    conn.close()
+    return SqlEngine(path, build_id="teste", max_rows=10, timeout=0.2)
+
+
+def test_select_and_cte_are_allowed(engine):
+    result = engine.query("WITH t AS (SELECT ano, sum(internacoes) AS n FROM sus GROUP BY ano) SELECT * FROM t")
+
+    assert result.columns == ["ano", "n"]
+    assert len(result.rows) == 10 and not result.truncated
+
+
+def test_rows_are_capped(engine):
+    result = engine.query("SELECT * FROM sus", max_rows=100)
+
+    assert len(result.rows) == 10
+    assert result.truncated
+
+
+@pytest.mark.parametrize(
+    "sql",
+    [
+        "DELETE FROM sus",
+        "UPDATE sus SET ano = 0",
+        "DROP TABLE sus",
+        "ATTACH DATABASE 'x.db' AS x",
+        "PRAGMA table_info(sus)",
+        "SELECT 1; DROP TABLE sus",
+    ],
+)
+def test_validate_rejects_non_select(sql):
+    with pytest.raises(QueryError):
+        validate_sql(sql)
+
+
+@pytest.mark.parametrize(
+    "sql",
+    [
+        "SELECT * FROM sqlite_master",
+        "SELECT load_extension('mod_spatialite')",
+        "SELECT randomblob(1000000000)",
+        "WITH x AS (SELECT 1) SELECT * FROM sqlite_schema",
+    ],
+)
+def test_authorizer_denies_internal_tables_and_functions(engine, sql):
+    with pytest.raises(QueryError, match="Erro no SQL"):
+        engine.query(sql)
+
+
+@pytest.mark.parametrize(
+    "action,arg1,arg2",
+    [
+        (sqlite3.SQLITE_INSERT, "sus", None),
+        (sqlite3.SQLITE_DELETE, "sus", None),
+        (sqlite3.SQLITE_PRAGMA, "journal_mode", None),
+        (sqlite3.SQLITE_ATTACH, "x.db", None),
+        (sqlite3.SQLITE_READ, "sqlite_master", "sql"),
+        (sqlite3.SQLITE_FUNCTION, None, "load_extension"),
+    ],
+)
+def test_authorizer_denied_actions(action, arg1, arg2):
+    assert _authorizer(action, arg1, arg2, None, None) == sqlite3.SQLITE_DENY
+
+
+@pytest.mark.parametrize(
+    "action,arg1,arg2",
+    [
+        (sqlite3.SQLITE_SELECT, None, None),
+        (sqlite3.SQLITE_READ, "sus", "ano"),
+        (sqlite3.SQLITE_FUNCTION, None, "sum"),
+    ],
+)
+def test_authorizer_allowed_actions(action, arg1, arg2):
+    assert _authorizer(action, arg1, arg2, None, None) == sqlite3.SQLITE_OK
+
+
+def test_timeout_interrupts_query(engine):
+    with pytest.raises(QueryError, match="excedeu o limite"):
+        engine.query(_INFINITE, timeout=0.1)
+
+
+def test_connection_usable_after_timeout(engine):
+    with pytest.raises(QueryError):
+        engine.query(_INFINITE)
+
+    assert engine.query("SELECT count(*) FROM sus").rows == [(50,)]